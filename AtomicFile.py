@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原子写入文件
+先写入同目录下的临时文件，写完后用os.replace替换目标文件：
+读取者不会看到不完整的文件，并发写入同一路径时以最后完成的为准，中途失败时删除临时文件
+"""
+
+import contextlib
+import os
+import uuid
+
+@contextlib.contextmanager
+def open_atomic(path, mode="xb", **kwargs):
+    """
+    打开临时文件用于写入，with块正常结束后替换path
+    :param mode: 临时文件的打开方式，"xb"或"x"（文本方式可以再给出encoding、newline等参数）
+    """
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, mode, **kwargs) as fp:
+            yield fp
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def write_atomic(path, data):
+    """原子写入bytes"""
+    with open_atomic(path) as fp:
+        fp.write(data)
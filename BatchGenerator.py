@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量课程表生成器
+将一个目录（或清单文件）中的全部xlsx课表（或ScheduleFile中间格式文件）转换为ics文件
+- 节假日信息只获取一次，学期日历（TermCalendar）只计算一次，并共享给所有工作进程
+- 每个课表的解析、展开、渲染在进程池中并行执行
+- 每个输出文件原子写入各自的路径，互不覆盖
+- 工作进程内相同的课程时间段只展开和渲染一次（SectionCache），汇总中输出缓存命中率
+- --profile时汇总全部工作进程各阶段的耗时和cProfile统计
+- --bundle时打包输出（BundleWriter）：zip/tar.gz由主进程依次写入一个压缩包，gzip由工作进程各自写入.ics.gz文件
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import io
+import logging
+import os
+import sys
+import time
+from typing import NamedTuple, Optional
+
+import AtomicFile
+import BundleWriter
+import CurriculumGenerator
+import GeneratorLog
+import GeneratorProfile
+import ScheduleFile
+import SectionCache
+import TermCalendar
+
+# 工作进程内共享的学期参数，由init_worker设置
+_worker_context = {}
+
+log = GeneratorLog.logger
+
+PROFILE_PREFIX = "batch"
+
+class FileResult(NamedTuple):
+    """工作进程处理一个课表的结果"""
+    excel_file: str
+    event_count: int
+    counts: dict              # 上课次数计数
+    cache_counts: dict        # 课程时间段缓存的命中、未命中、淘汰次数
+    error: Optional[str]      # 错误信息，成功时为None
+    profile: Optional[dict] = None    # GeneratorProfile.report()，没有启用性能分析时为None
+    stats: Optional[bytes] = None     # GeneratorProfile.collect_stats()
+    data: Optional[bytes] = None      # 打包为zip/tar.gz时的ics内容，由主进程写入压缩包
+    size: int = 0                     # 打包为gzip时ics内容的字节数
+    stored_size: int = 0              # 打包为gzip时压缩后的字节数
+
+def collect_tasks(source, output_dir):
+    """
+    收集待处理的(xlsx路径, ics路径)列表
+    :param source: 包含xlsx或中间格式文件的目录，或清单文件（每行一个课表路径，可用制表符追加输出路径，#开头为注释）
+    :param output_dir: 输出目录
+    """
+    tasks = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if (name.endswith(".xlsx") or ScheduleFile.is_schedule_file(name)) and not name.startswith("~$"):
+                tasks.append((os.path.join(source, name), None))
+    else:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, encoding="utf8") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                fields = line.split("\t")
+                excel_file = os.path.join(base_dir, fields[0].strip())
+                output_file = os.path.join(output_dir, fields[1].strip()) if len(fields) > 1 else None
+                tasks.append((excel_file, output_file))
+
+    result = []
+    used_outputs = set()
+    for excel_file, output_file in tasks:
+        if output_file is None:
+            stem = os.path.splitext(os.path.basename(excel_file))[0]
+            output_file = os.path.join(output_dir, stem + ".ics")
+        output_file = os.path.abspath(output_file)
+        if output_file in used_outputs:
+            raise ValueError(f"输出文件重复: {output_file}（来自 {excel_file}）")
+        used_outputs.add(output_file)
+        result.append((excel_file, output_file))
+    return result
+
+def init_worker(calendar, default_travel_time, recurring, log_level, cache_bytes=SectionCache.DEFAULT_MAX_BYTES, profile=False, bundle=None):
+    """
+    工作进程初始化：保存共享的学期参数，设置日志级别和课程时间段缓存
+    作为ProcessPoolExecutor的initializer，之后在同一进程中调用generate_one
+    :param calendar: 主进程计算好的TermCalendar.TermCalendar，登记后各课表直接使用
+    :param default_travel_time: 基准路程时间（分钟）
+    :param recurring: 为True时每门课程输出一个重复事件
+    :param log_level: 工作进程的日志级别
+    :param cache_bytes: 课程时间段缓存的大小上限（字节），0表示不缓存
+    :param profile: 记录各阶段耗时和cProfile统计
+    :param bundle: 打包方式（BundleWriter.BUNDLE_KINDS），None时每个课表写一个ics文件
+    """
+    TermCalendar.install(calendar)
+    _worker_context.update(
+        term_start_date=calendar.term_start_date,
+        term_end_date=calendar.term_end_date,
+        holidays=calendar.holidays,
+        workdays=calendar.workdays,
+        default_travel_time=default_travel_time,
+        recurring=recurring,
+        bundle=bundle,
+    )
+    CurriculumGenerator.section_cache = SectionCache.SectionCache(cache_bytes) if cache_bytes else None
+    GeneratorLog.configure(log_level)
+    if profile:
+        # fork的工作进程会继承主进程已记录的结果
+        GeneratorProfile.reset()
+        GeneratorProfile.start(cprofile=True)
+
+def _cache_stats():
+    cache = CurriculumGenerator.section_cache
+    return cache.stats() if cache is not None else {}
+
+def generate_one(task):
+    """
+    在工作进程中处理单个课表，学期参数由init_worker设置
+    :param task: (课表路径, 输出的ics路径)；打包为zip/tar.gz时不写入文件，ics内容放在返回值的data中，
+                 打包为gzip时写入<ics路径>.gz
+    :return: FileResult，出错时error为错误信息，不抛出异常
+    """
+    excel_file, output_file = task
+    GeneratorLog.reset_counters()
+    before = _cache_stats()
+    try:
+        with GeneratorProfile.phase("read"), open(excel_file, "rb") as fp:
+            data = fp.read()
+        parsed_cells = ScheduleFile.load_parsed_cells(data, excel_file)
+        with GeneratorProfile.phase("expand"):
+            curriculum, _ = CurriculumGenerator.build_curriculum_from_records(
+                parsed_cells,
+                _worker_context["term_start_date"],
+                _worker_context["term_end_date"],
+                _worker_context["holidays"],
+                _worker_context["workdays"],
+                _worker_context["default_travel_time"],
+                _worker_context["recurring"],
+            )
+        bundle = _worker_context["bundle"]
+        ics = None
+        size = stored_size = 0
+        if bundle is None:
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            with GeneratorProfile.phase("render"):
+                event_count = curriculum.save_as_ics_file(output_file)
+        else:
+            with GeneratorProfile.phase("render"):
+                buffer = io.StringIO()
+                event_count = curriculum.write_ics(buffer)
+                ics = buffer.getvalue().encode("utf8")
+            if bundle == "gzip":
+                with GeneratorProfile.phase("compress"):
+                    compressed = BundleWriter.gzip_bytes(ics)
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                AtomicFile.write_atomic(output_file + BundleWriter.GZIP_SUFFIX, compressed)
+                size, stored_size = len(ics), len(compressed)
+                ics = None
+        error = None
+    except Exception as e:
+        event_count = 0
+        ics = None
+        size = stored_size = 0
+        error = f"{type(e).__name__}: {e}"
+    after = _cache_stats()
+    cache_counts = {name: after[name] - before[name] for name in ("hits", "misses", "evictions") if name in after}
+    profile = stats = None
+    if GeneratorProfile.enabled:
+        stats = GeneratorProfile.collect_stats()
+        profile = GeneratorProfile.report()
+        GeneratorProfile.reset()
+    return FileResult(excel_file, event_count, dict(GeneratorLog.counters) if error is None else {}, cache_counts, error, profile, stats,
+                      ics, size, stored_size)
+
+def run_batch(tasks, term_start_date, term_end_date, default_travel_time=30, workers=None, chunksize=4, offline=False, recurring=False, worker_log_level=logging.WARNING, cache_bytes=SectionCache.DEFAULT_MAX_BYTES, profile=False, bundle=None, output_dir="output"):
+    """
+    使用进程池批量生成课程表
+    :param worker_log_level: 工作进程的日志级别
+    :param cache_bytes: 每个工作进程的课程时间段缓存大小上限（字节），0表示不缓存
+    :param profile: 记录各阶段耗时，工作进程的结果汇总到本进程的GeneratorProfile中
+    :param bundle: 打包方式（zip、tar.gz、gzip），None时每个课表写一个ics文件
+    :param output_dir: 输出目录，压缩包和索引写入该目录，条目名为ics文件相对于该目录的路径
+    :return: (成功数量, 事件总数, 上课次数计数, 课程时间段缓存的命中/未命中/淘汰次数, 失败列表[(xlsx路径, 错误信息)])
+    """
+    if profile:
+        GeneratorProfile.start()
+    holidays, workdays = CurriculumGenerator.get_holidays_and_workdays(term_start_date, term_end_date, offline)
+    calendar = TermCalendar.term_calendar(term_start_date, term_end_date, holidays, workdays)
+
+    succeeded = 0
+    total_events = 0
+    failures = []
+    counts = collections.Counter()
+    cache_counts = collections.Counter()
+    sink = BundleWriter.open_bundle(bundle, output_dir) if bundle else None
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(calendar, default_travel_time, recurring, worker_log_level, cache_bytes, profile, bundle),
+    ) as executor:
+        try:
+            for (_, output_file), result in zip(tasks, executor.map(generate_one, tasks, chunksize=chunksize)):
+                cache_counts.update(result.cache_counts)
+                if result.profile is not None:
+                    GeneratorProfile.merge(result.profile)
+                    GeneratorProfile.merge_stats(result.stats)
+                if result.error is None:
+                    succeeded += 1
+                    total_events += result.event_count
+                    counts.update(result.counts)
+                    if sink is not None:
+                        name = os.path.relpath(output_file, output_dir).replace(os.sep, "/")
+                        with GeneratorProfile.phase("bundle"):
+                            if result.data is not None:
+                                sink.add(name, result.data, result.event_count)
+                            else:
+                                sink.record_file(name, result.size, result.stored_size, result.event_count)
+                    log.debug("[完成] %s (%d个事件)", result.excel_file, result.event_count)
+                else:
+                    failures.append((result.excel_file, result.error))
+                    log.warning("[失败] %s: %s", result.excel_file, result.error)
+        except BaseException:
+            if sink is not None:
+                sink.__exit__(*sys.exc_info())
+            raise
+    if sink is not None:
+        with GeneratorProfile.phase("bundle"):
+            index_path = sink.close()
+        log.info("已打包输出: %s，索引: %s", os.path.join(output_dir, sink.archive) if sink.archive else output_dir, index_path)
+    return succeeded, total_events, counts, cache_counts, failures
+
+def main():
+    """批量模式入口"""
+    parser = argparse.ArgumentParser(description="批量将xlsx课表转换为ics日历")
+    parser.add_argument("source", help="包含xlsx课表（或.jsonl中间格式文件）的目录，或清单文件")
+    parser.add_argument("term_start", help="学期开始日期 YYYYMMDD（第一周的周一）")
+    parser.add_argument("term_end", help="学期结束日期 YYYYMMDD（最后一周的周末）")
+    parser.add_argument("-o", "--output", default="output", help="输出目录，默认为 ./output")
+    parser.add_argument("-t", "--travel-time", type=int, default=30, help="路程时间提醒（分钟），默认30")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="工作进程数量，默认为CPU核数")
+    parser.add_argument("--offline", action="store_true", help="不访问网络，只使用本地缓存和内置的节假日信息")
+    parser.add_argument("--recurring", action="store_true", help="每门课程输出一个重复事件（RRULE），而不是每次上课一个事件")
+    parser.add_argument("--cache-size", type=float, default=SectionCache.DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help=f"每个工作进程的课程时间段缓存大小（MB），0表示不缓存，默认{SectionCache.DEFAULT_MAX_BYTES // 1024 // 1024}")
+    parser.add_argument("--bundle", choices=BundleWriter.BUNDLE_KINDS,
+                        help=f"打包输出：zip/tar.gz将全部日历写入输出目录下的一个压缩包（{BundleWriter.BUNDLE_NAME}.zip等），gzip将每个日历写为.ics.gz文件；同时生成学生→条目位置的索引")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_PREFIX, metavar="前缀",
+                        help=f"汇总各阶段的耗时，保存为<前缀>.profile.json和cProfile统计<前缀>.prof，默认前缀为{PROFILE_PREFIX}")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出警告、错误和最终汇总")
+    parser.add_argument("--log-level", default="info", choices=sorted(GeneratorLog.LEVELS), help="日志级别，默认为info；debug会输出每个文件和每次上课的明细")
+    parser.add_argument("--log-json", help="同时以JSON Lines格式写入日志文件（只包含主进程的日志）")
+    args = parser.parse_args()
+
+    try:
+        term_start_date = CurriculumGenerator.parse_term_date(args.term_start)
+        term_end_date = CurriculumGenerator.parse_term_date(args.term_end)
+    except ValueError:
+        parser.error("日期格式必须为YYYYMMDD")
+    if args.travel_time < 0:
+        parser.error("路程时间提醒必须是正整数")
+    if args.workers is not None and args.workers < 1:
+        parser.error("工作进程数量必须大于0")
+    if args.cache_size < 0:
+        parser.error("缓存大小不能为负数")
+
+    log_level = logging.WARNING if args.quiet else GeneratorLog.parse_level(args.log_level)
+    GeneratorLog.configure(log_level, args.log_json)
+    # 工作进程中逐次上课的明细只在debug级别输出
+    worker_log_level = logging.DEBUG if log_level == logging.DEBUG else logging.WARNING
+
+    try:
+        tasks = collect_tasks(args.source, args.output)
+    except (OSError, ValueError) as e:
+        log.error("错误：无法读取输入 - %s", e)
+        sys.exit(1)
+    if not tasks:
+        log.error("错误：没有找到需要处理的课表文件")
+        sys.exit(1)
+
+    log.info("共%d个课表，输出目录: %s", len(tasks), os.path.abspath(args.output))
+    started = time.perf_counter()
+    succeeded, total_events, counts, cache_counts, failures = run_batch(
+        tasks, term_start_date, term_end_date, args.travel_time, args.workers,
+        offline=args.offline, recurring=args.recurring, worker_log_level=worker_log_level,
+        cache_bytes=int(args.cache_size * 1024 * 1024), profile=args.profile is not None,
+        bundle=args.bundle, output_dir=args.output)
+    elapsed = time.perf_counter() - started
+
+    # 汇总总是输出
+    print(f"处理完成: 成功{succeeded}个，失败{len(failures)}个，共{total_events}个日历事件")
+    print(f"耗时{elapsed:.2f}秒，{len(tasks) / elapsed:.1f}个课表/秒，{total_events / elapsed:.0f}个事件/秒")
+    if cache_counts["hits"] or cache_counts["misses"]:
+        print(f"课程时间段缓存: 命中{cache_counts['hits']}次，未命中{cache_counts['misses']}次，"
+              f"命中率{SectionCache.hit_rate(cache_counts):.1%}，淘汰{cache_counts['evictions']}个")
+    GeneratorLog.log_counters(counts)
+    if args.profile is not None:
+        try:
+            paths = GeneratorProfile.save(args.profile, {"total": {"wall": round(elapsed, 6)}, "files": len(tasks)})
+        except OSError as e:
+            log.error("错误：无法保存性能分析结果 - %s", e)
+        else:
+            for line in GeneratorProfile.format_report():
+                print(line)
+            print(f"性能分析结果已保存为: {'、'.join(paths)}")
+    if failures:
+        print("失败的文件:")
+        for excel_file, error in failures:
+            print(f"  {excel_file}: {error}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
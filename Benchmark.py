@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程表生成器基准测试
+对示例课表和不同规模的合成课表，分别测量每个阶段的耗时和内存峰值：
+    load    读取工作簿（ScheduleLoader.load_schedule_grid）
+    parse   解析单元格（CurriculumGenerator.parse_grid），同时统计每个单元格的正则扫描次数
+    expand  展开每一次上课（CurriculumGenerator.build_curriculum_from_records）
+    render  生成ics文本（Curriculum.get_ics_text）
+耗时为多次运行中的最小值；内存峰值在单独的一次运行中用tracemalloc测量，不影响耗时
+与机器无关的检查（每个场景的事件数量、每个单元格的正则扫描次数）保存在仓库中的data/benchmark/baseline.json；
+耗时和内存峰值与机器有关，只能保存为本机的基线（默认为不纳入版本控制的data/benchmark/baseline.local.json），
+之后的运行与本机基线比较，超出容差的阶段视为性能退化
+另外在新的解释器中测量启动耗时（导入CurriculumGenerator），超出预算或者在节假日缓存有效时
+导入了openpyxl、requests等重量级模块都视为退化
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+
+import CourseParser
+import CurriculumGenerator
+import GeneratorLog
+import HolidayProvider
+import ScheduleLoader
+import SyntheticWorkbook
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKS = os.path.join(BASE_DIR, "data", "benchmark", "baseline.json")
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "data", "benchmark", "baseline.local.json")
+SAMPLE_WORKBOOK = os.path.join(BASE_DIR, "export.xlsx")
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 28)
+TRAVEL_TIME = 30
+
+STAGES = ("load", "parse", "expand", "render")
+
+# 场景名称 → 合成课表参数，None表示使用示例课表export.xlsx
+SCENARIOS = {
+    "sample": None,
+    "small": {"courses_per_week": 12, "special_cells": 4, "seed": 1},
+    "medium": {"courses_per_week": 40, "special_cells": 6, "seed": 2},
+    "large": {"courses_per_week": 160, "special_cells": 12, "seed": 3},
+}
+
+# 解析阶段每个单元格最多扫描一遍正则（内容相同的单元格只解析一次，因此可能小于1）
+MAX_SCANS_PER_CELL = 1
+
+# 耗时低于此值（秒）的差异视为测量噪声，不判定为退化
+TIME_NOISE_FLOOR = 0.001
+
+DEFAULT_STARTUP_BUDGET = 0.1   # 导入CurriculumGenerator的耗时上限（秒）
+# 只在读取工作簿或联网时才需要的模块，启动和使用有效缓存获取节假日时不应导入
+HEAVY_MODULES = ("openpyxl", "requests", "urllib3", "concurrent.futures")
+
+# 在新的解释器中运行：测量导入耗时，再用有效的缓存获取节假日，输出此时已导入的重量级模块
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import CurriculumGenerator
+elapsed = time.perf_counter() - started
+import datetime, tempfile, HolidayProvider
+start, end = (datetime.date.fromisoformat(value) for value in sys.argv[1:3])
+with tempfile.TemporaryDirectory() as cache_dir:
+    for year in range(start.year, end.year + 1):
+        HolidayProvider.write_cached_year(HolidayProvider.load_bundled_year(year), cache_dir)
+    HolidayProvider.get_holidays_and_workdays(start, end, cache_dir=cache_dir)
+print(json.dumps({"import": elapsed, "modules": [name for name in sys.argv[3:] if name in sys.modules]}))
+"""
+
+def load_term_holidays():
+    """只使用内置的节假日数据，保证每次运行的输入相同"""
+    with tempfile.TemporaryDirectory() as empty_cache:
+        return HolidayProvider.get_holidays_and_workdays(TERM_START, TERM_END, offline=True, cache_dir=empty_cache)
+
+def run_stages(path, holidays, workdays, recurring=False, measure=None):
+    """
+    依次执行各阶段
+    :param measure: 上下文管理器工厂，以阶段名为参数，包裹每个阶段的执行
+    :return: (生成的日历事件数量, 单元格数量, 解析时扫描单元格文本的正则次数)
+    """
+    with measure("load"):
+        grid = ScheduleLoader.load_schedule_grid(path)
+    scans = CourseParser.scan_count
+    with measure("parse"):
+        parsed_cells = CurriculumGenerator.parse_grid(grid)
+    scans = CourseParser.scan_count - scans
+    with measure("expand"):
+        curriculum, _ = CurriculumGenerator.build_curriculum_from_records(
+            parsed_cells, TERM_START, TERM_END, holidays, workdays, TRAVEL_TIME, recurring)
+    with measure("render"):
+        curriculum.get_ics_text()
+    return len(curriculum.__courses__), len(grid), scans
+
+class _Timer:
+    """记录每个阶段的耗时"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self._stage = None
+
+    def __call__(self, stage):
+        self._stage = stage
+        return self
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.samples[self._stage].append(time.perf_counter() - self._started)
+
+class _PeakMemory:
+    """记录每个阶段相对于阶段开始时的tracemalloc内存峰值"""
+
+    def __init__(self):
+        self.peaks = {}
+        self._stage = None
+
+    def __call__(self, stage):
+        self._stage = stage
+        return self
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self._current = tracemalloc.get_traced_memory()[0]
+
+    def __exit__(self, *exc_info):
+        self.peaks[self._stage] = tracemalloc.get_traced_memory()[1] - self._current
+
+def benchmark_scenario(path, holidays, workdays, repeat=5, recurring=False):
+    """
+    测量一个课表的各阶段
+    :return: {"events": 事件数量, "scans_per_cell": 每个单元格的正则扫描次数,
+              "stages": {阶段: {"time": 最小耗时, "median": 中位耗时, "peak": 内存峰值字节数}}}
+    """
+    timer = _Timer()
+    event_count = cell_count = scans = None
+    for _ in range(repeat):
+        event_count, cell_count, scans = run_stages(path, holidays, workdays, recurring, timer)
+
+    memory = _PeakMemory()
+    tracemalloc.start()
+    try:
+        run_stages(path, holidays, workdays, recurring, memory)
+    finally:
+        tracemalloc.stop()
+
+    stages = {}
+    for stage in STAGES:
+        stages[stage] = {
+            "time": round(min(timer.samples[stage]), 6),
+            "median": round(statistics.median(timer.samples[stage]), 6),
+            "peak": memory.peaks[stage],
+        }
+    return {"events": event_count, "scans_per_cell": round(scans / cell_count, 3) if cell_count else 0.0, "stages": stages}
+
+def run_benchmark(scenario_names, repeat=5, recurring=False, work_dir=None):
+    """
+    运行指定的场景
+    :param work_dir: 存放合成课表的目录，默认为临时目录
+    :return: {场景名: benchmark_scenario的结果}
+    """
+    holidays, workdays = load_term_holidays()
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = work_dir or temp_dir
+        for name in scenario_names:
+            params = SCENARIOS[name]
+            if params is None:
+                path = SAMPLE_WORKBOOK
+            else:
+                path = os.path.join(work_dir, f"benchmark_{name}.xlsx")
+                SyntheticWorkbook.generate_workbook(path, **params)
+            key = f"{name}+recurring" if recurring else name
+            results[key] = benchmark_scenario(path, holidays, workdays, repeat, recurring)
+    return results
+
+def measure_startup(repeat=5):
+    """
+    在新的解释器中测量启动耗时
+    :return: {"import": 最小导入耗时, "modules": 导入了的重量级模块}
+    """
+    samples = []
+    modules = set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, TERM_START.isoformat(), TERM_END.isoformat(), *HEAVY_MODULES],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        samples.append(result["import"])
+        modules.update(result["modules"])
+    return {"import": min(samples), "modules": sorted(modules)}
+
+def check_startup(startup, budget):
+    """
+    检查启动耗时
+    :return: (报告行, 退化列表)
+    """
+    regressions = []
+    if startup["import"] > budget:
+        regressions.append(f"启动: 导入耗时 {startup['import'] * 1000:.1f}ms 超出预算 {budget * 1000:.0f}ms")
+    if startup["modules"]:
+        regressions.append(f"启动: 使用有效的节假日缓存时导入了 {', '.join(startup['modules'])}")
+    line = f"启动耗时 {startup['import'] * 1000:.1f}ms（预算 {budget * 1000:.0f}ms）"
+    return line, regressions
+
+# 报告各列的显示宽度，前两列左对齐，其余右对齐
+COLUMN_WIDTHS = (18, 8, 10, 10, 11, 10, 8, 15)
+
+def _display_width(text):
+    return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+def _format_row(values):
+    """按显示宽度对齐一行报告（中文字符占两列）"""
+    cells = []
+    for index, (value, width) in enumerate(zip(values, COLUMN_WIDTHS)):
+        padding = " " * max(width - _display_width(value), 1 if index else 0)
+        cells.append(value + padding if index < 2 else padding + value)
+    return "".join(cells)
+
+def compare(results, baseline, checks, tolerance):
+    """
+    与基线比较
+    :param baseline: 本机的耗时和内存基线，{场景名: benchmark_scenario的结果}
+    :param checks: 与机器无关的检查，{场景名: {"events": 事件数量, ...}}，没有的场景以本机基线中的事件数量为准
+    :param tolerance: 允许的相对增长，如0.25表示增长超过25%视为退化
+    :return: (报告行列表, 退化列表)
+    """
+    lines = []
+    regressions = []
+    scan_lines = []
+    lines.append(_format_row(("场景", "阶段", "耗时(ms)", "中位(ms)", "峰值(KiB)", "基线(ms)", "变化", "基线峰值(KiB)")))
+    for scenario, result in results.items():
+        base_result = baseline.get(scenario)
+        expected = checks.get(scenario, base_result)
+        if expected is not None and expected["events"] != result["events"]:
+            regressions.append(f"{scenario}: 事件数量由{expected['events']}变为{result['events']}")
+        scans = result.get("scans_per_cell")
+        if scans is not None:
+            scan_lines.append(f"{scenario} {scans:g}")
+            if scans > MAX_SCANS_PER_CELL:
+                regressions.append(f"{scenario}: 每个单元格的正则扫描次数为{scans:g}，应不超过{MAX_SCANS_PER_CELL}")
+        for stage, measured in result["stages"].items():
+            base = base_result["stages"].get(stage) if base_result else None
+            base_time = change = base_peak = ""
+            if base:
+                base_time = f"{base['time'] * 1000:.2f}"
+                change = f"{(measured['time'] / base['time'] - 1) * 100:+.0f}%" if base["time"] else ""
+                base_peak = f"{base['peak'] / 1024:.0f}"
+                if measured["time"] > base["time"] * (1 + tolerance) and measured["time"] - base["time"] > TIME_NOISE_FLOOR:
+                    regressions.append(f"{scenario}/{stage}: 耗时 {base['time'] * 1000:.2f}ms → {measured['time'] * 1000:.2f}ms")
+                if measured["peak"] > base["peak"] * (1 + tolerance):
+                    regressions.append(f"{scenario}/{stage}: 内存峰值 {base['peak'] / 1024:.0f}KiB → {measured['peak'] / 1024:.0f}KiB")
+            lines.append(_format_row((
+                scenario, stage, f"{measured['time'] * 1000:.2f}", f"{measured['median'] * 1000:.2f}",
+                f"{measured['peak'] / 1024:.0f}", base_time, change, base_peak,
+            )))
+    if scan_lines:
+        lines.append("每个单元格的正则扫描次数: " + "，".join(scan_lines))
+    return lines, regressions
+
+def load_baseline(path):
+    """读取基线文件，不存在时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf8") as fp:
+        return json.load(fp).get("results", {})
+
+def save_baseline(path, results):
+    """将结果保存为本机基线，已有基线中的其他场景保留"""
+    merged = load_baseline(path)
+    merged.update(results)
+    _write_json(path, {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": merged,
+    })
+
+def save_checks(path, results):
+    """只保存与机器无关的检查项（事件数量、每个单元格的正则扫描次数），已有的其他场景保留"""
+    merged = load_baseline(path)
+    for scenario, result in results.items():
+        merged[scenario] = {key: result[key] for key in ("events", "scans_per_cell") if key in result}
+    _write_json(path, {"results": merged})
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf8") as fp:
+        json.dump(data, fp, ensure_ascii=False, indent=2, sort_keys=True)
+        fp.write("\n")
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="课程表生成器各阶段的耗时和内存基准测试")
+    parser.add_argument("scenarios", nargs="*", metavar="场景", help=f"要运行的场景，默认全部：{', '.join(SCENARIOS)}")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="每个场景的重复次数，取最小耗时，默认5")
+    parser.add_argument("--recurring", action="store_true", help="测量重复事件（RRULE）输出模式")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="本机耗时和内存基线的路径，默认不纳入版本控制")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为本机基线")
+    parser.add_argument("--checks", default=DEFAULT_CHECKS, help="与机器无关的检查项（事件数量等）的路径")
+    parser.add_argument("--save-checks", action="store_true", help="将本次的事件数量和正则扫描次数保存为检查项（输出有意改变时使用）")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对增长，默认0.25（25%%）")
+    parser.add_argument("--json", dest="json_path", help="将本次结果写入JSON文件")
+    parser.add_argument("--startup-budget", type=float, default=DEFAULT_STARTUP_BUDGET * 1000,
+                        help=f"启动（导入）耗时上限（毫秒），默认{DEFAULT_STARTUP_BUDGET * 1000:.0f}")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("重复次数必须大于0")
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}")
+
+    GeneratorLog.configure(logging.WARNING)
+    # 各阶段的耗时按单个课表测量，不使用跨课表的课程时间段缓存（重复运行时会全部命中，并把渲染移到展开阶段）
+    CurriculumGenerator.section_cache = None
+    results = run_benchmark(args.scenarios or list(SCENARIOS), args.repeat, args.recurring)
+
+    startup_line, startup_regressions = check_startup(measure_startup(args.repeat), args.startup_budget / 1000)
+
+    baseline = {} if args.save_baseline else load_baseline(args.baseline)
+    checks = {} if args.save_checks else load_baseline(args.checks)
+    lines, regressions = compare(results, baseline, checks, args.tolerance)
+    regressions = startup_regressions + regressions
+    for line in lines:
+        print(line)
+    print(startup_line)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf8") as fp:
+            json.dump(results, fp, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.save_checks:
+        save_checks(args.checks, results)
+        print(f"检查项已保存: {args.checks}")
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"基线已保存: {args.baseline}")
+    if args.save_checks or args.save_baseline:
+        return
+    if not baseline:
+        print(f"没有本机基线（{args.baseline}），只检查事件数量、正则扫描次数和启动耗时，可使用 --save-baseline 保存")
+    if regressions:
+        print(f"性能退化（容差{args.tolerance:.0%}）:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("与基线相比没有退化" if baseline else "没有退化")
+
+if __name__ == "__main__":
+    main()
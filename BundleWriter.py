@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量生成结果的打包输出
+大量小的ics文件逐个写入时，文件系统的开销（创建文件、分配inode）远大于写入内容本身。
+这里把一批日历依次写入一个压缩包，或每个日历写为一个gzip文件，并生成索引：
+    zip     一个ZIP文件（DEFLATE压缩），索引中的偏移为条目本地文件头在ZIP文件中的位置
+    tar.gz  一个gzip压缩的tar文件，索引中的偏移为条目内容在解压后的tar流中的位置
+    gzip    每个日历一个.ics.gz文件，偏移为0
+索引为压缩包旁边的<压缩包>.index.json：
+    {"format": "sustech-curriculum-bundle", "version": 1, "kind": "zip", "archive": "calendars.zip",
+     "entries": {"<学生>": {"name": 条目名, "offset": 偏移, "size": 原始大小, "stored_size": 压缩后大小, "events": 事件数量}}}
+压缩包先写入临时文件，全部写完后原子替换，中途失败不会留下不完整的压缩包
+"""
+
+import abc
+import gzip
+import io
+import json
+import os
+import tarfile
+import time
+import uuid
+import zipfile
+from typing import NamedTuple
+
+import AtomicFile
+
+BUNDLE_KINDS = ("zip", "tar.gz", "gzip")
+BUNDLE_NAME = "calendars"
+INDEX_FORMAT = "sustech-curriculum-bundle"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+GZIP_SUFFIX = ".gz"
+
+class IndexEntry(NamedTuple):
+    """索引中的一个日历"""
+    name: str          # 压缩包中的条目名，或gzip文件相对于输出目录的路径
+    offset: int        # 见模块说明
+    size: int          # 原始ics内容的字节数
+    stored_size: int   # 压缩后的字节数（tar.gz整体压缩，与原始大小相同）
+    events: int        # 事件数量
+
+def entry_key(name):
+    """条目名对应的索引键：去掉.ics扩展名，如 "students/s001.ics" → "students/s001" """
+    return name[:-4] if name.endswith(".ics") else name
+
+def gzip_bytes(data):
+    """gzip压缩，文件头不包含时间，相同内容的压缩结果相同"""
+    return gzip.compress(data, mtime=0)
+
+class Bundle(abc.ABC):
+    """打包输出的基类：记录索引，结束时写入索引文件"""
+
+    kind = None
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.entries = {}
+        self.archive = None   # 压缩包的文件名，gzip方式为None
+
+    @property
+    def index_path(self):
+        return os.path.join(self.output_dir, (self.archive or BUNDLE_NAME) + INDEX_SUFFIX)
+
+    def record(self, name, offset, size, stored_size, events, key=None):
+        """
+        记录一个已写入的日历
+        :param key: 索引键，默认由name得到
+        """
+        key = key or entry_key(name)
+        if key in self.entries:
+            raise ValueError(f"重复的条目: {name}")
+        self.entries[key] = IndexEntry(name, offset, size, stored_size, events)
+
+    @abc.abstractmethod
+    def add(self, name, data, events):
+        """
+        写入一个日历
+        :param name: 条目名（相对路径，以/分隔）
+        :param data: UTF-8编码的ics内容
+        """
+
+    def _finish(self):
+        """完成压缩包的写入"""
+
+    def _abort(self):
+        """放弃写入，删除临时文件"""
+
+    def close(self):
+        """
+        完成写入并保存索引
+        :return: 索引文件路径
+        """
+        self._finish()
+        index = {"format": INDEX_FORMAT, "version": INDEX_VERSION, "kind": self.kind, "archive": self.archive,
+                 "entries": {key: entry._asdict() for key, entry in sorted(self.entries.items())}}
+        AtomicFile.write_atomic(self.index_path, json.dumps(index, ensure_ascii=False, indent=1).encode("utf8"))
+        return self.index_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+        return False
+
+class _ArchiveBundle(Bundle):
+    """写入单个压缩包：先写临时文件，完成后原子替换"""
+
+    suffix = None
+
+    def __init__(self, output_dir):
+        super().__init__(output_dir)
+        self.archive = BUNDLE_NAME + self.suffix
+        self.path = os.path.join(output_dir, self.archive)
+        self._temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self._fp = open(self._temp_path, "xb")
+
+    @abc.abstractmethod
+    def _close_archive(self):
+        """关闭压缩包对象，写完压缩包的结尾"""
+
+    def _finish(self):
+        try:
+            self._close_archive()
+            self._fp.close()
+            os.replace(self._temp_path, self.path)
+        except BaseException:
+            self._abort()
+            raise
+
+    def _abort(self):
+        try:
+            # 关闭压缩包对象（写入的内容随临时文件删除），避免其在回收时写入已关闭的文件
+            self._close_archive()
+        except Exception:
+            pass
+        self._fp.close()
+        if os.path.exists(self._temp_path):
+            os.unlink(self._temp_path)
+
+class ZipBundle(_ArchiveBundle):
+    kind = "zip"
+    suffix = ".zip"
+
+    def __init__(self, output_dir, compresslevel=6):
+        super().__init__(output_dir)
+        self._zip = zipfile.ZipFile(self._fp, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self._date_time = time.localtime()[:6]
+
+    def add(self, name, data, events):
+        info = zipfile.ZipInfo(name, self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self._zip.writestr(info, data)
+        self.record(name, info.header_offset, info.file_size, info.compress_size, events)
+
+    def _close_archive(self):
+        self._zip.close()
+
+class TarGzBundle(_ArchiveBundle):
+    kind = "tar.gz"
+    suffix = ".tar.gz"
+
+    def __init__(self, output_dir, compresslevel=6):
+        super().__init__(output_dir)
+        self._tar = tarfile.open(fileobj=self._fp, mode="w:gz", compresslevel=compresslevel)
+        self._mtime = int(time.time())
+
+    def add(self, name, data, events):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self._mtime
+        info.mode = 0o644
+        # gzip流中无法直接定位，记录条目内容在解压后的tar流中的位置（文件头之后，含中文名时的PAX扩展头）
+        header = info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors)
+        offset = self._tar.offset + len(header)
+        self._tar.addfile(info, io.BytesIO(data))
+        self.record(name, offset, info.size, info.size, events)
+
+    def _close_archive(self):
+        self._tar.close()
+
+class GzipBundle(Bundle):
+    """每个日历写为一个.ics.gz文件（可在工作进程中并行压缩和写入，再调用record）"""
+    kind = "gzip"
+
+    def add(self, name, data, events):
+        compressed = gzip_bytes(data)
+        path = os.path.join(self.output_dir, name + GZIP_SUFFIX)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        AtomicFile.write_atomic(path, compressed)
+        self.record_file(name, len(data), len(compressed), events)
+
+    def record_file(self, name, size, stored_size, events):
+        """记录已写入的<name>.gz文件"""
+        self.record(name + GZIP_SUFFIX, 0, size, stored_size, events, key=entry_key(name))
+
+def open_bundle(kind, output_dir):
+    """创建指定方式的打包输出"""
+    os.makedirs(output_dir, exist_ok=True)
+    if kind == "zip":
+        return ZipBundle(output_dir)
+    if kind == "tar.gz":
+        return TarGzBundle(output_dir)
+    if kind == "gzip":
+        return GzipBundle(output_dir)
+    raise ValueError(f"未知的打包方式: {kind}（可选 {', '.join(BUNDLE_KINDS)}）")
+
+def load_index(index_path):
+    """读取索引文件，格式不支持时抛出ValueError"""
+    with open(index_path, encoding="utf8") as fp:
+        index = json.load(fp)
+    if index.get("format") != INDEX_FORMAT or index.get("version") != INDEX_VERSION:
+        raise ValueError("不支持的索引文件格式")
+    return index
+
+def read_entry(index_path, key):
+    """
+    按索引读取一个学生的日历
+    :return: UTF-8编码的ics内容
+    :raises KeyError: 索引中没有该学生
+    """
+    index = load_index(index_path)
+    entry = index["entries"][key]
+    base_dir = os.path.dirname(index_path)
+    if index["kind"] == "gzip":
+        with gzip.open(os.path.join(base_dir, entry["name"]), "rb") as fp:
+            return fp.read()
+    archive = os.path.join(base_dir, index["archive"])
+    if index["kind"] == "zip":
+        with zipfile.ZipFile(archive) as bundle:
+            return bundle.read(entry["name"])
+    with gzip.open(archive, "rb") as fp:
+        fp.seek(entry["offset"])
+        return fp.read(entry["size"])
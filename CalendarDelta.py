@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日历增量更新
+与上一次生成的ics文件比较，找出新增、修改和删除的事件：
+- 事件按UID对应（UID由课程标识生成，见Curriculum.event_uid），比较除时间戳和SEQUENCE外的全部内容
+- 修改的事件SEQUENCE加1，未修改的事件保留原来的SEQUENCE；两者都保留原来的CREATED
+- 增量更新分为两个日历，分别保存为两个文件（很多客户端只导入文件中的第一个日历）：
+  新增和修改的事件（METHOD:PUBLISH），已删除事件的取消通知（METHOD:CANCEL）
+"""
+
+import hashlib
+import re
+from typing import NamedTuple, Optional
+
+from Curriculum import ICS_NEWLINE, content_line, fold_line
+
+# 每次生成都会变化、不参与比较的属性
+VOLATILE_PROPERTIES = frozenset(("DTSTAMP", "CREATED", "LAST-MODIFIED", "SEQUENCE"))
+# 取消通知中从原事件复制的属性
+CANCEL_PROPERTIES = ("SUMMARY", "DTSTART", "DTEND", "RRULE")
+
+PROPERTY_NAME_PATTERN = re.compile(r"[A-Za-z0-9-]+")
+
+class PreviousEvent(NamedTuple):
+    """上一次输出中的一个事件"""
+    uid: str
+    sequence: int
+    created: Optional[str]   # CREATED的值
+    fingerprint: str         # 除时间戳和SEQUENCE外全部内容的摘要
+    properties: dict         # 事件本身（不含提醒）的属性名 → 内容行
+
+class DeltaResult(NamedTuple):
+    """比较结果"""
+    added: list              # 新增事件的UID
+    modified: list           # 修改事件的UID
+    unchanged: int           # 未变化的事件数量
+    removed: list            # 已删除的PreviousEvent
+
+    @property
+    def changed(self):
+        return bool(self.added or self.modified or self.removed)
+
+def property_name(line):
+    match = PROPERTY_NAME_PATTERN.match(line)
+    return match.group(0).upper() if match else ""
+
+def unfold(text):
+    """展开折行，返回内容行列表"""
+    text = text.replace("\r\n", "\n")
+    return [line for line in text.replace("\n ", "").replace("\n\t", "").split("\n") if line]
+
+def fingerprint(lines):
+    """
+    一个事件的内容摘要
+    :param lines: 事件的内容行（已展开折行），包括BEGIN/END和其中的提醒
+    """
+    digest = hashlib.sha1()
+    depth = 0
+    for line in lines:
+        name = property_name(line)
+        if name == "BEGIN":
+            depth += 1
+        elif name == "END":
+            depth -= 1
+        elif depth == 1 and name in VOLATILE_PROPERTIES:
+            continue
+        digest.update(line.encode("utf8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def parse_events(text):
+    """
+    读取ics文本中的全部事件
+    :return: {UID: PreviousEvent}
+    """
+    events = {}
+    current = None
+    depth = 0
+    for line in unfold(text):
+        name = property_name(line)
+        if current is None:
+            if line.upper() == "BEGIN:VEVENT":
+                current = [line]
+                depth = 1
+            continue
+        current.append(line)
+        if name == "BEGIN":
+            depth += 1
+        elif name == "END":
+            depth -= 1
+            if depth == 0:
+                _add_event(events, current)
+                current = None
+    return events
+
+def _add_event(events, lines):
+    properties = {}
+    depth = 0
+    for line in lines:
+        name = property_name(line)
+        if name == "BEGIN":
+            depth += 1
+        elif name == "END":
+            depth -= 1
+        elif depth == 1:
+            properties.setdefault(name, line)
+    uid_line = properties.get("UID")
+    if uid_line is None:
+        return
+    uid = uid_line.split(":", 1)[1]
+    try:
+        sequence = int(properties.get("SEQUENCE", "SEQUENCE:0").split(":", 1)[1])
+    except ValueError:
+        sequence = 0
+    created = properties["CREATED"].split(":", 1)[1] if "CREATED" in properties else None
+    events[uid] = PreviousEvent(uid, sequence, created, fingerprint(lines), properties)
+
+def apply_previous(curriculum, previous_events):
+    """
+    与上一次的事件比较，设置每个事件的SEQUENCE和CREATED
+    :param previous_events: parse_events的返回值
+    :return: DeltaResult
+    """
+    added = []
+    modified = []
+    unchanged = 0
+    timestamp = curriculum.timestamp
+    current_uids = set()
+    for uid, course in curriculum.iter_events():
+        current_uids.add(uid)
+        previous = previous_events.get(uid)
+        if previous is None:
+            added.append(uid)
+            continue
+        course.created = previous.created
+        lines = [line.replace(ICS_NEWLINE + " ", "") for line in course.iter_lines(uid, timestamp)]
+        if fingerprint(lines) == previous.fingerprint:
+            course.sequence = previous.sequence
+            unchanged += 1
+        else:
+            course.sequence = previous.sequence + 1
+            modified.append(uid)
+    removed = [event for uid, event in previous_events.items() if uid not in current_uids]
+    return DeltaResult(added, modified, unchanged, removed)
+
+def iter_publish_chunks(curriculum, result):
+    """流式生成新增和修改的事件组成的METHOD:PUBLISH日历，没有这样的事件时不产生内容"""
+    if result.added or result.modified:
+        yield from curriculum.iter_ics_chunks("PUBLISH", set(result.added) | set(result.modified))
+
+def iter_cancel_chunks(curriculum, result):
+    """流式生成已删除事件的METHOD:CANCEL日历（SEQUENCE加1，STATUS:CANCELLED），没有删除的事件时不产生内容"""
+    if not result.removed:
+        return
+    timestamp = curriculum.timestamp
+    yield "BEGIN:VCALENDAR" + ICS_NEWLINE
+    yield "VERSION:2.0" + ICS_NEWLINE
+    yield content_line("METHOD", "CANCEL") + ICS_NEWLINE
+    yield content_line("X-WR-CALNAME", curriculum.calendar_name) + ICS_NEWLINE
+    for event in result.removed:
+        lines = ["BEGIN:VEVENT", content_line("UID", event.uid)]
+        lines.extend(fold_line(event.properties[name]) for name in CANCEL_PROPERTIES if name in event.properties)
+        lines.append(content_line("DTSTAMP", timestamp))
+        lines.append(content_line("SEQUENCE", str(event.sequence + 1)))
+        lines.append(content_line("STATUS", "CANCELLED"))
+        lines.append("END:VEVENT")
+        yield "".join(line + ICS_NEWLINE for line in lines)
+    yield "END:VCALENDAR" + ICS_NEWLINE
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重复单元格和重复课程的合并
+导出的课表中，跨多个节次的课程（合并单元格、[1-8节]这样的多节课）常在同一列的每一行各出现一次。
+这里在展开之前去掉重复：
+- 解析前按单元格文本判断内容相同的单元格，每种文本只解析一次
+- 解析后每门课程按(星期, 课程名, 教学班, 周次, 地点)和节次归并为课程时间段：
+  节次被已有时间段包含的为重复，直接丢弃；与已有时间段相邻或重叠的合并为一个时间段
+课程自身没有节次信息时（如只写了周次的实验室安全学），以所在行的节次作为它的节次
+之后的展开、渲染只与不重复的课程时间段数量有关，输出中不会再有重复的事件
+"""
+
+from typing import NamedTuple, Tuple
+
+import CourseParser
+
+class Section(NamedTuple):
+    """一个去重后的课程时间段"""
+    day: int                    # 0=星期一, ..., 6=星期日
+    row: int                    # 第一次出现的行号
+    row_slots: Tuple[int, int]  # 覆盖的行的节次(起始节次, 结束节次)
+    record: CourseParser.CourseRecord   # 合并后的课程，自身有节次信息时节次为合并后的范围
+
+def parse_cells(grid):
+    """
+    解析单元格，文本相同的单元格只解析一次（只有空白不同的单元格分别解析，得到的课程在merge_sections中去重）
+    :param grid: ScheduleLoader.ScheduleCell列表
+    :return: [(单元格, CourseRecord列表)]，顺序与grid相同；文本相同的单元格共用同一个列表，不应修改
+    """
+    parsed = {}
+    result = []
+    for cell in grid:
+        records = parsed.get(cell.text)
+        if records is None:
+            records = parsed[cell.text] = CourseParser.parse_cell(cell.text)
+        result.append((cell, records))
+    return result
+
+def _course_key(day, record):
+    """同一门课程的标识（不含节次）"""
+    return day, record.name, record.class_info, record.week_info, record.location, record.is_special, record.time_slots is None
+
+def merge_sections(parsed_cells, counters=None):
+    """
+    将解析后的单元格归并为不重复的课程时间段
+    :param parsed_cells: [(ScheduleLoader.ScheduleCell, CourseRecord列表)]
+    :param counters: collections.Counter，累加duplicate（丢弃的重复课程）和merged（合并的相邻节次）
+    :return: Section列表，按星期、首次出现的顺序排列
+    """
+    row_slots = {}
+    sections = []
+    # 课程标识 → 最近一个时间段在sections中的位置
+    latest = {}
+    for cell, records in sorted(parsed_cells, key=lambda item: item[0].day):
+        if not records:
+            continue
+        if cell.row_header not in row_slots:
+            row_slots[cell.row_header] = CourseParser.parse_row_header(cell.row_header)
+        cell_slots = row_slots[cell.row_header]
+        for record in records:
+            slots = record.time_slots or cell_slots
+            key = _course_key(cell.day, record)
+            index = latest.get(key)
+            if index is not None:
+                section = sections[index]
+                start, end = section.record.time_slots or section.row_slots
+                if start <= slots[0] and slots[1] <= end:
+                    if counters is not None:
+                        counters["duplicate"] += 1
+                    continue
+                if slots[0] <= end + 1 and slots[1] >= start - 1:
+                    merged = (min(start, slots[0]), max(end, slots[1]))
+                    row_range = (min(section.row_slots[0], cell_slots[0]), max(section.row_slots[1], cell_slots[1]))
+                    record = section.record
+                    if record.time_slots is not None:
+                        record = record._replace(slot_start=merged[0], slot_end=merged[1])
+                    else:
+                        row_range = merged
+                    sections[index] = section._replace(row_slots=row_range, record=record)
+                    if counters is not None:
+                        counters["merged"] += 1
+                    continue
+            latest[key] = len(sections)
+            sections.append(Section(cell.day, cell.row, cell_slots, record))
+    return sections
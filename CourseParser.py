@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课表单元格解析
+单元格文本每4行描述一门课程：
+    课程名
+    [教师]
+    [教学班]
+    [周次][地点][节次]，如 [1-16周][三教205][3-4节]、[2-16双周][一教125][3-4节]、[12周][无地点][1-8节]
+整个单元格只用一个预编译的正则表达式扫描一遍，解析为CourseRecord
+"""
+
+import bisect
+import re
+from typing import NamedTuple, Optional
+
+SPECIAL_COURSE_NAME = "实验室安全学"
+UNKNOWN_LOCATION = "未知地点"
+
+# 方括号中的一项：周次、节次或其他（地点等）
+TOKEN_PATTERN = re.compile(
+    r"\[(?:"
+    r"(?P<week_start>\d+)(?:-(?P<week_end>\d+))?(?P<week_type>单|双)?周"
+    r"|(?P<slot_start>\d+)-(?P<slot_end>\d+)节"
+    r"|(?P<other>[^\]\n]*)"
+    r")\]"
+)
+ROW_HEADER_PATTERN = re.compile(r"\d+")
+
+# 用TOKEN_PATTERN扫描单元格文本的次数，基准测试用它确认每个单元格只扫描一遍
+scan_count = 0
+
+class CourseRecord(NamedTuple):
+    """一个单元格中的一门课程"""
+    name: str
+    teacher: str
+    class_info: str
+    week_start: Optional[int]   # 起始周，缺少周次信息时为None
+    week_end: Optional[int]     # 结束周
+    week_type: str              # ""=每周，"单"=单周，"双"=双周
+    slot_start: Optional[int]   # 起始节次，缺少节次信息时为None
+    slot_end: Optional[int]     # 结束节次
+    location: str               # 原始地点，如"三教205"、"无地点"
+    is_special: bool            # 是否为实验室安全学等特殊课程
+    raw_text: str               # 周次/地点/节次所在的原始行
+
+    @property
+    def week_info(self):
+        """(起始周, 结束周, 单双周)，缺少周次信息时为None"""
+        if self.week_start is None:
+            return None
+        return self.week_start, self.week_end, self.week_type
+
+    @property
+    def time_slots(self):
+        """(起始节次, 结束节次)，缺少节次信息时为None"""
+        if self.slot_start is None:
+            return None
+        return self.slot_start, self.slot_end
+
+def _strip_brackets(text):
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        return text[1:-1]
+    return text
+
+def parse_cell(text):
+    """
+    解析一个单元格，返回其中全部课程的CourseRecord列表
+    只保留课程名非空、且第4行含有方括号的课程块
+    """
+    global scan_count
+    lines = text.split("\n")
+    block_count = len(lines) // 4
+    if block_count == 0:
+        return []
+    scan_count += 1
+
+    # 各行在文本中的起始位置，用于确定每个匹配属于哪一行
+    line_offsets = []
+    offset = 0
+    for line in lines:
+        line_offsets.append(offset)
+        offset += len(line) + 1
+
+    # 每个课程块第4行的解析结果：[周次, 节次, 地点]
+    fields = [[None, None, None] for _ in range(block_count)]
+    for match in TOKEN_PATTERN.finditer(text):
+        line_index = bisect.bisect_right(line_offsets, match.start()) - 1
+        block, line_in_block = divmod(line_index, 4)
+        if line_in_block != 3 or block >= block_count:
+            continue
+        block_fields = fields[block]
+        if match.group("week_start") is not None:
+            if block_fields[0] is None:
+                week_start = int(match.group("week_start"))
+                week_end = int(match.group("week_end") or week_start)
+                block_fields[0] = (week_start, week_end, match.group("week_type") or "")
+        elif match.group("slot_start") is not None:
+            if block_fields[1] is None:
+                block_fields[1] = (int(match.group("slot_start")), int(match.group("slot_end")))
+        elif block_fields[2] is None and match.group("other"):
+            block_fields[2] = match.group("other")
+
+    records = []
+    for block in range(block_count):
+        name = lines[block * 4].strip()
+        time_location = lines[block * 4 + 3].strip()
+        if not name or "[" not in time_location:
+            continue
+        week, slots, location = fields[block]
+        week_start, week_end, week_type = week if week else (None, None, "")
+        slot_start, slot_end = slots if slots else (None, None)
+        records.append(CourseRecord(
+            name=name,
+            teacher=_strip_brackets(lines[block * 4 + 1]),
+            class_info=_strip_brackets(lines[block * 4 + 2]),
+            week_start=week_start,
+            week_end=week_end,
+            week_type=week_type,
+            slot_start=slot_start,
+            slot_end=slot_end,
+            location=location or UNKNOWN_LOCATION,
+            is_special=SPECIAL_COURSE_NAME in name,
+            raw_text=time_location,
+        ))
+    return records
+
+def parse_row_header(header):
+    """
+    解析行标题（如"第1-2节"、"第11-11节"）中的节次
+    :return: (起始节次, 结束节次)，无法解析时为(1, 2)
+    """
+    if header and "第" in str(header) and "节" in str(header):
+        numbers = ROW_HEADER_PATTERN.findall(str(header))
+        if len(numbers) >= 2:
+            return int(numbers[0]), int(numbers[1])
+        if numbers:
+            return int(numbers[0]), int(numbers[0])
+    return 1, 2
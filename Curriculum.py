@@ -1,73 +1,366 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 import datetime, uuid
+import hashlib
+import io
 from enum import Enum
+
+import AtomicFile
+
+# RFC 5545: 每行不超过75个字节（不含换行），行尾使用CRLF
+ICS_LINE_LIMIT = 75
+ICS_NEWLINE = "\r\n"
+# 需要按TEXT类型转义的属性
+TEXT_PROPERTIES = ("SUMMARY", "LOCATION", "DESCRIPTION", "X-WR-CALNAME")
+# 生成器版本：输出内容或生成逻辑变化时修改，使已缓存的输出失效
+GENERATOR_VERSION = "2.2"
+# 由课程标识生成UID的命名空间，修改会使全部事件的UID改变
+UID_NAMESPACE = uuid.UUID("9b1de2a4-51c7-4f0e-8a53-3c6f1e2d7b90")
+UID_DOMAIN = "sustech-curriculum"
+# 预渲染事件文本时代替时间戳的占位符，输出时替换为日历的时间戳
+TIMESTAMP_PLACEHOLDER = "\x00"
+
+def escape_text(value):
+    """按RFC 5545对TEXT类型的值进行转义"""
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def fold_line(line):
+    """
+    按RFC 5545折行：超过75字节的行拆分为多行，续行以一个空格开头
+    只在UTF-8字符边界处切分，不会截断多字节字符
+    """
+    if len(line) * 4 <= ICS_LINE_LIMIT:
+        return line
+    data = line.encode("utf8")
+    if len(data) <= ICS_LINE_LIMIT:
+        return line
+    parts = []
+    start = 0
+    limit = ICS_LINE_LIMIT
+    while len(data) - start > limit:
+        end = start + limit
+        while data[end] & 0xC0 == 0x80:  # 不在多字节字符的中间切分
+            end -= 1
+        parts.append(data[start:end].decode("utf8"))
+        start = end
+        limit = ICS_LINE_LIMIT - 1  # 续行开头的空格占1字节
+    parts.append(data[start:].decode("utf8"))
+    return (ICS_NEWLINE + " ").join(parts)
+
+def content_line(name, value, separator=":"):
+    """生成一行经过转义和折行的内容行"""
+    if name in TEXT_PROPERTIES:
+        value = escape_text(value)
+    return fold_line("%s%s%s" % (name, separator, value))
+
 class CourseRepetitionType(Enum):
     weekly = 0
     biweekly = 1
 
+# 日历中的时间均为北京时间（UTC+8，无夏令时）
+TIMEZONE_ID = "Asia/Shanghai"
+UTC_OFFSET = datetime.timedelta(hours=8)
+LOCAL_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+def format_local_time(date):
+    """如TZID=Asia/Shanghai:20250908T102000"""
+    return f"TZID={TIMEZONE_ID}:{date.year:04d}{date.month:02d}{date.day:02d}T{date.hour:02d}{date.minute:02d}{date.second:02d}"
+
+def course_identity(*parts):
+    """课程的稳定标识文本（课程名、教学班、星期、节次等），同一门课程的全部事件共用一个"""
+    return "|".join(map(str, parts))
+
+def event_uid(identity, date):
+    """
+    由课程标识和上课日期生成UID，重新生成课程表时同一次上课的UID不变，日历软件可以只同步变化的事件
+    结果与uuid.uuid5(UID_NAMESPACE, "<标识>|<日期>")相同，直接计算SHA-1以避免构造UUID对象
+    """
+    digest = hashlib.sha1(UID_NAMESPACE.bytes + "{}|{}".format(identity, date).encode("utf8")).hexdigest()
+    return "{}-{}-5{}-{}{}-{}@{}".format(digest[:8], digest[8:12], digest[13:16], "89ab"[int(digest[16], 16) & 3], digest[17:20], digest[20:32], UID_DOMAIN)
+
+def format_utc_time(date):
+    """北京时间转换为UTC格式，如20251228T155959Z"""
+    return (date - UTC_OFFSET).strftime(LOCAL_TIME_FORMAT) + "Z"
+
 class Course:
-    def __init__(self, kwargs):
+    """
+    一个日历事件
+    只保存原始的时间和地点，UID、时间戳等文本在序列化时才生成；
+    使用__slots__，大量事件常驻内存时占用较小
+    """
+    __slots__ = ("summary", "start", "end", "location", "interval", "until", "exdates", "rdates", "alarms", "event_data", "identity", "sequence", "created", "fragment")
+
+    def __init__(self, kwargs=None, summary=None, start=None, end=None, location=None, interval=0, until=None, exdates=None, rdates=None, identity=None):
+        """
+        :param kwargs: 兼容旧接口的自由格式属性字典（属性名 → 已格式化的值），提供时忽略其余参数
+        :param interval: 重复间隔（周），0表示单次事件
+        :param until: 重复截止时间（北京时间）
+        :param exdates: 重复规则中排除的开始时间元组
+        :param rdates: 重复规则之外额外的开始时间元组
+        :param identity: 由course_identity生成的课程标识，输出时与开始日期一起生成UID；None时按序号生成UID
+        """
         self.event_data = kwargs
-        self.alarms = []
+        self.summary = summary
+        self.start = start
+        self.end = end
+        self.location = location
+        self.interval = interval
+        self.until = until
+        self.exdates = exdates
+        self.rdates = rdates
+        self.alarms = None
+        self.identity = identity
+        self.sequence = 0      # 修改次数，增量更新时递增
+        self.created = None    # 首次生成的时间文本，None时使用日历的时间戳
+        self.fragment = None   # 预渲染的(UID, 以时间戳分隔的事件文本片段)，见prerender
  
     def add_alarm(self, trigger_minutes, description="提醒"):
         """
         添加提醒
         :param trigger_minutes: 提前多少分钟提醒（正数）
-        :param description: 提醒描述
+        :param description: 提醒描述，为None时为"出发前往<地点>的时间到了"
         """
-        self.alarms.append({
-            "trigger": "-PT{}M".format(trigger_minutes),
-            "description": description,
-            "action": "DISPLAY"
-        })
+        if self.alarms is None:
+            self.alarms = []
+        self.alarms.append((trigger_minutes, description))
+
+    def iter_properties(self, uid, timestamp):
+        """按输出顺序生成(属性名, 值, 分隔符)"""
+        if self.event_data is not None:
+            for item,data in self.event_data.items():
+                item = str(item).replace("_","-")
+                if item not in ["ORGANIZER","DTSTART","DTEND","EXDATE","RDATE"]:
+                    yield item, data, ":"
+                else:
+                    yield item, data, ";"
+            return
+        yield "SUMMARY", self.summary, ":"
+        yield "CREATED", self.created or timestamp, ":"
+        yield "DTSTART", format_local_time(self.start), ";"
+        yield "DTSTAMP", timestamp, ":"
+        yield "DTEND", format_local_time(self.end), ";"
+        yield "UID", uid, ":"
+        yield "SEQUENCE", str(self.sequence), ":"
+        yield "LAST-MODIFIED", timestamp, ":"
+        yield "LOCATION", self.location, ":"
+        if self.interval:
+            rrule = "FREQ=WEEKLY;UNTIL={}".format(format_utc_time(self.until))
+            if self.interval != 1:
+                rrule += ";INTERVAL={}".format(self.interval)
+            yield "RRULE", rrule, ":"
+            if self.exdates:
+                yield "EXDATE", "TZID={}:{}".format(TIMEZONE_ID, ",".join(date.strftime(LOCAL_TIME_FORMAT) for date in self.exdates)), ";"
+            if self.rdates:
+                yield "RDATE", "TZID={}:{}".format(TIMEZONE_ID, ",".join(date.strftime(LOCAL_TIME_FORMAT) for date in self.rdates)), ";"
  
-    def __turn_to_string__(self):
-        self.event_text = "BEGIN:VEVENT\n"
-        for item,data in self.event_data.items():
-            item = str(item).replace("_","-")
-            if item not in ["ORGANIZER","DTSTART","DTEND"]:
-                self.event_text += "%s:%s\n"%(item,data)
-            else:
-                self.event_text += "%s;%s\n"%(item,data)
+    def iter_lines(self, uid=None, timestamp=None):
+        """
+        逐行生成该事件的内容行（已转义、已折行，不含换行符）
+        :param uid: 事件UID，默认由课程标识生成，没有标识时随机生成
+        :param timestamp: CREATED/DTSTAMP/LAST-MODIFIED使用的UTC时间文本，默认为当前时间
+        """
+        if self.event_data is None:
+            if uid is None:
+                uid = event_uid(self.identity, self.start.date()) if self.identity else str(uuid.uuid4())
+            timestamp = timestamp or datetime.datetime.now(datetime.timezone.utc).strftime(LOCAL_TIME_FORMAT) + "Z"
+        yield "BEGIN:VEVENT"
+        for item, data, separator in self.iter_properties(uid, timestamp):
+            yield content_line(item, data, separator)
         
         # 添加提醒组件
-        for alarm in self.alarms:
-            self.event_text += "BEGIN:VALARM\n"
-            self.event_text += "TRIGGER:{0}\n".format(alarm["trigger"])
-            self.event_text += "ACTION:{0}\n".format(alarm["action"])
-            self.event_text += "DESCRIPTION:{0}\n".format(alarm["description"])
-            self.event_text += "END:VALARM\n"
+        for trigger_minutes, description in self.alarms or ():
+            if description is None:
+                description = "出发前往{}的时间到了".format(self.location)
+            yield "BEGIN:VALARM"
+            yield content_line("TRIGGER", "-PT{}M".format(trigger_minutes))
+            yield content_line("ACTION", "DISPLAY")
+            yield content_line("DESCRIPTION", description)
+            yield "END:VALARM"
             
-        self.event_text += "END:VEVENT\n"
-        return self.event_text
+        yield "END:VEVENT"
+
+    def prerender(self):
+        """
+        预先渲染事件文本，时间戳以占位符代替，之后不同的日历只需拼接文本（见render）
+        只适用于有课程标识的事件，UID由标识和开始日期确定
+        """
+        uid = event_uid(self.identity, self.start.date())
+        text = "".join(line + ICS_NEWLINE for line in self.iter_lines(uid, TIMESTAMP_PLACEHOLDER))
+        self.fragment = (uid, tuple(text.split(TIMESTAMP_PLACEHOLDER)))
+
+    def copy(self):
+        """复制事件（预渲染的文本共用），用于将缓存的事件加入新的日历"""
+        course = Course(summary=self.summary, start=self.start, end=self.end, location=self.location, interval=self.interval,
+                        until=self.until, exdates=self.exdates, rdates=self.rdates, identity=self.identity)
+        course.alarms = list(self.alarms) if self.alarms is not None else None
+        course.fragment = self.fragment
+        return course
+
+    def render(self, uid, timestamp):
+        """
+        渲染为事件文本（含换行符）
+        有预渲染的文本且UID、SEQUENCE、CREATED与预渲染时相同时直接拼接，否则逐行生成
+        """
+        fragment = self.fragment
+        if fragment is not None and fragment[0] == uid and self.sequence == 0 and self.created is None:
+            return timestamp.join(fragment[1])
+        return "".join(line + ICS_NEWLINE for line in self.iter_lines(uid, timestamp))
+
+    def __turn_to_string__(self):
+        return "".join(line + ICS_NEWLINE for line in self.iter_lines())
+
+    def occurrences(self):
+        """展开重复规则，生成每一次的(开始时间, 结束时间)"""
+        if self.event_data is not None:
+            yield from _event_data_occurrences(self.event_data)
+            return
+        duration = self.end - self.start
+        starts = [self.start]
+        if self.interval:
+            step = datetime.timedelta(weeks=self.interval)
+            while starts[-1] + step <= self.until:
+                starts.append(starts[-1] + step)
+            if self.exdates:
+                excluded = set(self.exdates)
+                starts = [item for item in starts if item not in excluded]
+            if self.rdates:
+                starts.extend(self.rdates)
+        for item in starts:
+            yield item, item + duration
+
+def _event_data_occurrences(data):
+    """展开旧接口自由格式属性中的按周重复规则"""
+    def parse_local(value):
+        return datetime.datetime.strptime(value.rsplit(":", 1)[-1], LOCAL_TIME_FORMAT)
+
+    def parse_list(value):
+        return [datetime.datetime.strptime(item, LOCAL_TIME_FORMAT) for item in value.rsplit(":", 1)[-1].split(",")]
+
+    start = parse_local(data["DTSTART"])
+    duration = parse_local(data["DTEND"]) - start
+    starts = [start]
+    if "RRULE" in data:
+        rule = dict(part.split("=", 1) for part in data["RRULE"].split(";"))
+        until = datetime.datetime.strptime(rule["UNTIL"].rstrip("Z"), LOCAL_TIME_FORMAT)
+        if rule["UNTIL"].endswith("Z"):
+            until += UTC_OFFSET
+        step = datetime.timedelta(weeks=int(rule.get("INTERVAL", 1)))
+        while starts[-1] + step <= until:
+            starts.append(starts[-1] + step)
+        excluded = set(parse_list(data["EXDATE"])) if "EXDATE" in data else set()
+        starts = [item for item in starts if item not in excluded]
+        if "RDATE" in data:
+            starts.extend(parse_list(data["RDATE"]))
+    for item in starts:
+        yield item, item + duration
 
 class Curriculum:
     def __init__(self):
-        self.__courses__ = {}
-        self.__course_id__ = 0
+        self.__courses__ = []
         self.calendar_name = "课程表"
+        # 同一日历内的事件共用一个随机前缀和创建时间，UID为"<序号>-<前缀>"
+        self.__uid_suffix__ = str(uuid.uuid4())
+        self.created = datetime.datetime.now(datetime.timezone.utc)
 
     def add_course(self, **kwargs):
-        course = Course(kwargs)
-        course_id = self.__course_id__
-        self.__courses__[self.__course_id__] = course
-        self.__course_id__ += 1
-        return course_id
+        """以自由格式属性添加事件（兼容旧接口）"""
+        return self.add_event(Course(kwargs))
+
+    def add_event(self, course):
+        """添加一个Course，返回其编号"""
+        self.__courses__.append(course)
+        return len(self.__courses__) - 1
+
+    @property
+    def timestamp(self):
+        """CREATED/DTSTAMP/LAST-MODIFIED使用的UTC时间文本"""
+        return self.created.strftime(LOCAL_TIME_FORMAT) + "Z"
+
+    def iter_events(self):
+        """
+        按顺序生成(UID, 课程)
+        有课程标识的事件由标识和开始日期生成UID，其余使用"<序号>-<前缀>"；
+        同一UID出现多次时（课表中重复的课程），后出现的加上序号区分
+        """
+        seen = set()
+        for index, course in enumerate(self.__courses__):
+            if course.fragment is not None:
+                uid = course.fragment[0]
+            elif course.identity is not None:
+                uid = event_uid(course.identity, course.start.date())
+            else:
+                uid = "{}-{}".format(index, self.__uid_suffix__)
+            if uid in seen:
+                uid = "{}-{}".format(index, uid)
+            seen.add(uid)
+            yield uid, course
+
+    def iter_ics_chunks(self, method=None, uids=None):
+        """
+        流式生成日历文本：依次产出日历头、每个事件、日历尾
+        每次只渲染一个事件，内存占用与事件数量无关
+        :param method: 日历的METHOD属性（如"PUBLISH"），None时不输出
+        :param uids: 只输出这些UID的事件，None时输出全部
+        """
+        timestamp = self.timestamp
+        yield "BEGIN:VCALENDAR" + ICS_NEWLINE
+        yield "VERSION:2.0" + ICS_NEWLINE
+        if method:
+            yield content_line("METHOD", method) + ICS_NEWLINE
+        yield content_line("X-WR-CALNAME", self.calendar_name) + ICS_NEWLINE
+        for uid, course in self.iter_events():
+            if uids is None or uid in uids:
+                yield course.render(uid, timestamp)
+        yield "END:VCALENDAR" + ICS_NEWLINE
+
+    def write_ics(self, fp):
+        """
+        将日历流式写入文件对象
+        :param fp: 任意支持write(str)的文件对象，文本模式打开时应指定newline=""
+        :return: 写入的事件数量
+        """
+        event_count = 0
+        for chunk in self.iter_ics_chunks():
+            if chunk.startswith("BEGIN:VEVENT"):
+                event_count += 1
+            fp.write(chunk)
+        return event_count
+
+    def occurrences(self):
+        """
+        展开全部事件（包括RRULE/EXDATE/RDATE）得到每一次上课，用于比较不同输出方式是否一致
+        :return: 排序后的[(课程名, 开始时间, 结束时间, 地点)]
+        """
+        result = []
+        for course in self.__courses__:
+            if course.event_data is not None:
+                summary, location = course.event_data["SUMMARY"], course.event_data["LOCATION"]
+            else:
+                summary, location = course.summary, course.location
+            for start, end in course.occurrences():
+                result.append((summary, start, end, location))
+        return sorted(result)
 
     def get_ics_text(self):
-        self.__calendar_text__ = """BEGIN:VCALENDAR\nVERSION:2.0\nX-WR-CALNAME:课程表\n"""
-        for key,value in self.__courses__.items():
-            self.__calendar_text__ += value.__turn_to_string__()
-        self.__calendar_text__ += "END:VCALENDAR"
-        return self.__calendar_text__
+        buffer = io.StringIO()
+        self.write_ics(buffer)
+        return buffer.getvalue()
 
-    def save_as_ics_file(self):
-        ics_text = self.get_ics_text()
-        open("%s.ics"%self.calendar_name,"w",encoding="utf8").write(ics_text)
+    def save_as_ics_file(self, path=None):
+        """
+        保存为ics文件。先写入同目录下的临时文件再原子替换，
+        并发写入或中途失败都不会留下不完整的文件
+        :param path: 输出路径，默认为当前目录下的"<日历名>.ics"
+        :return: 写入的事件数量
+        """
+        if path is None:
+            path = "%s.ics"%self.calendar_name
+        with AtomicFile.open_atomic(path, "x", encoding="utf8", newline="") as fp:
+            event_count = self.write_ics(fp)
+        return event_count
 
-def add_course(curriculum, name, start_time, end_time, location, week, term_end, travel_time_minutes=30, is_single_event=False):
+def add_course(curriculum, name, start_time, end_time, location, week, term_end, travel_time_minutes=30, is_single_event=False, exdates=None, rdates=None, identity=None):
     """
     向Curriculum对象添加事件的方法
     :param curriculum: curriculum实例
@@ -79,38 +372,24 @@ def add_course(curriculum, name, start_time, end_time, location, week, term_end,
     :param term_end: 学期结束日期
     :param travel_time_minutes: 路程时间（分钟），用于设置提前多少分钟提醒
     :param is_single_event: 是否为单次事件（不重复）
+    :param exdates: 重复规则中需要排除的上课开始时间列表（如节假日）
+    :param rdates: 重复规则之外额外上课的开始时间列表（如调休）
+    :param identity: 由course_identity生成的课程标识，用于生成不变的UID
     :return: 添加的课程对象
     """
-    time_format = "TZID=Asia/Shanghai:{date.year}{date.month:0>2d}{date.day:0>2d}T{date.hour:0>2d}{date.minute:0>2d}{date.second:0>2d}"
-    dt_start = time_format.format(date=start_time)
-    dt_end = time_format.format(date=end_time)
-    create_time = datetime.datetime.today().strftime("%Y%m%dT%H%M%SZ")
-    
-    # 构建课程参数
-    course_params = {
-        "SUMMARY": name,
-        "CREATED": create_time,
-        "DTSTART": dt_start,
-        "DTSTAMP": create_time,
-        "DTEND": dt_end,
-        "UID": str(uuid.uuid4()),
-        "SEQUENCE": "0",
-        "LAST_MODIFIED": create_time,
-        "LOCATION": location
-    }
-    
-    # 只有非单次事件才添加重复规则
-    if not is_single_event:
-        if week == CourseRepetitionType.weekly:
-            rrule = "FREQ=WEEKLY;UNTIL={date.year}{date.month:0>2d}{date.day:0>2d}T{date.hour:0>2d}{date.minute:0>2d}{date.second:0>2d}".format(date=term_end)
-        else:
-            rrule = "FREQ=WEEKLY;UNTIL={date.year}{date.month:0>2d}{date.day:0>2d}T{date.hour:0>2d}{date.minute:0>2d}{date.second:0>2d};INTERVAL=2".format(date=term_end)
-        course_params["RRULE"] = rrule
-    
-    course_id = curriculum.add_course(**course_params)
+    if is_single_event:
+        interval = 0
+    elif week == CourseRepetitionType.weekly:
+        interval = 1
+    else:
+        interval = 2
+    course = Course(summary=name, start=start_time, end=end_time, location=location, interval=interval,
+                    until=term_end if interval else None,
+                    exdates=tuple(exdates) if exdates else None,
+                    rdates=tuple(rdates) if rdates else None,
+                    identity=identity)
     
-    # 添加路程时间提醒
-    course = curriculum.__courses__[course_id]
-    course.add_alarm(travel_time_minutes, "出发前往{}的时间到了".format(location))
+    # 添加路程时间提醒（描述在输出时按地点生成）
+    course.add_alarm(travel_time_minutes, None)
     
-    return course_id
+    return curriculum.add_event(course)
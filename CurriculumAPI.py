@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课表转换的库接口
+供进程内的工作池、服务等直接调用，不需要为每次转换启动子进程：
+- 输入为xlsx（或中间格式）文件内容或类文件对象，参数由ConvertOptions给出
+- 返回ics内容（bytes）或逐块产生的ics内容
+- 出错时抛出ConversionError的子类，不读取sys.argv、不调用sys.exit，也不写入任何文件
+- 展开课程时累加的统计（GeneratorLog.counters，如跳过的节假日数量）是进程内共享的，不按调用区分：
+  多个线程同时转换时计数会混在一起；库接口不返回这些计数，转换结果不受影响
+
+    import CurriculumAPI
+    options = CurriculumAPI.ConvertOptions(term_start=datetime.date(2025, 9, 8), term_end=datetime.date(2025, 12, 28))
+    ics = CurriculumAPI.convert(workbook_bytes, options)
+"""
+
+import collections
+import concurrent.futures
+import datetime
+import threading
+import time
+from typing import NamedTuple, Optional, Sequence
+
+import CalendarDelta
+import CurriculumGenerator
+import GeneratorProfile
+import HolidayProvider
+import ScheduleFile
+
+TERM_CACHE_SIZE = 16          # 内存中缓存的学期数量
+TERM_CACHE_TTL = 6 * 3600     # 学期节假日缓存的有效期（秒）
+
+class ConversionError(Exception):
+    """转换失败"""
+
+class InvalidOptionsError(ConversionError, ValueError):
+    """转换参数不合法"""
+
+class ScheduleReadError(ConversionError):
+    """无法读取或解析课表"""
+
+class ConvertOptions(NamedTuple):
+    """
+    转换参数
+    term_start/term_end可以是datetime.date或YYYYMMDD格式的字符串；
+    holidays和workdays都为None时按学期获取节假日（只读取缓存和网络，不写入缓存文件）
+    """
+    term_start: datetime.date
+    term_end: datetime.date
+    travel_time: int = 30                                  # 路程时间提醒（分钟）
+    recurring: bool = False                                # 每门课程输出一个重复事件
+    calendar_name: Optional[str] = None                    # 日历名称，默认为“课程表”
+    holidays: Optional[Sequence[datetime.date]] = None     # 节假日
+    workdays: Optional[Sequence[datetime.date]] = None     # 调休工作日
+    offline: bool = False                                  # 获取节假日时不访问网络
+    previous: Optional[bytes] = None                       # 上一次的ics内容，用于保留未变化事件的SEQUENCE
+
+    def validated(self):
+        """
+        检查参数并统一类型
+        :return: 日期均为datetime.date的新ConvertOptions
+        :raises InvalidOptionsError: 参数不合法
+        """
+        term_start = _as_date(self.term_start, "term_start")
+        term_end = _as_date(self.term_end, "term_end")
+        if term_end < term_start:
+            raise InvalidOptionsError("学期结束日期早于开始日期")
+        if isinstance(self.travel_time, bool) or not isinstance(self.travel_time, int) or self.travel_time < 0:
+            raise InvalidOptionsError("路程时间提醒必须是正整数")
+        if (self.holidays is None) != (self.workdays is None):
+            raise InvalidOptionsError("holidays和workdays必须同时给出")
+        holidays = workdays = None
+        if self.holidays is not None:
+            holidays = sorted(_as_date(date, "holidays") for date in self.holidays)
+            workdays = sorted(_as_date(date, "workdays") for date in self.workdays)
+        if self.previous is not None and not isinstance(self.previous, (bytes, str)):
+            raise InvalidOptionsError("previous必须是bytes或str")
+        return self._replace(term_start=term_start, term_end=term_end, holidays=holidays, workdays=workdays)
+
+def _as_date(value, name):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        try:
+            return CurriculumGenerator.parse_term_date(value)
+        except ValueError:
+            pass
+    raise InvalidOptionsError(f"{name}必须是datetime.date或YYYYMMDD格式的日期: {value!r}")
+
+# (开始日期, 结束日期, 离线) → (获取时间, concurrent.futures.Future)，按最近使用的顺序排列
+_terms = collections.OrderedDict()
+_terms_lock = threading.Lock()
+
+def get_term_holidays(term_start, term_end, offline=False, write_cache=False):
+    """
+    获取学期内的节假日和调休工作日，结果在进程内缓存（最多TERM_CACHE_SIZE个学期，TERM_CACHE_TTL秒后重新获取）
+    同一学期的并发调用共用一次获取，获取失败时不缓存
+    :param write_cache: 为True时把联网获取的结果写入缓存文件
+    :return: (节假日列表, 调休工作日列表)
+    """
+    key = (term_start, term_end, offline)
+    with _terms_lock:
+        entry = _terms.get(key)
+        if entry is not None and time.monotonic() - entry[0] < TERM_CACHE_TTL:
+            _terms.move_to_end(key)
+            future = entry[1]
+        else:
+            entry = None
+            future = concurrent.futures.Future()
+            _terms[key] = (time.monotonic(), future)
+            _terms.move_to_end(key)
+            while len(_terms) > TERM_CACHE_SIZE:
+                _terms.popitem(last=False)
+    if entry is not None:
+        return future.result()
+
+    try:
+        term = HolidayProvider.get_holidays_and_workdays(term_start, term_end, offline, write_cache=write_cache)
+    except BaseException as e:
+        with _terms_lock:
+            if _terms.get(key, (None, None))[1] is future:
+                del _terms[key]
+        future.set_exception(e)
+        raise
+    future.set_result(term)
+    return term
+
+def cached_terms():
+    """
+    内存中缓存的学期
+    :return: [(开始日期, 结束日期)]，从最久未使用到最近使用
+    """
+    with _terms_lock:
+        keys = list(_terms)
+    return list(dict.fromkeys((term_start, term_end) for term_start, term_end, _ in keys))
+
+def _read_source(source):
+    """读取bytes、bytearray、memoryview、str或类文件对象的内容"""
+    if isinstance(source, (bytes, str)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "read"):
+        try:
+            return source.read()
+        except OSError as e:
+            raise ScheduleReadError(f"无法读取课表 - {e}") from e
+    raise InvalidOptionsError(f"不支持的输入类型: {type(source).__name__}")
+
+def parse_source(source):
+    """
+    解析课表：内容以“{”开头时按中间格式读取，否则按xlsx工作簿读取
+    :param source: 文件内容或类文件对象
+    :return: [(ScheduleLoader.ScheduleCell, CourseRecord列表)]
+    :raises InvalidOptionsError: 输入类型不支持
+    :raises ScheduleReadError: 无法读取或解析
+    """
+    data = _read_source(source)
+    head = data.lstrip()[:1]
+    try:
+        if head in (b"{", "{"):
+            return ScheduleFile.loads(data)
+        if isinstance(data, str):
+            raise ScheduleReadError("xlsx工作簿必须以bytes给出")
+        return ScheduleFile.parse_workbook(data)
+    except ScheduleReadError:
+        raise
+    except Exception as e:
+        raise ScheduleReadError(f"无法读取课表 - {type(e).__name__}: {e}") from e
+
+def build(source, options):
+    """
+    解析课表并生成课程表对象
+    :param source: xlsx或中间格式的文件内容，或类文件对象
+    :param options: ConvertOptions
+    :return: Curriculum.Curriculum
+    """
+    options = options.validated()
+    parsed_cells = parse_source(source)
+    holidays, workdays = options.holidays, options.workdays
+    if holidays is None:
+        holidays, workdays = get_term_holidays(options.term_start, options.term_end, options.offline)
+    with GeneratorProfile.phase("expand"):
+        curriculum, _ = CurriculumGenerator.build_curriculum_from_records(
+            parsed_cells, options.term_start, options.term_end, holidays, workdays, options.travel_time, options.recurring)
+    if options.calendar_name:
+        curriculum.calendar_name = options.calendar_name
+    if options.previous is not None:
+        previous = options.previous
+        try:
+            if isinstance(previous, bytes):
+                previous = previous.decode("utf8")
+        except UnicodeDecodeError as e:
+            raise InvalidOptionsError(f"无法读取上一次的课程表 - {e}") from e
+        CalendarDelta.apply_previous(curriculum, CalendarDelta.parse_events(previous))
+    return curriculum
+
+def iter_ics(source, options):
+    """
+    逐块产生UTF-8编码的ics内容；课表在第一次取值前解析完成，错误在调用时立即抛出
+    :return: bytes的迭代器
+    """
+    curriculum = build(source, options)
+    return (chunk.encode("utf8") for chunk in curriculum.iter_ics_chunks())
+
+def convert(source, options):
+    """
+    将课表转换为ics
+    :param source: xlsx或中间格式的文件内容，或类文件对象
+    :param options: ConvertOptions
+    :return: UTF-8编码的ics内容
+    :raises InvalidOptionsError: 参数不合法
+    :raises ScheduleReadError: 无法读取或解析课表
+    """
+    return b"".join(iter_ics(source, options))
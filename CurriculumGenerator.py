@@ -9,509 +9,501 @@
 - 支持多种课程格式和特殊情况处理
 """
 
-import openpyxl
 import sys
+import atexit
+import collections
+import hashlib
+import logging
+import os
+import time
+import AtomicFile
 import Curriculum
-import re
+import CellDedup
+import CourseParser
+import GeneratorLog
+import GeneratorProfile
+import HolidayProvider
+import OutputCache
+import ScheduleFile
+import ScheduleLoader
+import SectionCache
+import TermCalendar
+import WeekMask
 import datetime
-import requests
-import json
+import CalendarDelta
+
+log = GeneratorLog.logger
+counters = GeneratorLog.counters
+
+OUTPUT_FILE = "课程表.ics"
+DELTA_FILE = "课程表.delta.ics"
+CANCEL_FILE = "课程表.cancel.ics"
+PROFILE_PREFIX = "课程表"
+ONLINE_LOCATION = "南方科技大学-在线课程"
+# 跨课表的课程时间段缓存（每个进程一个），为None时不缓存
+section_cache = SectionCache.SectionCache()
+# 展开课程时可能变化的上课次数计数，缓存命中时按缓存的增量累加
+CACHED_COUNTERS = ("added", "holiday", "weekend")
 
 # 课程时间映射
 __course_start_time = {
-    "1": datetime.time(8),
-    "3": datetime.time(10, 20),
-    "5": datetime.time(14),
-    "7": datetime.time(16, 20),
-    "9": datetime.time(19)
+    1: datetime.time(8),
+    3: datetime.time(10, 20),
+    5: datetime.time(14),
+    7: datetime.time(16, 20),
+    9: datetime.time(19)
 }
 
 __course_end_time = {
-    "2": datetime.time(9, 50),
-    "4": datetime.time(12, 10),
-    "6": datetime.time(15, 50),
-    "8": datetime.time(18, 10),
-    "10": datetime.time(20, 50),
-    "11": datetime.time(21, 50)
+    2: datetime.time(9, 50),
+    4: datetime.time(12, 10),
+    6: datetime.time(15, 50),
+    8: datetime.time(18, 10),
+    10: datetime.time(20, 50),
+    11: datetime.time(21, 50)
 }
 
 def usage():
     """显示使用说明"""
-    print("用法: python3 CurriculumGenerator_merged.py <Excel文件> <学期开始日期> <学期结束日期> [路程时间]")
+    print("用法: python3 CurriculumGenerator_merged.py <Excel文件或中间格式文件> <学期开始日期> <学期结束日期> [路程时间] [--offline] [--recurring] [--verify] [--quiet]")
     print("示例: python3 CurriculumGenerator_merged.py export.xlsx 20250908 20251228 30")
     print("日期格式: YYYYMMDD")
     print("路程时间: 可选参数，单位为分钟，默认30分钟")
+    print("--offline: 不访问网络，只使用本地缓存和内置的节假日信息")
+    print("--recurring: 每门课程输出一个重复事件（RRULE），而不是每次上课一个事件")
+    print("--verify: 检查重复事件展开后与逐次事件的上课时间是否一致")
+    print("--no-cache: 不使用输出缓存，总是重新生成")
+    print("--save-schedule=<文件>: 同时将解析后的课表保存为中间格式（.jsonl），之后可代替xlsx文件直接生成日历")
+    print("--previous=<文件>: 与上一次生成的ics比较，修改的事件SEQUENCE加1，新增和修改的事件另存为课程表.delta.ics，删除通知另存为课程表.cancel.ics")
+    print("--quiet: 只输出警告和错误")
+    print("--log-level=<debug|info|warning|error>: 日志级别，默认为debug（输出每次上课的明细）")
+    print("--log-json=<文件>: 同时以JSON Lines格式写入日志文件")
+    print(f"--profile[=<前缀>]: 记录各阶段的耗时，保存为<前缀>.profile.json和cProfile统计<前缀>.prof，默认前缀为{PROFILE_PREFIX}")
     print("注意: 学期开始时间为学期第一周的周一，学期结束时间为学期最后一周的周末")
     sys.exit(1)
 
-def get_holidays_and_workdays(start_date, end_date):
-    """获取节假日和调休工作日信息"""
-    print("正在获取节假日和调休工作日信息...")
-    holidays = []
-    workdays = []  # 调休工作日
+def get_holidays_and_workdays(start_date, end_date, offline=False):
+    """获取节假日和调休工作日信息（优先使用本地缓存）"""
+    log.info("正在获取节假日和调休工作日信息...")
+    with GeneratorProfile.phase("holidays"):
+        holidays, workdays = HolidayProvider.get_holidays_and_workdays(start_date, end_date, offline=offline)
+    log.info("共%d个节假日，%d个调休工作日", len(holidays), len(workdays))
+    return holidays, workdays
+
+def expand_week_mask(name, week_info, day_offset, term_mask):
+    """
+    按位图计算课程的上课周次
+    :param term_mask: WeekMask.TermMask
+    :return: (按周次规律的周次位图, 跳过节假日和周末后实际上课的周次位图)
+    """
+    pattern, teaching, holiday, weekend = term_mask.split(week_info, day_offset)
+    if holiday or weekend:
+        if holiday:
+            counters["holiday"] += bin(holiday).count("1")
+        if weekend:
+            counters["weekend"] += bin(weekend).count("1")
+        if log.isEnabledFor(logging.DEBUG):
+            dates = term_mask.dates[day_offset]
+            for week in WeekMask.mask_weeks(holiday | weekend):
+                if holiday >> (week - 1) & 1:
+                    log.debug("跳过节假日课程: %s (%s)", name, dates[week - 1])
+                else:
+                    log.debug("跳过周末课程: %s (%s)", name, dates[week - 1])
+    return pattern, teaching
+
+def expand_course_weeks(name, start_week, end_week, week_type, day_offset, term_start_date, term_end_date, holidays, workdays=None, term_mask=None):
+    """
+    计算课程在各周的上课日期
+    :param term_mask: 学期的WeekMask.TermMask，默认按学期参数取得（同一学期只计算一次）
+    :return: (按周次规律排列的日期列表, 跳过节假日和周末后实际上课的日期列表)
+    """
+    if term_mask is None:
+        term_mask = WeekMask.term_mask(term_start_date, term_end_date, holidays, workdays)
+    if term_mask.covers(start_week, day_offset):
+        pattern, teaching = expand_week_mask(name, (start_week, end_week, week_type), day_offset, term_mask)
+        return term_mask.dates_of(pattern, day_offset), term_mask.dates_of(teaching, day_offset)
     
-    try:
-        # 尝试使用范围API获取节假日信息
-        start_str = start_date.strftime("%Y%m%d")
-        end_str = end_date.strftime("%Y%m%d")
-        
-        url = f"https://timor.tech/api/holiday/range/{start_str}/{end_str}"
-        response = requests.get(url, timeout=10)
-        data = response.json()
+    # 周次或星期超出位图的范围（如第0周），逐周查询学期日历
+    calendar = term_mask.calendar
+    pattern_dates = []
+    course_dates = []
+    for w in range(start_week, end_week + 1):
+        if week_type == "单" and w % 2 == 0:
+            continue
+        if week_type == "双" and w % 2 == 1:
+            continue
+        if not calendar.in_term(w, day_offset):
+            continue
+        course_date = calendar.date_of(w, day_offset)
+        pattern_dates.append(course_date)
         
-        if data["code"] == 0:
-            holiday_data = data["holiday"]
-            for date_str, info in holiday_data.items():
-                year, month, day = map(int, date_str.split("-"))
-                date_obj = datetime.date(year, month, day)
-                if info["holiday"]:
-                    holidays.append(date_obj)
-                elif info.get("work", False):  # 调休工作日
-                    workdays.append(date_obj)
-            print(f"成功获取到{len(holidays)}个节假日，{len(workdays)}个调休工作日")
-            return holidays, workdays
-        else:
-            print(f"API返回错误: {data['msg']}")
-    except Exception as e:
-        print(f"获取节假日信息出错: {str(e)}")
-    
-    # 如果API失败，尝试年度API
-    try:
-        year = start_date.year
-        url = f"http://timor.tech/api/holiday/year/{year}"
-        response = requests.get(url, timeout=5)
+        status = calendar.status_of(w, day_offset)
+        if status == TermCalendar.HOLIDAY:
+            counters["holiday"] += 1
+            log.debug("跳过节假日课程: %s (%s)", name, course_date)
+            continue
+        if status == TermCalendar.WEEKEND:
+            counters["weekend"] += 1
+            log.debug("跳过周末课程: %s (%s)", name, course_date)
+            continue
         
-        if response.status_code == 200:
-            data = response.json()
-            for date_str, info in data.get('holiday', {}).items():
-                try:
-                    date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                    if start_date <= date_obj <= end_date:
-                        if info.get('holiday', False):
-                            holidays.append(date_obj)
-                        elif info.get('work', False):  # 调休工作日
-                            workdays.append(date_obj)
-                except ValueError:
-                    continue
-            print(f"从年度API获取到{len(holidays)}个节假日，{len(workdays)}个调休工作日")
-            return holidays, workdays
-    except Exception as e:
-        print(f"年度API获取失败: {str(e)}")
-    
-    # 使用默认节假日信息
-    print("将使用默认节假日和调休工作日信息")
-    current_year = start_date.year
-    holidays, workdays = get_default_holidays_and_workdays(current_year)
-    print(f"使用默认信息，共{len(holidays)}个节假日，{len(workdays)}个调休工作日")
-    return holidays, workdays
+        course_dates.append(course_date)
+    return pattern_dates, course_dates
 
-def get_default_holidays_and_workdays(year):
-    """获取默认节假日和调休工作日信息"""
-    if year == 2025:
-        holidays = [
-            # 元旦
-            datetime.date(2025, 1, 1),
-            # 春节
-            datetime.date(2025, 1, 29), datetime.date(2025, 1, 30), datetime.date(2025, 1, 31),
-            datetime.date(2025, 2, 1), datetime.date(2025, 2, 2), datetime.date(2025, 2, 3), datetime.date(2025, 2, 4),
-            # 清明节
-            datetime.date(2025, 4, 5), datetime.date(2025, 4, 6), datetime.date(2025, 4, 7),
-            # 劳动节
-            datetime.date(2025, 5, 1), datetime.date(2025, 5, 2), datetime.date(2025, 5, 3), datetime.date(2025, 5, 4), datetime.date(2025, 5, 5),
-            # 端午节
-            datetime.date(2025, 6, 2), datetime.date(2025, 6, 3), datetime.date(2025, 6, 4),
-            # 中秋节
-            datetime.date(2025, 10, 6),
-            # 国庆节
-            datetime.date(2025, 10, 1), datetime.date(2025, 10, 2), datetime.date(2025, 10, 3),
-            datetime.date(2025, 10, 4), datetime.date(2025, 10, 5), datetime.date(2025, 10, 6), datetime.date(2025, 10, 7)
-        ]
-        workdays = [
-            # 春节调休工作日
-            datetime.date(2025, 1, 26),  # 周日调休
-            datetime.date(2025, 2, 8),   # 周六调休
-            # 劳动节调休工作日
-            datetime.date(2025, 4, 27),  # 周日调休
-            # 国庆节调休工作日
-            datetime.date(2025, 9, 28),  # 周日调休
-            datetime.date(2025, 10, 11)  # 周六调休
-        ]
-        return holidays, workdays
-    elif year == 2024:
-        holidays = [
-            # 元旦
-            datetime.date(2024, 1, 1),
-            # 春节
-            datetime.date(2024, 2, 10), datetime.date(2024, 2, 11), datetime.date(2024, 2, 12),
-            datetime.date(2024, 2, 13), datetime.date(2024, 2, 14), datetime.date(2024, 2, 15), datetime.date(2024, 2, 16), datetime.date(2024, 2, 17),
-            # 清明节
-            datetime.date(2024, 4, 4), datetime.date(2024, 4, 5), datetime.date(2024, 4, 6),
-            # 劳动节
-            datetime.date(2024, 5, 1), datetime.date(2024, 5, 2), datetime.date(2024, 5, 3), datetime.date(2024, 5, 4), datetime.date(2024, 5, 5),
-            # 端午节
-            datetime.date(2024, 6, 10),
-            # 中秋节
-            datetime.date(2024, 9, 15), datetime.date(2024, 9, 16), datetime.date(2024, 9, 17),
-            # 国庆节
-            datetime.date(2024, 10, 1), datetime.date(2024, 10, 2), datetime.date(2024, 10, 3),
-            datetime.date(2024, 10, 4), datetime.date(2024, 10, 5), datetime.date(2024, 10, 6), datetime.date(2024, 10, 7)
-        ]
-        workdays = [
-            # 春节调休工作日
-            datetime.date(2024, 2, 4),   # 周日调休
-            datetime.date(2024, 2, 18),  # 周日调休
-            # 劳动节调休工作日
-            datetime.date(2024, 4, 28),  # 周日调休
-            datetime.date(2024, 5, 11),  # 周六调休
-            # 国庆节调休工作日
-            datetime.date(2024, 9, 29),  # 周日调休
-            datetime.date(2024, 10, 12)  # 周六调休
-        ]
-        return holidays, workdays
-    else:
-        print(f"警告：没有{year}年的预设节假日信息，将使用2024年的节假日信息")
-        return get_default_holidays_and_workdays(2024)
+def expand_course_times(name, week_info, day_offset, start_time, end_time, term_start_date, term_end_date, holidays, workdays=None, term_mask=None):
+    """
+    计算课程每一次上课的时间
+    :param week_info: (起始周, 结束周, 单双周)
+    :param term_mask: 学期的WeekMask.TermMask，默认按学期参数取得
+    :return: 按日期排列的(开始时间, 结束时间, 当天结束时间)序列
+    """
+    start_week, end_week, week_type = week_info
+    if term_mask is None:
+        term_mask = WeekMask.term_mask(term_start_date, term_end_date, holidays, workdays)
+    if term_mask.covers(start_week, day_offset):
+        _, teaching = expand_week_mask(name, week_info, day_offset, term_mask)
+        return term_mask.times_of(teaching, day_offset, start_time, end_time)
+    
+    _, course_dates = expand_course_weeks(name, start_week, end_week, week_type, day_offset, term_start_date, term_end_date, holidays, workdays, term_mask)
+    return [(datetime.datetime.combine(course_date, start_time), datetime.datetime.combine(course_date, end_time),
+             datetime.datetime.combine(course_date, datetime.time.max)) for course_date in course_dates]
 
-def extract_course_info(course_text):
-    """从课程文本中提取结构化信息"""
-    courses = []
-    lines = course_text.split('\n')
-    
-    # 每4行为一个课程信息块
-    for i in range(0, len(lines), 4):
-        if i + 3 < len(lines):
-            course_name = lines[i].strip()
-            teacher = lines[i + 1].strip() if i + 1 < len(lines) else ""
-            class_info = lines[i + 2].strip() if i + 2 < len(lines) else ""
-            time_location = lines[i + 3].strip() if i + 3 < len(lines) else ""
-            
-            # 跳过实验室安全学，由process_special_course处理
-            if "实验室安全学" in course_name:
-                continue
-                
-            if course_name and '[' in time_location:
-                # 解析周次信息
-                week_pattern = re.findall(r'\[(\d+)-(\d+)(单|双)?周\]', time_location)
-                if not week_pattern:
-                    week_pattern = re.findall(r'\[(\d+)周\]', time_location)
-                    if week_pattern:
-                        week_pattern = [(week_pattern[0], week_pattern[0], "")]
-                
-                # 解析地点信息
-                location_pattern = re.findall(r'\]\[([^\]]+)\]\[', time_location)
-                location = location_pattern[0] if location_pattern else "未知地点"
-                
-                # 解析时间段信息
-                time_pattern = re.findall(r'\[(\d+)-(\d+)节\]', time_location)
-                
-                courses.append({
-                    'name': course_name,
-                    'teacher': teacher,
-                    'class_info': class_info,
-                    'week_info': week_pattern[0] if week_pattern else None,
-                    'location': location,
-                    'time_slots': time_pattern[0] if time_pattern else None,
-                    'raw_text': time_location
-                })
-    
-    return courses
+def add_recurring_course(curriculum, name, week_type, pattern_dates, course_dates, course_start_time, course_end_time, location, travel_time, identity=None):
+    """
+    将一门课程的全部上课日期合并为一个重复事件：
+    RRULE描述周次规律（单双周为INTERVAL=2），EXDATE排除规律中不上课的日期，RDATE补充规律之外上课的日期
+    :param identity: 课程标识（Curriculum.course_identity），与第一次上课的日期一起生成UID
+    """
+    if not course_dates:
+        return
+    first_date, last_date = course_dates[0], course_dates[-1]
+    pattern = [date for date in pattern_dates if first_date <= date <= last_date]
+    pattern_set = set(pattern)
+    course_date_set = set(course_dates)
+    exdates = [datetime.datetime.combine(date, course_start_time) for date in pattern if date not in course_date_set]
+    rdates = [datetime.datetime.combine(date, course_start_time) for date in course_dates if date not in pattern_set]
+    repeat_type = Curriculum.CourseRepetitionType.weekly if week_type == "" else Curriculum.CourseRepetitionType.biweekly
+    
+    Curriculum.add_course(curriculum, name, datetime.datetime.combine(first_date, course_start_time),
+                         datetime.datetime.combine(first_date, course_end_time), location, repeat_type,
+                         datetime.datetime.combine(last_date, datetime.time.max), travel_time_minutes=travel_time,
+                         is_single_event=len(course_dates) == 1, exdates=exdates, rdates=rdates,
+                         identity=Curriculum.course_identity(identity, "重复") if identity else None)
+    counters["added"] += len(course_dates)
+    log.debug("添加重复课程: %s - %s 至 %s 共%d次 %s (%s)", name, first_date, last_date, len(course_dates), course_start_time, location)
 
-def add_course_to_curriculum(curriculum, course_info, day_offset, term_start_date, term_end_date, holidays, default_travel_time, is_single_event=False, workdays=None):
-    """将课程信息添加到课程表中"""
-    if not course_info['week_info'] or not course_info['time_slots']:
-        print(f"警告: 课程 {course_info['name']} 缺少必要信息，跳过")
+def add_course_to_curriculum(curriculum, course_info, day_offset, term_start_date, term_end_date, holidays, default_travel_time, is_single_event=False, workdays=None, recurring=False, term_mask=None):
+    """
+    将课程信息（CourseRecord）添加到课程表中
+    提供term_mask时使用section_cache：相同的课程时间段直接复制缓存的事件和渲染好的文本；
+    命中缓存时不再逐次输出上课明细，debug级别只输出一行汇总
+    :param recurring: 为True时每门课程输出一个重复事件，否则每次上课输出一个单独事件
+    :param term_mask: 学期的WeekMask.TermMask，用于按位图展开上课周次
+    """
+    if course_info.week_start is None or course_info.slot_start is None:
+        counters["incomplete"] += 1
+        log.warning("警告: 课程 %s 缺少必要信息，跳过", course_info.name)
+        return
+    
+    cache = section_cache if term_mask is not None else None
+    if cache is None:
+        add_course_events(curriculum, course_info, day_offset, term_start_date, term_end_date, holidays, default_travel_time, workdays, recurring, term_mask)
+        return
+    
+    key = SectionCache.section_key(course_info, day_offset, term_mask, default_travel_time, recurring)
+    entry = cache.get(key)
+    if entry is not None:
+        for course in entry.courses:
+            curriculum.add_event(course.copy())
+        counters.update(entry.counts)
+        log.debug("添加课程（缓存）: %s - 星期%d 第%d-%d节 共%d个事件 (%s)", course_info.name, day_offset + 1,
+                  course_info.slot_start, course_info.slot_end, len(entry.courses), course_info.location)
         return
     
-    start_week, end_week, week_type = course_info['week_info']
-    start_time_slot, end_time_slot = course_info['time_slots']
+    first = len(curriculum.__courses__)
+    before = [counters[name] for name in CACHED_COUNTERS]
+    add_course_events(curriculum, course_info, day_offset, term_start_date, term_end_date, holidays, default_travel_time, workdays, recurring, term_mask)
+    courses = curriculum.__courses__[first:]
+    for course in courses:
+        course.prerender()
+    counts = {name: counters[name] - count for name, count in zip(CACHED_COUNTERS, before) if counters[name] != count}
+    cache.put(key, courses, counts)
+
+def add_course_events(curriculum, course_info, day_offset, term_start_date, term_end_date, holidays, default_travel_time, workdays=None, recurring=False, term_mask=None):
+    """展开一门课程（信息完整的CourseRecord）的每一次上课并添加到课程表中"""
+    start_week, end_week, week_type = course_info.week_info
     
     # 计算具体的开始和结束时间
-    course_start_time = __course_start_time.get(start_time_slot, datetime.time(8))
-    course_end_time = __course_end_time.get(end_time_slot, datetime.time(9, 50))
+    course_start_time = __course_start_time.get(course_info.slot_start, datetime.time(8))
+    course_end_time = __course_end_time.get(course_info.slot_end, datetime.time(9, 50))
     
     # 设置地点
-    
-    if course_info['location'] == "无地点" or course_info['location'] == "未知地点":
-        location = "南方科技大学-在线课程"
-    else:
-        adjusted_location = course_info['location'].replace("三教", "第三教学楼")
-        location = f"南方科技大学-{adjusted_location}"
-
+    location = course_location(course_info.location)
     
     # 设置提醒时间
     travel_time = default_travel_time
-    if "实验室安全学" in course_info['name']:
+    if CourseParser.SPECIAL_COURSE_NAME in course_info.name:
         travel_time = default_travel_time * 2
-    elif "实验" in course_info['name'] or "实践" in course_info['name']:
+    elif "实验" in course_info.name or "实践" in course_info.name:
         travel_time = int(default_travel_time * 1.5)
     elif "第一科研楼" in location or "荔园" in location:
         travel_time = int(default_travel_time * 1.33)
     
-    # 循环遍历周次范围
-    for w in range(int(start_week), int(end_week) + 1):
-        if week_type == "单" and w % 2 == 0:
-            continue
-        if week_type == "双" and w % 2 == 1:
-            continue
-        if week_type not in ["单", "双", ""] :
-            continue  # 如果有其他类型，跳过（可选扩展）
-        
-        course_date = term_start_date + datetime.timedelta(days=(w - 1) * 7 + day_offset)
-        if course_date > term_end_date:
-            continue
-        
-        if course_date in holidays:
-            print(f"跳过节假日课程: {course_info['name']} ({course_date})")
-            continue
-        
-        weekday = course_date.weekday()
-        if weekday >= 5 and (workdays is None or course_date not in workdays):
-            print(f"跳过周末课程: {course_info['name']} ({course_date})")
-            continue
-        
-        start_datetime = datetime.datetime.combine(course_date, course_start_time)
-        end_datetime = datetime.datetime.combine(course_date, course_end_time)
-        
+    # 同一次上课在每次生成时的UID相同
+    identity = Curriculum.course_identity(course_info.name, course_info.class_info, day_offset, course_info.slot_start, course_info.slot_end)
+    
+    if recurring:
+        pattern_dates, course_dates = expand_course_weeks(course_info.name, start_week, end_week, week_type, day_offset, term_start_date, term_end_date, holidays, workdays, term_mask)
+        add_recurring_course(curriculum, course_info.name, week_type, pattern_dates, course_dates, course_start_time, course_end_time, location, travel_time, identity)
+        return
+    
+    for start_datetime, end_datetime, single_event_end in expand_course_times(course_info.name, course_info.week_info, day_offset, course_start_time, course_end_time, term_start_date, term_end_date, holidays, workdays, term_mask):
         # 添加单个事件
-        single_event_end = datetime.datetime.combine(course_date, datetime.time.max)
-        Curriculum.add_course(curriculum, course_info['name'], start_datetime, end_datetime, 
+        Curriculum.add_course(curriculum, course_info.name, start_datetime, end_datetime, 
                              location, Curriculum.CourseRepetitionType.weekly, single_event_end, 
-                             travel_time_minutes=travel_time, is_single_event=True)
+                             travel_time_minutes=travel_time, is_single_event=True,
+                             identity=identity)
         
-        print(f"添加课程: {course_info['name']} - {start_datetime.strftime('%Y-%m-%d %H:%M')} ({location})")
+        counters["added"] += 1
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"添加课程: {course_info.name} - {start_datetime.strftime('%Y-%m-%d %H:%M')} ({location})")
+
+def course_location(location):
+    """常规课程的上课地点，如"三教205" → "南方科技大学-第三教学楼205"，没有地点时为在线课程"""
+    if location == "无地点" or location == CourseParser.UNKNOWN_LOCATION:
+        return ONLINE_LOCATION
+    adjusted_location = location.replace("三教", "第三教学楼")
+    return f"南方科技大学-{adjusted_location}"
 
-def process_special_course(course_value, sheet, course_row, day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays=None):
-    """处理特殊格式的课程（如实验室安全学）"""
-    if "实验室安全学" in course_value:
-        name = "实验室安全学"
+def special_course_location(record):
+    """实验室安全学的上课地点"""
+    if record.location == "无地点":
+        return ONLINE_LOCATION
+    elif "一科报告厅" in record.location:
+        return "南方科技大学-第一科研楼报告厅"
+    else:
+        return "南方科技大学-第一科研楼101"
+
+def process_special_course(record, row_slots, day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays=None, recurring=False, term_mask=None):
+    """
+    处理特殊格式的课程（如实验室安全学）
+    :param record: 课程的CourseRecord
+    :param row_slots: 课程所在行的节次(起始节次, 结束节次)
+    :param recurring: 为True时范围周次的课程输出为一个重复事件
+    :param term_mask: 学期的WeekMask.TermMask，用于按位图展开上课周次
+    :return: 是否为特殊课程
+    """
+    if not record.is_special:
+        return False
+    if term_mask is None:
+        term_mask = WeekMask.term_mask(term_start_date, term_end_date, holidays, workdays)
+    
+    name = CourseParser.SPECIAL_COURSE_NAME
+    location = special_course_location(record)
+    safety_travel_time = default_travel_time * 2
+    
+    if record.week_start is not None and record.week_start != record.week_end:
+        # 处理范围周次，如[2-12双周]，时间段取所在行
+        start_week, end_week, week_type = record.week_info
+        identity = Curriculum.course_identity(record.name, record.class_info, day, row_slots[0], row_slots[1])
+        if recurring:
+            pattern_dates, course_dates = expand_course_weeks(name, start_week, end_week, week_type, day, term_start_date, term_end_date, holidays, workdays, term_mask)
+            add_recurring_course(curriculum, name, week_type, pattern_dates, course_dates, __course_start_time.get(row_slots[0]), __course_end_time.get(row_slots[1]), location, safety_travel_time, identity)
+            return True
         
-        # 确定地点
-        if "[无地点]" in course_value:
-            location = "南方科技大学-在线课程"
-        elif "一科报告厅" in course_value:
-            location = "南方科技大学-第一科研楼报告厅"
-        else:
-            location = "南方科技大学-第一科研楼101"
+        for start_time, end_time, single_event_end in expand_course_times(name, record.week_info, day, __course_start_time.get(row_slots[0]), __course_end_time.get(row_slots[1]), term_start_date, term_end_date, holidays, workdays, term_mask):
+            # 添加单个事件
+            Curriculum.add_course(curriculum, name, start_time, end_time, location, Curriculum.CourseRepetitionType.weekly, single_event_end, travel_time_minutes=safety_travel_time, is_single_event=True,
+                                  identity=identity)
+            counters["added"] += 1
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"添加实验室安全学: {start_time.strftime('%Y-%m-%d %H:%M')} - {end_time.strftime('%H:%M')} @ {location}")
+    
+    elif record.week_start is not None:
+        # 处理单次课程，如[12周]
+        target_week = record.week_start
         
-        # 获取时间段信息
-        row_header = sheet[f"A{course_row}"].value
-        if row_header and "第" in str(row_header) and "节" in str(row_header):
-            num_str = re.findall(r"\d+", str(row_header))
-            if len(num_str) >= 2:
-                num = [num_str[0], num_str[1]]
-            else:
-                num = [num_str[0], num_str[0]] if len(num_str) > 0 else ["1", "2"]
-        else:
-            num = ["1", "2"]  # 默认值
+        # 目标周的日期
+        target_date = term_mask.calendar.date_of(target_week, day)
         
-        # 解析周次信息
-        week_patterns = re.findall(r"\[(\d+)-(\d+)(单|双)?周\]", course_value)
-        single_week_patterns = re.findall(r"\[(\d+)周\]", course_value)
+        if record.slot_start is not None:
+            # 为每个时间段（如[1-8节]中的1-2、3-4、5-6、7-8节）创建单独的课程事件
+            time_ranges = []
+            current_slot = record.slot_start
+            while current_slot <= record.slot_end:
+                # 奇数节为开始时间
+                if current_slot % 2 == 1:
+                    slot_start_time = __course_start_time.get(current_slot, datetime.time(8))
+                    slot_end_time = __course_end_time.get(current_slot + 1, datetime.time(9, 50))
+                    time_ranges.append((current_slot, current_slot + 1, slot_start_time, slot_end_time))
+                    current_slot += 2 if current_slot < record.slot_end else 1
+                else:
+                    current_slot += 1
+        else:
+            # 如果没有找到时间段信息，使用所在行的时间
+            time_ranges = [(row_slots[0], row_slots[1], __course_start_time.get(row_slots[0]), __course_end_time.get(row_slots[1]))]
         
-        if week_patterns:
-            # 处理范围周次，如[2-12双周]
-            start_week, end_week, week_type = week_patterns[0]
-            
-            # 循环遍历周次范围
-            for w in range(int(start_week), int(end_week) + 1):
-                if week_type == "单" and w % 2 == 0:
-                    continue
-                if week_type == "双" and w % 2 == 1:
-                    continue
-                
-                course_date = term_start_date + datetime.timedelta(days=(w - 1) * 7 + day)
-                if course_date > term_end_date:
-                    continue
-                
-                if course_date in holidays:
-                    print(f"跳过节假日课程: {name} ({course_date})")
-                    continue
-                
-                weekday = course_date.weekday()
-                if weekday >= 5 and (workdays is None or course_date not in workdays):
-                    print(f"跳过周末课程: {name} ({course_date})")
-                    continue
-                
-                start_time = datetime.datetime.combine(course_date, __course_start_time.get(num[0]))
-                end_time = datetime.datetime.combine(course_date, __course_end_time.get(num[1]))
-                
-                # 添加单个事件
-                single_event_end = datetime.datetime.combine(course_date, datetime.time.max)
-                safety_travel_time = default_travel_time * 2
-                Curriculum.add_course(curriculum, name, start_time, end_time, location, Curriculum.CourseRepetitionType.weekly, single_event_end, travel_time_minutes=safety_travel_time, is_single_event=True)
-                print(f"添加实验室安全学: {start_time.strftime('%Y-%m-%d %H:%M')} - {end_time.strftime('%H:%M')} @ {location}")
+        # 实验室安全学单次课程特殊处理：只跳过节假日，不跳过周末
+        if term_mask.calendar.status_of(target_week, day) == TermCalendar.HOLIDAY:
+            counters["holiday"] += len(time_ranges)
+            log.debug("跳过节假日课程: %s (%s)", name, target_date)
+            return True
         
-        elif single_week_patterns:
-            # 处理单次课程，如[12周]
-            target_week = int(single_week_patterns[0])
-            
-            # 解析时间段信息 [1-8节]
-            time_slot_patterns = re.findall(r"\[(\d+)-(\d+)节\]", course_value)
-            if time_slot_patterns:
-                start_slot, end_slot = time_slot_patterns[0]
-                
-                # 计算目标周的日期
-                target_date = term_start_date + datetime.timedelta(days=(target_week-1)*7 + day)
-                
-                # 为每个时间段创建单独的课程事件
-                current_slot = int(start_slot)
-                while current_slot <= int(end_slot):
-                    # 确定当前时间段的开始和结束时间
-                    if current_slot % 2 == 1:  # 奇数节为开始时间
-                        slot_start_time = __course_start_time.get(str(current_slot), datetime.time(8))
-                        if current_slot < int(end_slot):
-                            slot_end_time = __course_end_time.get(str(current_slot + 1), datetime.time(9, 50))
-                            current_slot += 2
-                        else:
-                            slot_end_time = __course_end_time.get(str(current_slot + 1), datetime.time(9, 50))
-                            current_slot += 1
-                    else:
-                        current_slot += 1
-                        continue
-                    
-                    start_datetime = datetime.datetime.combine(target_date, slot_start_time)
-                    end_datetime = datetime.datetime.combine(target_date, slot_end_time)
-                    
-                    # 检查是否为节假日或调休工作日
-                    course_date = start_datetime.date()
-                    weekday = course_date.weekday()
-                    
-                    # 实验室安全学单次课程特殊处理：只跳过节假日，不跳过周末
-                    # 其他课程：节假日跳过，周末非调休日跳过，调休工作日正常上课
-                    if (course_date not in holidays):
-                        safety_travel_time = default_travel_time * 2
-                        # 单次课程不需要重复，设置结束时间为当天
-                        single_event_end = datetime.datetime.combine(target_date, datetime.time.max)
-                        Curriculum.add_course(curriculum, name, start_datetime, end_datetime, location, 
-                                             Curriculum.CourseRepetitionType.weekly, single_event_end, 
-                                             travel_time_minutes=safety_travel_time, is_single_event=True)
-                        print(f"添加实验室安全学(单次): {start_datetime.strftime('%Y-%m-%d %H:%M')} - {end_datetime.strftime('%H:%M')} @ {location}")
-            else:
-                # 如果没有找到时间段信息，使用默认时间
-                target_date = term_start_date + datetime.timedelta(days=(target_week-1)*7 + day)
-                start_time = datetime.datetime.combine(target_date, __course_start_time.get(num[0]))
-                end_time = datetime.datetime.combine(target_date, __course_end_time.get(num[1]))
-                
-                course_date = start_time.date()
-                weekday = course_date.weekday()
-                
-                # 实验室安全学单次课程特殊处理：只跳过节假日，不跳过周末
-                if (course_date not in holidays):
-                    safety_travel_time = default_travel_time * 2
-                    single_event_end = datetime.datetime.combine(target_date, datetime.time.max)
-                    Curriculum.add_course(curriculum, name, start_time, end_time, location, 
-                                         Curriculum.CourseRepetitionType.weekly, single_event_end, 
-                                         travel_time_minutes=safety_travel_time, is_single_event=True)
-                    print(f"添加实验室安全学(单次): {start_time.strftime('%Y-%m-%d %H:%M')} - {end_time.strftime('%H:%M')} @ {location}")
-        return True
-    return False
+        for slot_start, slot_end, slot_start_time, slot_end_time in time_ranges:
+            start_datetime = datetime.datetime.combine(target_date, slot_start_time)
+            end_datetime = datetime.datetime.combine(target_date, slot_end_time)
+            # 单次课程不需要重复，设置结束时间为当天
+            single_event_end = datetime.datetime.combine(target_date, datetime.time.max)
+            Curriculum.add_course(curriculum, name, start_datetime, end_datetime, location, 
+                                 Curriculum.CourseRepetitionType.weekly, single_event_end, 
+                                 travel_time_minutes=safety_travel_time, is_single_event=True,
+                                 identity=Curriculum.course_identity(record.name, record.class_info, day, slot_start, slot_end))
+            counters["added"] += 1
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"添加实验室安全学(单次): {start_datetime.strftime('%Y-%m-%d %H:%M')} - {end_datetime.strftime('%H:%M')} @ {location}")
+    return True
 
-def process_regular_course(course_value, sheet, course_row, day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays=None):
+def process_regular_course(records, day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays=None, recurring=False, term_mask=None):
     """处理常规格式的课程"""
-    val = course_value.split("\n")
+    for course_info in records:
+        add_course_to_curriculum(curriculum, course_info, day, term_start_date, term_end_date, holidays, default_travel_time, workdays=workdays, recurring=recurring, term_mask=term_mask)
+
+def parse_term_date(date_str):
+    """解析YYYYMMDD格式的日期，格式错误时抛出ValueError"""
+    if len(date_str) != 8 or not date_str.isdigit():
+        raise ValueError("日期格式错误")
+    return datetime.date(int(date_str[0:4]), int(date_str[4:6]), int(date_str[6:]))
+
+def parse_grid(grid):
+    """
+    解析课表中的全部单元格
+    :param grid: ScheduleLoader.load_schedule_grid读取的单元格列表
+    :return: [(单元格, CourseRecord列表)]，顺序与grid相同
+    """
+    with GeneratorProfile.phase("parse"):
+        return CellDedup.parse_cells(grid)
+
+def build_curriculum_from_records(parsed_cells, term_start_date, term_end_date, holidays, workdays, default_travel_time, recurring=False):
+    """
+    将解析后的单元格展开为每一次上课，生成课程表对象
+    :param parsed_cells: parse_grid的返回值
+    :param recurring: 为True时每门课程输出一个重复事件（RRULE/EXDATE/RDATE），否则每次上课输出一个单独事件
+    :return: (课程表对象, 处理的课程时间段数量)
+    """
+    # 创建课程表对象
+    curriculum = Curriculum.Curriculum()
     
-    # 尝试使用优化版的结构化解析
-    structured_courses = extract_course_info(course_value)
-    if structured_courses:
-        for course_info in structured_courses:
-            add_course_to_curriculum(curriculum, course_info, day, term_start_date, term_end_date, holidays, default_travel_time, workdays=workdays)
-        return
+    log.info("开始解析课程信息...")
     
-    # 如果结构化解析失败，使用原版的解析方法
-    for i in range(len(val)//4):
-        name = val[i * 4]
-        if not name.strip():
-            continue
-            
-        info = val[i * 4 + 3].split("][")
-        
-        # 获取时间段信息
-        row_header = sheet[f"A{course_row}"].value
-        if row_header and "第" in str(row_header) and "节" in str(row_header):
-            num = re.findall(r"\d+", str(row_header))
-        else:
-            # 从课程信息中提取时间段
-            time_info = re.findall(r"\[(\d+)-(\d+)节\]", course_value)
-            if time_info:
-                num = [time_info[0][0], time_info[0][1]]
-            else:
-                num = ["1", "2"]  # 默认值
-        
-        # 解析周次类型和时间
-        if len(info) > 0 and len(info[0]) > 2:
-            if info[0][-2] == '单':
-                repeat_type = Curriculum.CourseRepetitionType.biweekly
-                start_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day), __course_start_time.get(num[0]))
-                end_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day), __course_end_time.get(num[1]))
-            elif info[0][-2] == '双':
-                repeat_type = Curriculum.CourseRepetitionType.biweekly
-                start_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day+7), __course_start_time.get(num[0]))
-                end_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day+7), __course_end_time.get(num[1]))
-            else:
-                repeat_type = Curriculum.CourseRepetitionType.weekly
-                start_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day), __course_start_time.get(num[0]))
-                end_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day), __course_end_time.get(num[1]))
-        else:
-            repeat_type = Curriculum.CourseRepetitionType.weekly
-            start_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day), __course_start_time.get(num[0]))
-            end_time = datetime.datetime.combine(term_start_date + datetime.timedelta(days=day), __course_end_time.get(num[1]))
+    # 学期内每个星期的周次位图，所有课程共用
+    term_mask = WeekMask.term_mask(term_start_date, term_end_date, holidays, workdays)
+    
+    # 去掉重复的单元格和课程，相邻节次的同一门课程合并为一个时间段
+    sections = CellDedup.merge_sections(parsed_cells, counters)
+    total_courses = len(sections)
+    GeneratorProfile.count("records", sum(len(records) for _, records in parsed_cells))
+    
+    day = None
+    for section in sections:
+        if section.day != day:
+            day = section.day
+            log.debug("处理第%d列 (星期%s):", day + 1, "一二三四五六日"[day])
+        record = section.record
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"  第{section.row}行: {record.name} {record.raw_text}")
         
-        # 确定地点
-        if len(info) > 1:
-            location = "南方科技大学-" + info[1]
+        if record.is_special:
+            with GeneratorProfile.phase("process_special"):
+                process_special_course(record, section.row_slots, day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays, recurring, term_mask)
         else:
-            location = "南方科技大学-未知地点"
-        
-        # 检查是否为节假日或调休工作日
-        course_date = start_time.date()
-        weekday = course_date.weekday()
-        
-        # 节假日跳过，周末非调休日跳过，调休工作日正常上课
-        if (course_date in holidays or 
-            (weekday >= 5 and (not workdays or course_date not in workdays))):
-            print(f"跳过节假日或非工作日课程: {name} on {course_date}")
-            continue
-        
-        # 根据课程类型调整路程时间
-        travel_time = default_travel_time
-        if "实验" in name or "实践" in name:
-            travel_time = int(default_travel_time * 1.5)
-        elif "第一科研楼" in location or "荔园" in location:
-            travel_time = int(default_travel_time * 1.33)
-        
-        term_end_datetime = datetime.datetime.combine(term_end_date, datetime.time.max)
-        Curriculum.add_course(curriculum, name, start_time, end_time, location, repeat_type, term_end_datetime, travel_time_minutes=travel_time)
-        print(f"添加课程: {name} - {start_time.strftime('%Y-%m-%d %H:%M')} - {end_time.strftime('%H:%M')} @ {location}")
+            # 处理常规课程
+            with GeneratorProfile.phase("process_regular"):
+                process_regular_course([record], day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays, recurring, term_mask)
+    
+    GeneratorProfile.count("sections", total_courses)
+    GeneratorProfile.count("events", len(curriculum.__courses__))
+    return curriculum, total_courses
+
+def verify_recurring(parsed_cells, term_start_date, term_end_date, holidays, workdays, default_travel_time):
+    """
+    分别以逐次事件和重复事件两种方式生成课程表，比较展开后的每一次上课
+    :param parsed_cells: parse_grid的返回值
+    :return: (重复事件中缺少的上课列表, 重复事件中多出的上课列表)
+    """
+    with GeneratorLog.suppressed():
+        expanded, _ = build_curriculum_from_records(parsed_cells, term_start_date, term_end_date, holidays, workdays, default_travel_time, recurring=False)
+        recurring, _ = build_curriculum_from_records(parsed_cells, term_start_date, term_end_date, holidays, workdays, default_travel_time, recurring=True)
+    expected = collections.Counter(expanded.occurrences())
+    actual = collections.Counter(recurring.occurrences())
+    return sorted((expected - actual).elements()), sorted((actual - expected).elements())
+
+def save_profile(prefix, started_wall, started_cpu):
+    """保存性能分析结果并输出各阶段耗时（--profile，退出时调用）"""
+    total = {"wall": round(time.perf_counter() - started_wall, 6), "cpu": round(time.process_time() - started_cpu, 6)}
+    try:
+        paths = GeneratorProfile.save(prefix, {"total": total})
+    except OSError as e:
+        log.error("错误：无法保存性能分析结果 - %s", e)
+        return
+    for line in GeneratorProfile.format_report():
+        log.info(line)
+    log.info("总耗时%.2fms（CPU %.2fms），性能分析结果已保存为: %s", total["wall"] * 1000, total["cpu"] * 1000, "、".join(paths))
 
 def main():
     """主函数"""
     # 参数检查
-    if len(sys.argv) < 4 or len(sys.argv) > 5:
+    options = {}
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--"):
+            name, _, value = arg.partition("=")
+            options[name] = value
+        else:
+            args.append(arg)
+    for option in options:
+        if option not in ("--offline", "--recurring", "--verify", "--no-cache", "--save-schedule", "--previous", "--quiet", "--log-level", "--log-json", "--profile"):
+            print(f"错误：未知选项 {option}")
+            usage()
+    offline = "--offline" in options
+    recurring = "--recurring" in options
+    verify = "--verify" in options
+    schedule_file = options.get("--save-schedule") or None
+    
+    # 日志设置：默认输出每次上课的明细，--quiet只输出警告和错误
+    log_level = logging.WARNING if "--quiet" in options else logging.DEBUG
+    if options.get("--log-level"):
+        try:
+            log_level = GeneratorLog.parse_level(options["--log-level"])
+        except ValueError as e:
+            print(f"错误：{str(e)}")
+            usage()
+    GeneratorLog.configure(log_level, options.get("--log-json") or None)
+    
+    # 性能分析：退出时（包括出错退出）保存各阶段的耗时和cProfile统计
+    if "--profile" in options:
+        GeneratorProfile.start(cprofile=True)
+        atexit.register(save_profile, options["--profile"] or PROFILE_PREFIX, time.perf_counter(), time.process_time())
+    
+    if len(args) < 3 or len(args) > 4:
         usage()
     
-    excel_file = sys.argv[1]
-    if not excel_file.endswith(".xlsx"):
-        print("错误：请提供.xlsx格式的Excel文件")
+    excel_file = args[0]
+    if not excel_file.endswith(".xlsx") and not ScheduleFile.is_schedule_file(excel_file):
+        print(f"错误：请提供.xlsx格式的Excel文件或{ScheduleFile.SCHEDULE_SUFFIX}格式的中间格式文件")
         usage()
     
     try:
-        term_start_str = sys.argv[2]
-        term_end_str = sys.argv[3]
-        
-        if len(term_start_str) != 8 or len(term_end_str) != 8:
-            raise ValueError("日期格式错误")
-        
-        term_start_date = datetime.date(int(term_start_str[0:4]), int(term_start_str[4:6]), int(term_start_str[6:]))
-        term_end_date = datetime.date(int(term_end_str[0:4]), int(term_end_str[4:6]), int(term_end_str[6:]))
+        term_start_date = parse_term_date(args[1])
+        term_end_date = parse_term_date(args[2])
     except ValueError:
         print("错误：日期格式必须为YYYYMMDD")
         usage()
     
     # 路程时间设置
     default_travel_time = 30
-    if len(sys.argv) == 5:
+    if len(args) == 4:
         try:
-            default_travel_time = int(sys.argv[4])
+            default_travel_time = int(args[3])
             if default_travel_time < 0:
                 print("错误：路程时间提醒必须是正整数")
                 usage()
@@ -519,96 +511,110 @@ def main():
             print("错误：路程时间提醒必须是整数")
             usage()
     
-    print(f"开始处理课程表: {excel_file}")
-    print(f"学期时间: {term_start_date} 到 {term_end_date}")
-    print(f"路程提醒时间: {default_travel_time} 分钟")
-    print()
+    log.info("开始处理课程表: %s", excel_file)
+    log.info("学期时间: %s 到 %s", term_start_date, term_end_date)
+    log.info("路程提醒时间: %d 分钟", default_travel_time)
     
-    # 加载Excel文件
     try:
-        workbook = openpyxl.load_workbook(excel_file)
-        sheet = workbook.active
-    except Exception as e:
-        print(f"错误：无法读取Excel文件 - {str(e)}")
+        with GeneratorProfile.phase("read"), open(excel_file, "rb") as fp:
+            workbook_data = fp.read()
+    except OSError as e:
+        log.error("错误：无法读取Excel文件 - %s", e)
         sys.exit(1)
     
+    # 读取上一次的输出（可能就是即将覆盖的文件），用于增量更新
+    previous_events = None
+    if options.get("--previous"):
+        try:
+            with open(options["--previous"], encoding="utf8", newline="") as fp:
+                previous_events = CalendarDelta.parse_events(fp.read())
+        except (OSError, UnicodeDecodeError) as e:
+            log.error("错误：无法读取上一次的课程表 - %s", e)
+            sys.exit(1)
+    
     # 获取节假日和调休工作日信息
-    holidays, workdays = get_holidays_and_workdays(term_start_date, term_end_date)
+    holidays, workdays = get_holidays_and_workdays(term_start_date, term_end_date, offline)
     
-    # 创建课程表对象
-    curriculum = Curriculum.Curriculum()
+    # 输入没有变化时直接使用缓存的结果（校验或保存中间格式时总是重新生成；增量更新的输出与上一次的文件有关，不使用缓存）
+    cache = None if "--no-cache" in options or previous_events is not None else OutputCache.OutputCache()
+    if cache is not None:
+        cache_key = OutputCache.make_key(workbook_data, term_start_date, term_end_date, default_travel_time, HolidayProvider.term_version(holidays, workdays), recurring)
+        with GeneratorProfile.phase("cache"):
+            cached = None if verify or schedule_file else cache.get(cache_key)
+        if cached is not None:
+            AtomicFile.write_atomic(OUTPUT_FILE, cached)
+            event_count = cached.count(b"BEGIN:VEVENT")
+            log.info("输入没有变化，使用缓存的结果")
+            log.info("课程表已保存为: %s", OUTPUT_FILE)
+            log.info("生成的日历事件数量: %d", event_count, extra={"fields": {"event_count": event_count, "cached": True}})
+            return
+    
+    # 加载Excel文件或中间格式文件
+    try:
+        parsed_cells = ScheduleFile.load_parsed_cells(workbook_data, excel_file)
+    except Exception as e:
+        log.error("错误：无法读取课表文件 - %s", e)
+        sys.exit(1)
     
-    print("开始解析课程信息...")
+    if schedule_file:
+        try:
+            AtomicFile.write_atomic(schedule_file, ScheduleFile.dumps(parsed_cells, os.path.basename(excel_file), hashlib.sha256(workbook_data).hexdigest()))
+        except OSError as e:
+            log.error("错误：无法保存中间格式文件 - %s", e)
+            sys.exit(1)
+        log.info("解析后的课表已保存为: %s", schedule_file)
     
-    # 用于去重的集合，存储已处理的特殊课程
-    processed_special_courses = set()
+    with GeneratorProfile.phase("expand"):
+        curriculum, total_courses = build_curriculum_from_records(parsed_cells, term_start_date, term_end_date, holidays, workdays, default_travel_time, recurring)
     
-    # 遍历Excel表格的列（星期一到星期日）
-    day = 0  # 0=星期一, 1=星期二, ..., 6=星期日
-    total_courses = 0
+    log.info("总共处理了 %d 个课程时间段", total_courses)
+    GeneratorLog.log_counters()
     
-    for col in sheet.iter_cols(min_col=2, max_col=8, min_row=4, max_row=sheet.max_row):
-        print(f"\n处理第{day+1}列 (星期{['一', '二', '三', '四', '五', '六', '日'][day]}):")
-        
-        for course in col:
-            if course.value and isinstance(course.value, str):
-                print(f"  第{course.row}行: {repr(course.value[:50])}...")
-                
-                # 检查是否为特殊课程且已处理过
-                if "实验室安全学" in course.value:
-                    # 提取关键信息用于去重：周次信息、地点信息、时间段信息
-                    week_info = ""
-                    location_info = ""
-                    time_info = ""
-                    
-                    # 提取周次信息
-                    week_patterns = re.findall(r"\[(\d+)-(\d+)(单|双)?周\]", course.value)
-                    single_week_patterns = re.findall(r"\[(\d+)周\]", course.value)
-                    if week_patterns:
-                        week_info = f"{week_patterns[0][0]}-{week_patterns[0][1]}{week_patterns[0][2]}周"
-                    elif single_week_patterns:
-                        week_info = f"{single_week_patterns[0]}周"
-                    
-                    # 提取地点信息
-                    if "[无地点]" in course.value:
-                        location_info = "无地点"
-                    elif "一科报告厅" in course.value:
-                        location_info = "一科报告厅"
-                    
-                    # 提取时间段信息
-                    time_patterns = re.findall(r"\[(\d+)-(\d+)节\]", course.value)
-                    if time_patterns:
-                        time_info = f"{time_patterns[0][0]}-{time_patterns[0][1]}节"
-                    
-                    # 创建唯一标识符
-                    course_key = f"实验室安全学_{week_info}_{location_info}_{time_info}"
-                    if course_key in processed_special_courses:
-                        print(f"    跳过重复的特殊课程: 实验室安全学 ({week_info}, {location_info}, {time_info})")
-                        continue
-                    processed_special_courses.add(course_key)
-                
-                # 首先尝试处理特殊课程
-                if process_special_course(course.value, sheet, course.row, day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays):
-                    total_courses += 1
-                    continue
-                
-                # 处理常规课程
-                if '[' in course.value:
-                    process_regular_course(course.value, sheet, course.row, day, term_start_date, term_end_date, holidays, default_travel_time, curriculum, workdays)
-                    total_courses += 1
-        
-        day += 1
+    if verify:
+        with GeneratorProfile.phase("verify"):
+            missing, extra = verify_recurring(parsed_cells, term_start_date, term_end_date, holidays, workdays, default_travel_time)
+        if missing or extra:
+            log.error("错误：重复事件与逐次事件的上课时间不一致，缺少%d次，多出%d次", len(missing), len(extra))
+            for occurrence in missing:
+                log.error("  缺少: %s %s @ %s", occurrence[0], occurrence[1], occurrence[3])
+            for occurrence in extra:
+                log.error("  多出: %s %s @ %s", occurrence[0], occurrence[1], occurrence[3])
+            sys.exit(1)
+        log.info("校验通过：重复事件与逐次事件的上课时间一致")
+    
+    # 与上一次的输出比较：修改的事件SEQUENCE加1，保留CREATED
+    delta = None
+    if previous_events is not None:
+        with GeneratorProfile.phase("delta"):
+            delta = CalendarDelta.apply_previous(curriculum, previous_events)
+        log.info("与上一次相比: 新增%d个，修改%d个，删除%d个，未变化%d个事件",
+                 len(delta.added), len(delta.modified), len(delta.removed), delta.unchanged)
     
-    print(f"\n总共处理了 {total_courses} 个课程时间段")
+    # 保存ICS文件（写入时同时统计事件数量）
+    with GeneratorProfile.phase("render"):
+        event_count = curriculum.save_as_ics_file(OUTPUT_FILE)
+    log.info("课程表已保存为: %s", OUTPUT_FILE)
+    log.info("生成的日历事件数量: %d", event_count, extra={"fields": {"event_count": event_count, "cached": False}})
     
-    # 保存ICS文件
-    curriculum.save_as_ics_file()
-    print(f"课程表已保存为: {curriculum.calendar_name}.ics")
+    if delta is not None:
+        # 两个日历分别保存，本次没有内容的文件删除，避免导入上一次遗留的增量更新
+        for path, chunks, description in ((DELTA_FILE, CalendarDelta.iter_publish_chunks(curriculum, delta), "新增和修改的事件"),
+                                          (CANCEL_FILE, CalendarDelta.iter_cancel_chunks(curriculum, delta), "删除通知")):
+            content = "".join(chunks)
+            if content:
+                AtomicFile.write_atomic(path, content.encode("utf8"))
+                log.info("%s已保存为: %s", description, path)
+            elif os.path.exists(path):
+                os.unlink(path)
+        if not delta.changed:
+            log.info("课程表没有变化，不生成增量更新")
     
-    # 统计生成的课程
-    ics_content = curriculum.get_ics_text()
-    event_count = ics_content.count('BEGIN:VEVENT')
-    print(f"生成的日历事件数量: {event_count}")
+    if cache is not None:
+        try:
+            with GeneratorProfile.phase("cache"), open(OUTPUT_FILE, "rb") as fp:
+                cache.put(cache_key, fp.read())
+        except OSError as e:
+            log.warning("写入输出缓存失败: %s", e)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
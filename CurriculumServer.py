@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程表转换HTTP服务
+常驻运行，避免每次转换都重新启动解释器、导入openpyxl并重新获取节假日：
+- 节假日和调休工作日按学期缓存在内存中（CurriculumAPI.get_term_holidays）
+- 解析、展开、渲染在常驻的进程池中执行，事件循环只负责收发数据
+- 限制同时转换的数量和排队的请求数量，超出时返回503
+- 相同的输入直接返回输出缓存（OutputCache）中的结果，不占用工作进程
+
+接口:
+    POST /convert?start=YYYYMMDD&end=YYYYMMDD[&travel=30][&recurring=1][&name=课程表]
+         请求体为xlsx文件内容，返回text/calendar（带Content-Length的完整响应）
+    GET  /health
+         返回JSON格式的运行状态和转换耗时分位数
+每个连接只处理一个请求
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import http
+import json
+import logging
+import math
+import os
+import signal
+import time
+import urllib.parse
+
+import CurriculumAPI
+import CurriculumGenerator
+import GeneratorLog
+import HolidayProvider
+import OutputCache
+
+log = GeneratorLog.logger
+
+MAX_HEADER_SIZE = 16 * 1024
+DEFAULT_MAX_UPLOAD = 5 * 1024 * 1024
+REQUEST_TIMEOUT = 30          # 读取请求的超时时间（秒）
+LATENCY_WINDOW = 1000         # 计算耗时分位数的最近请求数量
+
+class HttpError(Exception):
+    """以指定状态码结束请求"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+def _init_worker():
+    """工作进程只输出警告和错误"""
+    GeneratorLog.configure(logging.WARNING)
+
+def _warm_worker():
+    """空任务，用于在启动时创建全部工作进程"""
+    return None
+
+def convert_workbook(data, term_start_date, term_end_date, holidays, workdays, default_travel_time, recurring=False, calendar_name=None):
+    """
+    在工作进程中将xlsx内容转换为ics
+    :param data: xlsx文件内容
+    :return: (UTF-8编码的ics内容, 事件数量)
+    """
+    options = CurriculumAPI.ConvertOptions(term_start_date, term_end_date, default_travel_time, recurring, calendar_name, holidays, workdays)
+    ics = CurriculumAPI.convert(data, options)
+    return ics, ics.count(b"BEGIN:VEVENT")
+
+def percentile(sorted_values, p):
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class ConversionService:
+    """转换服务：学期缓存、进程池、并发限制和统计"""
+
+    def __init__(self, workers=None, max_concurrent=None, max_pending=64, offline=False, output_cache=None):
+        """
+        :param workers: 工作进程数量，默认为CPU核数
+        :param max_concurrent: 同时转换的数量，默认与工作进程数量相同
+        :param max_pending: 正在转换和排队的请求总数上限
+        :param offline: 只使用缓存和内置的节假日数据
+        :param output_cache: OutputCache实例，None时不缓存输出
+        """
+        self.output_cache = output_cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.offline = offline
+        self.executor = None
+        self._max_concurrent = max_concurrent
+        self._slots = None
+        self.pending = 0
+        self.in_flight = 0
+        self.started = time.time()
+        self.requests = collections.Counter()   # 状态码 → 数量
+        self.conversions = 0
+        self.events = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def start(self):
+        """创建进程池并预先启动全部工作进程"""
+        self._start_pool()
+        self._slots = asyncio.Semaphore(self._max_concurrent or self.workers)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _warm_worker) for _ in range(self.workers)))
+
+    def _start_pool(self):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def get_term(self, term_start_date, term_end_date):
+        """
+        获取学期内的节假日和调休工作日，使用CurriculumAPI的学期缓存
+        同一学期的并发请求共用一次获取
+        """
+        return await asyncio.to_thread(CurriculumAPI.get_term_holidays, term_start_date, term_end_date, self.offline, True)
+
+    async def convert(self, data, term_start_date, term_end_date, default_travel_time, recurring=False, calendar_name=None):
+        """
+        转换一个课表，超出排队上限时抛出HttpError(503)
+        :return: (ics内容, 事件数量)
+        """
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "服务繁忙，请稍后重试", {"Retry-After": "1"})
+        self.pending += 1
+        try:
+            holidays, workdays = await self.get_term(term_start_date, term_end_date)
+            cache_key = None
+            if self.output_cache is not None:
+                cache_key = OutputCache.make_key(data, term_start_date, term_end_date, default_travel_time,
+                                                 HolidayProvider.term_version(holidays, workdays), recurring, calendar_name)
+                cached = await asyncio.to_thread(self.output_cache.get, cache_key)
+                if cached is not None:
+                    self.cache_hits += 1
+                    return cached, cached.count(b"BEGIN:VEVENT")
+                self.cache_misses += 1
+
+            async with self._slots:
+                self.in_flight += 1
+                try:
+                    ics, event_count = await self._run_in_pool(
+                        convert_workbook, data, term_start_date, term_end_date,
+                        holidays, workdays, default_travel_time, recurring, calendar_name)
+                finally:
+                    self.in_flight -= 1
+        finally:
+            self.pending -= 1
+
+        if cache_key is not None:
+            try:
+                await asyncio.to_thread(self.output_cache.put, cache_key, ics)
+            except OSError as e:
+                log.warning("写入输出缓存失败: %s", e)
+        return ics, event_count
+
+    async def _run_in_pool(self, function, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, function, *args)
+        except concurrent.futures.process.BrokenProcessPool:
+            # 工作进程异常退出，重建进程池，本次请求失败
+            log.error("工作进程异常退出，重建进程池")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self._start_pool()
+            raise HttpError(500, "工作进程异常退出")
+        except HttpError:
+            raise
+        except Exception as e:
+            raise HttpError(422, f"无法处理课表 - {type(e).__name__}: {e}")
+
+    def record(self, status, latency=None, event_count=0):
+        """记录一个请求的结果，latency为成功转换的耗时（秒）"""
+        self.requests[status] += 1
+        if latency is not None:
+            self.conversions += 1
+            self.events += event_count
+            self.latencies.append(latency)
+
+    def metrics(self):
+        """运行状态和最近转换耗时的分位数（毫秒）"""
+        window = sorted(self.latencies)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            "status": "ok",
+            "uptime": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "requests": {str(status): count for status, count in sorted(self.requests.items())},
+            "conversions": self.conversions,
+            "events": self.events,
+            "output_cache": {
+                "enabled": self.output_cache is not None,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+            },
+            "cached_terms": [f"{start:%Y%m%d}-{end:%Y%m%d}" for start, end in CurriculumAPI.cached_terms()],
+            "latency_ms": {
+                "window": len(window),
+                "p50": ms(percentile(window, 50)),
+                "p90": ms(percentile(window, 90)),
+                "p99": ms(percentile(window, 99)),
+                "max": ms(window[-1] if window else None),
+            },
+        }
+
+def _parse_convert_query(query):
+    """解析/convert的查询参数，不合法时抛出HttpError(400)"""
+    params = {key: values[-1] for key, values in urllib.parse.parse_qs(query).items()}
+    try:
+        term_start_date = CurriculumGenerator.parse_term_date(params["start"])
+        term_end_date = CurriculumGenerator.parse_term_date(params["end"])
+    except KeyError:
+        raise HttpError(400, "缺少start或end参数")
+    except ValueError:
+        raise HttpError(400, "日期格式必须为YYYYMMDD")
+    if term_end_date < term_start_date:
+        raise HttpError(400, "学期结束日期早于开始日期")
+    try:
+        travel_time = int(params.get("travel", 30))
+    except ValueError:
+        raise HttpError(400, "路程时间提醒必须是正整数")
+    if travel_time < 0:
+        raise HttpError(400, "路程时间提醒必须是正整数")
+    recurring = params.get("recurring", "0").lower() in ("1", "true", "yes")
+    return term_start_date, term_end_date, travel_time, recurring, params.get("name") or None
+
+async def _read_request(reader, max_upload):
+    """
+    读取一个HTTP请求
+    :return: (方法, 路径, 查询字符串, 请求头字典, 请求体)
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "请求头过长")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "无效的请求")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if method == "POST":
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(411, "需要Content-Length")
+        try:
+            length = int(headers["content-length"])
+        except (KeyError, ValueError):
+            raise HttpError(411, "需要Content-Length")
+        if length > max_upload:
+            raise HttpError(413, f"文件过大，上限为{max_upload}字节")
+        body = await reader.readexactly(length)
+    parts = urllib.parse.urlsplit(target)
+    return method, parts.path, parts.query, headers, body
+
+def _response_head(status, headers):
+    lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+async def _send(writer, status, body, content_type="text/plain; charset=utf-8", headers=None):
+    """发送完整的响应"""
+    all_headers = {"Content-Type": content_type, "Content-Length": str(len(body)), "Connection": "close"}
+    all_headers.update(headers or {})
+    writer.write(_response_head(status, all_headers) + body)
+    await writer.drain()
+
+def _attachment_header(calendar_name):
+    filename = f"{calendar_name or '课程表'}.ics"
+    return f"attachment; filename=\"calendar.ics\"; filename*=UTF-8''{urllib.parse.quote(filename)}"
+
+class CurriculumServer:
+    """HTTP请求处理"""
+
+    def __init__(self, service, max_upload=DEFAULT_MAX_UPLOAD):
+        self.service = service
+        self.max_upload = max_upload
+
+    async def handle(self, reader, writer):
+        started = time.perf_counter()
+        status = 500
+        method = path = ""
+        converted = False
+        try:
+            try:
+                method, path, query, headers, body = await asyncio.wait_for(_read_request(reader, self.max_upload), REQUEST_TIMEOUT)
+                status = await self.dispatch(writer, method, path, query, body, started)
+                converted = path == "/convert"
+            except HttpError as e:
+                status = e.status
+                await _send(writer, e.status, (e.message + "\n").encode("utf8"), headers=e.headers)
+            except asyncio.TimeoutError:
+                status = 408
+                await _send(writer, status, "读取请求超时\n".encode("utf8"))
+            except asyncio.IncompleteReadError:
+                status = 400
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception:
+            log.exception("处理请求出错")
+        finally:
+            # 成功的转换已在dispatch中连同耗时一起记录
+            if not converted:
+                self.service.record(status)
+            log.info("%s %s %d %.1fms", method, path, status, (time.perf_counter() - started) * 1000)
+            writer.close()
+            # 等待连接真正关闭，客户端已断开时的错误可以忽略
+            try:
+                await writer.wait_closed()
+            except (OSError, asyncio.CancelledError):
+                pass
+
+    async def dispatch(self, writer, method, path, query, body, started):
+        """按路径处理请求，返回状态码"""
+        if path == "/health":
+            if method != "GET":
+                raise HttpError(405, "只支持GET", {"Allow": "GET"})
+            payload = json.dumps(self.service.metrics(), ensure_ascii=False, indent=2).encode("utf8")
+            await _send(writer, 200, payload, "application/json; charset=utf-8")
+            return 200
+        if path == "/convert":
+            if method != "POST":
+                raise HttpError(405, "只支持POST", {"Allow": "POST"})
+            term_start_date, term_end_date, travel_time, recurring, calendar_name = _parse_convert_query(query)
+            if not body:
+                raise HttpError(400, "请求体为空，请上传xlsx文件")
+            ics, event_count = await self.service.convert(body, term_start_date, term_end_date, travel_time, recurring, calendar_name)
+            self.service.record(200, time.perf_counter() - started, event_count)
+            # 转换在工作进程中一次完成，结果还要写入输出缓存，直接以完整响应发送
+            await _send(writer, 200, ics, "text/calendar; charset=utf-8", {
+                "Content-Disposition": _attachment_header(calendar_name),
+                "X-Event-Count": str(event_count),
+            })
+            return 200
+        raise HttpError(404, "未知路径")
+
+async def serve(host, port, service, max_upload=DEFAULT_MAX_UPLOAD, warm_terms=()):
+    """启动服务并一直运行"""
+    await service.start()
+    for term_start_date, term_end_date in warm_terms:
+        holidays, workdays = await service.get_term(term_start_date, term_end_date)
+        log.info("已缓存学期 %s - %s: %d个节假日，%d个调休工作日", term_start_date, term_end_date, len(holidays), len(workdays))
+    handler = CurriculumServer(service, max_upload)
+    server = await asyncio.start_server(handler.handle, host, port, limit=MAX_HEADER_SIZE)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    log.info("服务已启动: %s，工作进程%d个", addresses, service.workers)
+    # 收到SIGINT/SIGTERM时停止接受连接并退出（Windows不支持，使用Ctrl+C）
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    async with server:
+        await stop.wait()
+    log.info("服务已停止")
+
+def main():
+    """服务入口"""
+    parser = argparse.ArgumentParser(description="xlsx课表转ics的常驻HTTP服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8080, help="监听端口，默认8080")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="工作进程数量，默认为CPU核数")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="同时转换的数量，默认与工作进程数量相同")
+    parser.add_argument("--max-pending", type=int, default=64, help="正在转换和排队的请求总数上限，超出时返回503，默认64")
+    parser.add_argument("--max-upload", type=int, default=DEFAULT_MAX_UPLOAD, help=f"上传文件大小上限（字节），默认{DEFAULT_MAX_UPLOAD}")
+    parser.add_argument("--warm", nargs=2, action="append", default=[], metavar=("开始日期", "结束日期"), help="启动时预先获取学期的节假日，可多次指定")
+    parser.add_argument("--offline", action="store_true", help="不访问网络，只使用本地缓存和内置的节假日信息")
+    parser.add_argument("--cache-dir", default=None, help="输出缓存目录，默认为用户缓存目录")
+    parser.add_argument("--cache-size", type=int, default=OutputCache.DEFAULT_MAX_BYTES // (1024 * 1024), help="输出缓存大小上限（MB），默认64")
+    parser.add_argument("--no-cache", action="store_true", help="不使用输出缓存")
+    parser.add_argument("--log-level", default="info", choices=sorted(GeneratorLog.LEVELS), help="日志级别，默认为info（每个请求一行）")
+    args = parser.parse_args()
+
+    for name in ("workers", "max_concurrent"):
+        if getattr(args, name) is not None and getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')}必须大于0")
+    if args.max_pending < 1 or args.max_upload < 1 or args.cache_size < 1:
+        parser.error("--max-pending、--max-upload和--cache-size必须大于0")
+    try:
+        warm_terms = [(CurriculumGenerator.parse_term_date(start), CurriculumGenerator.parse_term_date(end)) for start, end in args.warm]
+    except ValueError:
+        parser.error("日期格式必须为YYYYMMDD")
+
+    GeneratorLog.configure(GeneratorLog.parse_level(args.log_level))
+    output_cache = None if args.no_cache else OutputCache.OutputCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    service = ConversionService(args.workers, args.max_concurrent, args.max_pending, args.offline, output_cache)
+    try:
+        asyncio.run(serve(args.host, args.port, service, args.max_upload, warm_terms))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
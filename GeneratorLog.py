@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程表生成器的日志和计数
+- 基于标准库logging，按级别过滤；逐次上课的明细为DEBUG级别
+- 可选输出JSON Lines格式的日志文件
+- 添加/跳过的上课次数只在内存中计数，结束时统一输出一次
+"""
+
+import collections
+import contextlib
+import datetime
+import json
+import logging
+import sys
+
+logger = logging.getLogger("CurriculumGenerator")
+
+# 上课次数计数：added=添加，holiday=跳过节假日，weekend=跳过周末，
+# duplicate=跳过重复的课程，merged=合并到相邻节次的课程，incomplete=缺少周次或节次信息而跳过的课程
+counters = collections.Counter()
+
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，extra中的fields会合并到输出中"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def configure(level=logging.DEBUG, json_path=None, stream=None):
+    """
+    配置日志输出，低于level的日志不会被格式化
+    :param level: 日志级别
+    :param json_path: JSON Lines日志文件路径，为None时不输出
+    :param stream: 终端输出流，默认为标准输出
+    """
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    logger.propagate = False
+    logger.setLevel(level)
+
+    console = logging.StreamHandler(stream or sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(console)
+
+    if json_path:
+        json_handler = logging.FileHandler(json_path, encoding="utf8")
+        json_handler.setFormatter(JsonLinesFormatter())
+        logger.addHandler(json_handler)
+
+def parse_level(name):
+    """将级别名称（debug/info/warning/error）转换为logging级别，无效时抛出ValueError"""
+    try:
+        return LEVELS[name.lower()]
+    except KeyError:
+        raise ValueError(f"未知的日志级别: {name}")
+
+@contextlib.contextmanager
+def suppressed():
+    """临时关闭日志输出，期间的计数也不保留（如校验时额外生成的课程表）"""
+    level = logger.level
+    saved = counters.copy()
+    logger.setLevel(logging.CRITICAL + 1)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+        counters.clear()
+        counters.update(saved)
+
+def reset_counters():
+    counters.clear()
+
+def log_counters(counts=None):
+    """输出一次上课次数统计"""
+    counts = counters if counts is None else counts
+    logger.info(
+        "上课次数统计: 添加%d次，跳过节假日%d次，跳过周末%d次，跳过重复%d次，合并相邻节次%d次，信息不全%d门",
+        counts["added"], counts["holiday"], counts["weekend"], counts["duplicate"], counts["merged"], counts["incomplete"],
+        extra={"fields": {"counters": dict(counts)}},
+    )
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程表生成器的分阶段计时和性能分析
+- phase(名称)包裹一个阶段，记录调用次数、墙钟时间和CPU时间（嵌套的阶段分别计入各自的名称）
+- count(名称, 数量)记录单元格、课程、事件等数量
+- 可同时用cProfile记录函数级的耗时，保存为pstats可读取的文件
+- 批量生成时各工作进程的结果通过merge/merge_stats汇总
+没有调用start时phase返回共用的空上下文管理器，count直接返回，几乎没有额外开销
+"""
+
+import collections
+import json
+import marshal
+import time
+
+REPORT_VERSION = 1
+REPORT_SUFFIX = ".profile.json"
+STATS_SUFFIX = ".prof"
+
+enabled = False
+# 阶段名称 → [调用次数, 墙钟时间, CPU时间]
+_phases = {}
+_counts = collections.Counter()
+_profiler = None
+_stats = None   # 合并的pstats.Stats
+
+class _Phase:
+    """计时一个阶段"""
+    __slots__ = ("name", "wall", "cpu")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        entry = _phases.get(self.name)
+        if entry is None:
+            _phases[self.name] = [1, wall, cpu]
+        else:
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+        return False
+
+class _NullPhase:
+    """关闭计时时使用的空上下文管理器"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+def phase(name):
+    """
+    阶段计时的上下文管理器
+        with GeneratorProfile.phase("expand"):
+            ...
+    """
+    if not enabled:
+        return _NULL_PHASE
+    return _Phase(name)
+
+def count(name, value=1):
+    """累加一个计数"""
+    if enabled:
+        _counts[name] += value
+
+def start(cprofile=False):
+    """
+    开始计时
+    :param cprofile: 同时启用cProfile
+    """
+    global enabled, _profiler
+    enabled = True
+    if cprofile and _profiler is None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def _flush_profiler(restart):
+    """停止cProfile并将结果合并到_stats，restart为True时重新开始记录"""
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.disable()
+    _profiler.create_stats()
+    _merge_stats_object(_StatsData(_profiler.stats))
+    _profiler = None
+    if restart:
+        start(cprofile=True)
+
+def stop():
+    """停止计时和cProfile，已记录的结果保留"""
+    global enabled
+    enabled = False
+    _flush_profiler(restart=False)
+
+def reset():
+    """清空已记录的结果"""
+    global _stats
+    _phases.clear()
+    _counts.clear()
+    _stats = None
+
+def report():
+    """
+    当前的计时结果
+    :return: {"version": 1, "phases": {名称: {"calls", "wall", "cpu"}}, "counters": {名称: 数量}}
+    """
+    phases = {name: {"calls": calls, "wall": round(wall, 6), "cpu": round(cpu, 6)}
+              for name, (calls, wall, cpu) in _phases.items()}
+    return {"version": REPORT_VERSION, "phases": phases, "counters": dict(_counts)}
+
+def merge(other):
+    """将另一个report()的结果（如工作进程的结果）累加到当前结果中"""
+    for name, values in other.get("phases", {}).items():
+        entry = _phases.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += values["calls"]
+        entry[1] += values["wall"]
+        entry[2] += values["cpu"]
+    _counts.update(other.get("counters", {}))
+
+class _StatsData:
+    """已收集的cProfile统计，供pstats.Stats读取（pstats会调用create_stats并读取stats）"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def _merge_stats_object(data):
+    global _stats
+    import pstats
+    if _stats is None:
+        _stats = pstats.Stats(data)
+    else:
+        _stats.add(data)
+
+def collect_stats():
+    """
+    取出目前为止的cProfile统计结果（之后继续记录），用于从工作进程传回主进程
+    :return: marshal编码的统计数据，没有启用cProfile时为None
+    """
+    global _stats
+    _flush_profiler(restart=True)
+    data = marshal.dumps(_stats.stats) if _stats is not None else None
+    _stats = None
+    return data
+
+def merge_stats(data):
+    """合并collect_stats的结果"""
+    if data is not None:
+        _merge_stats_object(_StatsData(marshal.loads(data)))
+
+def save(prefix, extra=None):
+    """
+    保存计时报告（<前缀>.profile.json）和cProfile统计（<前缀>.prof，没有启用cProfile时不保存）
+    :param extra: 合并到报告中的其他字段
+    :return: 保存的文件路径列表
+    """
+    stop()
+    data = report()
+    data.update(extra or {})
+    paths = [prefix + REPORT_SUFFIX]
+    with open(paths[0], "w", encoding="utf8") as fp:
+        json.dump(data, fp, ensure_ascii=False, indent=2, sort_keys=True)
+        fp.write("\n")
+    if _stats is not None:
+        paths.append(prefix + STATS_SUFFIX)
+        _stats.dump_stats(paths[1])
+    return paths
+
+def format_report(data=None):
+    """
+    将计时结果格式化为文本行，按墙钟时间从大到小排列
+    """
+    data = data or report()
+    # 中文字符占两列
+    lines = [f"{'阶段':<16}{'次数':>6}{'墙钟(ms)':>10}{'CPU(ms)':>12}"]
+    for name, values in sorted(data["phases"].items(), key=lambda item: -item[1]["wall"]):
+        lines.append(f"{name:<18}{values['calls']:>8}{values['wall'] * 1000:>12.2f}{values['cpu'] * 1000:>12.2f}")
+    if data["counters"]:
+        lines.append("计数: " + "，".join(f"{name}={value}" for name, value in sorted(data["counters"].items())))
+    return lines
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+节假日和调休工作日数据
+- 按年份缓存在本地磁盘，缓存有效期内不访问网络
+- 内置数据以版本化的JSON文件形式存放在 data/holidays 目录
+- 支持离线模式，以及在无网络环境中预置缓存
+- 需要联网时，学期涉及的各年份同时获取；每个年份在年度API和范围API之间对冲（先请求年度API，
+  一段时间没有结果再请求范围API，取最先返回的有效结果），全部请求共用一个总时限和一个连接池，
+  每个请求（连接和读取响应）都在总时限内结束
+
+数据文件格式（内置数据与缓存文件相同）:
+{
+  "format": 1,
+  "year": 2025,
+  "version": "2025.1",
+  "source": "数据来源",
+  "holidays": {"2025-01-01": "元旦", ...},
+  "workdays": {"2025-01-26": "春节调休", ...}
+}
+缓存文件额外包含 "fetched_at"（获取时间的UNIX时间戳）
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import AtomicFile
+import GeneratorLog
+
+FORMAT_VERSION = 1
+BUNDLED_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "holidays")
+DEFAULT_TTL = 7 * 24 * 3600  # 缓存有效期：7天
+
+log = GeneratorLog.logger
+
+YEAR_API_URL = "https://timor.tech/api/holiday/year/{year}"
+RANGE_API_URL = "https://timor.tech/api/holiday/range/{start}/{end}"
+
+DEFAULT_DEADLINE = 5   # 联网获取的总时限（秒），无论涉及几个年份、几个端点
+HEDGE_DELAY = 0.8      # 上一个端点这么久（秒）没有结果时，开始请求下一个端点
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """共用的HTTP会话（连接池），同一主机的请求复用连接"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # 只在需要联网时导入requests，缓存有效时不加载HTTP相关的模块
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+def default_cache_dir():
+    """缓存目录：优先使用环境变量SUSTECH_HOLIDAY_CACHE_DIR，否则为用户缓存目录"""
+    path = os.environ.get("SUSTECH_HOLIDAY_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "sustech-curriculum", "holidays")
+
+def validate_year_data(data):
+    """检查数据文件内容是否合法，不合法时抛出ValueError"""
+    if not isinstance(data, dict) or data.get("format") != FORMAT_VERSION:
+        raise ValueError("不支持的节假日数据格式")
+    if not isinstance(data.get("year"), int):
+        raise ValueError("节假日数据缺少年份")
+    for key in ("holidays", "workdays"):
+        if not isinstance(data.get(key), dict):
+            raise ValueError(f"节假日数据缺少{key}")
+        for date_str in data[key]:
+            datetime.date.fromisoformat(date_str)
+    return data
+
+def load_year_file(path):
+    """读取并校验一个年份数据文件"""
+    with open(path, encoding="utf8") as fp:
+        return validate_year_data(json.load(fp))
+
+def load_bundled_year(year):
+    """读取内置的年份数据，不存在时返回None"""
+    path = os.path.join(BUNDLED_DATA_DIR, f"{year}.json")
+    if not os.path.exists(path):
+        return None
+    return load_year_file(path)
+
+def read_cached_year(year, cache_dir=None):
+    """读取缓存的年份数据，不存在或已损坏时返回None"""
+    path = os.path.join(cache_dir or default_cache_dir(), f"{year}.json")
+    try:
+        data = load_year_file(path)
+    except (OSError, ValueError):
+        return None
+    return data if data["year"] == year else None
+
+def write_cached_year(data, cache_dir=None):
+    """原子写入年份数据缓存：先写临时文件再替换，并发读取不会读到半个文件"""
+    cache_dir = cache_dir or default_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{data['year']}.json")
+    with AtomicFile.open_atomic(path, "x", encoding="utf8") as fp:
+        json.dump(data, fp, ensure_ascii=False, indent=2)
+    return path
+
+def is_fresh(data, ttl=DEFAULT_TTL):
+    """缓存是否仍在有效期内；没有获取时间的数据（如预置的内置数据）视为永久有效"""
+    fetched_at = data.get("fetched_at")
+    return fetched_at is None or time.time() - fetched_at < ttl
+
+def content_version(year, holidays, workdays):
+    """根据数据内容生成版本号，内容不变则版本号不变"""
+    digest = hashlib.sha1(json.dumps([holidays, workdays], sort_keys=True).encode("utf8")).hexdigest()
+    return f"{year}.api-{digest[:10]}"
+
+def term_version(holidays, workdays):
+    """
+    学期内节假日数据的版本：只取决于学期内的节假日和调休工作日，
+    数据来源不同但内容相同时版本相同
+    :param holidays: get_holidays_and_workdays返回的节假日列表
+    :param workdays: get_holidays_and_workdays返回的调休工作日列表
+    """
+    text = ",".join(map(str, holidays)) + ";" + ",".join(map(str, workdays))
+    return hashlib.sha1(text.encode("utf8")).hexdigest()[:12]
+
+def parse_api_holidays(holiday_data, year):
+    """
+    解析timor.tech返回的holiday字段
+    键可能是"YYYY-MM-DD"或"MM-DD"，条目中的date字段优先
+    holiday为false的条目是调休工作日（补班）
+    :return: (节假日字典, 调休工作日字典)，键为"YYYY-MM-DD"
+    """
+    holidays = {}
+    workdays = {}
+    for key, info in holiday_data.items():
+        date_str = info.get("date") or key
+        if len(date_str) == 5:
+            date_str = f"{year}-{date_str}"
+        try:
+            datetime.date.fromisoformat(date_str)
+        except ValueError:
+            continue
+        if info.get("holiday", False):
+            holidays[date_str] = info.get("name", "")
+        elif info.get("work", True):
+            workdays[date_str] = info.get("name", "")
+    return holidays, workdays
+
+def _get_json(url, timeout):
+    """
+    请求JSON数据
+    requests的timeout只限制连接和每一次读取，这里逐块读取响应体，总耗时超过timeout时抛出TimeoutError
+    :param timeout: 整个请求的时限（秒）
+    """
+    stop_at = time.monotonic() + timeout
+    with get_session().get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        body = bytearray()
+        for chunk in response.iter_content(16 * 1024):
+            if time.monotonic() >= stop_at:
+                raise TimeoutError(f"{timeout:.1f}秒内没有读取完响应")
+            body += chunk
+    return json.loads(body)
+
+def fetch_year(year, timeout=5):
+    """
+    从年度API获取一整年的数据
+    :param timeout: 整个请求的时限（秒）
+    """
+    url = YEAR_API_URL.format(year=year)
+    data = _get_json(url, timeout)
+    if data.get("code", 0) != 0:
+        raise ValueError(f"API返回错误: {data.get('msg')}")
+    holidays, workdays = parse_api_holidays(data.get("holiday", {}), year)
+    return {
+        "format": FORMAT_VERSION,
+        "year": year,
+        "version": content_version(year, holidays, workdays),
+        "source": url,
+        "fetched_at": time.time(),
+        "holidays": holidays,
+        "workdays": workdays,
+    }
+
+def fetch_range(start_date, end_date, timeout=10):
+    """
+    从范围API获取一段日期内的数据
+    返回的数据只覆盖部分日期，不写入按年份的缓存
+    :param timeout: 整个请求的时限（秒）
+    """
+    url = RANGE_API_URL.format(start=start_date.strftime("%Y%m%d"), end=end_date.strftime("%Y%m%d"))
+    data = _get_json(url, timeout)
+    if data.get("code") != 0:
+        raise ValueError(f"API返回错误: {data.get('msg')}")
+    return parse_api_holidays(data.get("holiday", {}), start_date.year)
+
+def _year_endpoints(year, start_date, end_date):
+    """
+    一个年份按顺序对冲的端点
+    :return: [(来源描述, 获取函数)]，获取函数以超时时间为参数，返回年份数据
+    """
+    range_start = max(start_date, datetime.date(year, 1, 1))
+    range_end = min(end_date, datetime.date(year, 12, 31))
+
+    def from_range(timeout):
+        # 范围API只覆盖学期内的日期，结果不写入按年份的缓存
+        year_holidays, year_workdays = fetch_range(range_start, range_end, timeout)
+        return {"year": year, "holidays": year_holidays, "workdays": year_workdays}
+
+    return [
+        ("年度API", lambda timeout: fetch_year(year, timeout)),
+        ("范围API", from_range),
+    ]
+
+def fetch_years(years, start_date, end_date, deadline=DEFAULT_DEADLINE, hedge_delay=HEDGE_DELAY):
+    """
+    同时获取多个年份的数据，每个年份在多个端点之间对冲，取最先返回的有效结果
+    某个端点失败时立即请求下一个端点，不等待对冲间隔；所有请求共用一个总时限，
+    每个请求的时限为发出时距总时限的剩余时间（连接和读取响应的耗时都计算在内），不会一直占用线程
+    :param start_date: 学期开始日期（范围API只获取学期内的日期）
+    :param end_date: 学期结束日期
+    :return: {年份: (年份数据, 来源描述)}，只包含成功获取的年份
+    """
+    import concurrent.futures
+
+    stop_at = time.monotonic() + deadline
+    endpoints = {year: _year_endpoints(year, start_date, end_date) for year in years}
+    next_endpoint = dict.fromkeys(years, 0)
+    next_launch = dict.fromkeys(years, time.monotonic())
+    results = {}
+    running = {}   # future → (年份, 来源描述)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(len(years) * 3, 1), thread_name_prefix="holiday")
+    try:
+        while len(results) < len(years):
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            for year in years:
+                if year in results or next_endpoint[year] >= len(endpoints[year]) or now < next_launch[year]:
+                    continue
+                origin, fetch = endpoints[year][next_endpoint[year]]
+                next_endpoint[year] += 1
+                next_launch[year] = now + hedge_delay
+                running[executor.submit(fetch, stop_at - now)] = (year, origin)
+            if not running:
+                break
+            waiting = [next_launch[year] for year in years
+                       if year not in results and next_endpoint[year] < len(endpoints[year])]
+            wake_at = min(waiting + [stop_at])
+            done, _ = concurrent.futures.wait(running, timeout=max(wake_at - now, 0), return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                year, origin = running.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    log.info("%s获取%d年数据失败: %s", origin, year, e)
+                    next_launch[year] = time.monotonic()  # 立即尝试下一个端点
+                    continue
+                if year not in results:
+                    results[year] = (data, origin)
+    finally:
+        # 不等待仍在进行的请求，它们的时限都不超过总时限，到时自行结束
+        executor.shutdown(wait=False, cancel_futures=True)
+    timed_out = time.monotonic() >= stop_at
+    for year in years:
+        if year not in results:
+            if timed_out:
+                log.warning("%d年节假日数据在%.1f秒内没有获取成功", year, deadline)
+            else:
+                log.warning("%d年节假日数据的所有端点都获取失败", year)
+    return results
+
+def get_year_data(year, offline=False, cache_dir=None, ttl=DEFAULT_TTL):
+    """
+    获取一年的数据，依次尝试：有效缓存 → 网络（成功则刷新缓存）→ 过期缓存 → 内置数据
+    :return: (年份数据, 来源描述)，都没有时返回(None, None)
+    """
+    date_range = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    return get_years_data([year], date_range[0], date_range[1], offline, cache_dir, ttl)[year]
+
+def get_years_data(years, start_date, end_date, offline=False, cache_dir=None, ttl=DEFAULT_TTL, deadline=DEFAULT_DEADLINE, write_cache=True):
+    """
+    获取多个年份的数据，每个年份依次尝试：有效缓存 → 网络（各年份同时获取，年度API的结果写入缓存）→ 过期缓存 → 内置数据
+    :param write_cache: 为False时只读取缓存，不写入文件
+    :return: {年份: (年份数据, 来源描述)}，都没有时为(None, None)
+    """
+    result = {}
+    cached = {}
+    for year in years:
+        cached[year] = read_cached_year(year, cache_dir)
+        if cached[year] is not None and (offline or is_fresh(cached[year], ttl)):
+            result[year] = cached[year], "缓存"
+
+    missing = [year for year in years if year not in result]
+    if missing and not offline:
+        for year, (data, origin) in fetch_years(missing, start_date, end_date, deadline).items():
+            if write_cache and "format" in data:
+                try:
+                    write_cached_year(data, cache_dir)
+                except OSError as e:
+                    log.warning("写入节假日缓存失败: %s", e)
+            result[year] = data, origin
+
+    for year in years:
+        if year in result:
+            continue
+        if cached[year] is not None:
+            result[year] = cached[year], "过期缓存"
+            continue
+        bundled = load_bundled_year(year)
+        result[year] = (bundled, "内置数据") if bundled is not None else (None, None)
+    return result
+
+def get_holidays_and_workdays(start_date, end_date, offline=False, cache_dir=None, ttl=DEFAULT_TTL, deadline=DEFAULT_DEADLINE, write_cache=True):
+    """
+    获取学期内的节假日和调休工作日（学期跨年时包括每一年）
+    :param offline: 离线模式，只使用缓存和内置数据
+    :param deadline: 联网获取的总时限（秒）
+    :param write_cache: 为False时不写入缓存文件
+    :return: (节假日列表, 调休工作日列表)，元素为datetime.date
+    """
+    holidays = {}
+    workdays = {}
+    years = list(range(start_date.year, end_date.year + 1))
+    years_data = get_years_data(years, start_date, end_date, offline, cache_dir, ttl, deadline, write_cache)
+    for year in years:
+        data, origin = years_data[year]
+        if data is None:
+            # 不再用其他年份的数据代替：日期不同的节假日比没有节假日更难发现
+            log.warning("警告：网络、缓存和内置数据中都没有%d年的节假日信息，该年的课程不会跳过节假日，周末调休也不会上课", year)
+            continue
+        log.info("%d年节假日信息来自%s", year, origin)
+        holidays.update(data["holidays"])
+        workdays.update(data["workdays"])
+
+    def in_term(dates):
+        result = (datetime.date.fromisoformat(date_str) for date_str in dates)
+        return sorted(date for date in result if start_date <= date <= end_date)
+
+    return in_term(holidays), in_term(workdays)
+
+def seed_cache(paths, cache_dir=None):
+    """将数据文件导入缓存，用于无网络环境"""
+    for path in paths:
+        data = load_year_file(path)
+        target = write_cached_year(data, cache_dir)
+        print(f"已导入{data['year']}年节假日数据 ({data.get('version', '')}) → {target}")
+
+def usage():
+    """显示使用说明"""
+    print("用法: python3 HolidayProvider.py fetch <年份>...    联网获取并写入缓存")
+    print("      python3 HolidayProvider.py seed <数据文件>...  将数据文件导入缓存（无网络环境）")
+    print("      python3 HolidayProvider.py list               列出缓存中的年份")
+    print("缓存目录可通过环境变量SUSTECH_HOLIDAY_CACHE_DIR指定")
+    sys.exit(1)
+
+def main():
+    """缓存管理入口"""
+    if len(sys.argv) < 2:
+        usage()
+    command, args = sys.argv[1], sys.argv[2:]
+    cache_dir = default_cache_dir()
+    if command == "fetch" and args:
+        for year in args:
+            data = fetch_year(int(year))
+            target = write_cached_year(data, cache_dir)
+            print(f"已缓存{year}年: {len(data['holidays'])}个节假日，{len(data['workdays'])}个调休工作日 → {target}")
+    elif command == "seed" and args:
+        seed_cache(args, cache_dir)
+    elif command == "list" and not args:
+        print(f"缓存目录: {cache_dir}")
+        names = sorted(os.listdir(cache_dir)) if os.path.isdir(cache_dir) else []
+        for name in names:
+            if name.endswith(".json"):
+                data = read_cached_year(int(name[:-5]), cache_dir) if name[:-5].isdigit() else None
+                if data is None:
+                    print(f"  {name}: 无效")
+                    continue
+                state = "有效" if is_fresh(data) else "已过期"
+                print(f"  {data['year']}: 版本{data.get('version', '')}，{state}")
+    else:
+        usage()
+
+if __name__ == "__main__":
+    main()
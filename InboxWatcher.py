@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+收件箱监视模式
+常驻运行，定期扫描门户上传课表的收件箱目录，只处理新增或修改过的课表：
+- 按修改时间和大小判断文件是否变化，变化后再计算内容的SHA-256，内容相同（只是重新上传或touch）时不重新生成
+- 文件的大小和修改时间保持不变一段时间（--settle）后才处理，避免读到还在写入的文件
+- 待处理的课表放入有界的工作队列（--queue-size），队列满时留到下一次扫描，进程池常驻，
+  工作进程中的学期参数、节假日、周次掩码和课程时间段缓存（SectionCache）在多次处理之间保留
+- 节假日信息启动时获取一次，之后定期刷新，变化时重建进程池
+- 处理状态保存在输出目录下的.inbox-state.json，重启后不会重新处理未变化的课表；
+  学期、路程时间等参数变化时全部重新生成
+CPU占用只与上传的频率有关，与收件箱中课表的总数基本无关（每次扫描只读取目录和文件属性）
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import AtomicFile
+import BatchGenerator
+import CurriculumGenerator
+import GeneratorLog
+import ScheduleFile
+import SectionCache
+import TermCalendar
+
+log = GeneratorLog.logger
+
+STATE_FILE = ".inbox-state.json"
+STATE_VERSION = 1
+DEFAULT_INTERVAL = 2.0        # 扫描间隔（秒）
+DEFAULT_SETTLE = 2.0          # 文件保持不变多久后才处理（秒）
+HOLIDAY_REFRESH = 6 * 3600    # 节假日信息的刷新间隔（秒）
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class FileState(NamedTuple):
+    """收件箱中一个课表最近一次处理时的状态"""
+    mtime_ns: int
+    size: int
+    sha256: str
+    error: Optional[str] = None   # 处理失败时的错误信息，文件修改后才会重试
+
+def is_inbox_file(name):
+    """是否为需要处理的课表：xlsx或中间格式文件，不包括Excel的锁文件和隐藏文件"""
+    if name.startswith(("~$", ".")):
+        return False
+    return name.endswith(".xlsx") or ScheduleFile.is_schedule_file(name)
+
+def file_digest(path):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _init_watch_worker(*args):
+    """
+    工作进程初始化：由主进程负责在收到SIGINT/SIGTERM后等待已提交的课表处理完成再退出，
+    工作进程忽略Ctrl+C，SIGTERM恢复默认行为，其余同BatchGenerator
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    BatchGenerator.init_worker(*args)
+
+class InboxWatcher:
+    """监视收件箱目录并增量生成课程表"""
+
+    def __init__(self, inbox, output_dir, term_start_date, term_end_date, default_travel_time=30, workers=None,
+                 queue_size=None, offline=False, recurring=False, settle=DEFAULT_SETTLE,
+                 cache_bytes=SectionCache.DEFAULT_MAX_BYTES, worker_log_level=logging.WARNING, state_file=None):
+        """
+        :param inbox: 收件箱目录（只扫描这一层）
+        :param output_dir: 输出目录，<课表文件名>.xlsx生成<输出目录>/<课表文件名>.ics
+        :param workers: 工作进程数量，默认为CPU核数
+        :param queue_size: 同时提交给进程池的课表数量上限，默认为工作进程数量的2倍
+        :param settle: 文件大小和修改时间保持不变多久（秒）后才处理
+        :param state_file: 处理状态文件，默认为输出目录下的.inbox-state.json
+        """
+        self.inbox = inbox
+        self.output_dir = output_dir
+        self.term_start_date = term_start_date
+        self.term_end_date = term_end_date
+        self.default_travel_time = default_travel_time
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or self.workers * 2
+        self.offline = offline
+        self.recurring = recurring
+        self.settle = settle
+        self.cache_bytes = cache_bytes
+        self.worker_log_level = worker_log_level
+        self.state_file = state_file or os.path.join(output_dir, STATE_FILE)
+
+        self.files = {}       # 文件名 → FileState
+        self._pending = {}    # 文件名 → ((修改时间, 大小), 首次看到该状态的时间)，等待文件保持不变
+        self._running = {}    # Future → (文件名, FileState, 提交时间)
+        self._dirty = False
+        self._executor = None
+        self._term = None
+        self._term_fetched = 0.0
+        self.processed = 0
+        self.failed = 0
+        self.total_events = 0
+
+    # ---------- 状态文件 ----------
+
+    def _options(self):
+        """影响输出的参数，与状态文件中的不同时全部重新生成"""
+        return {"term_start": self.term_start_date.isoformat(), "term_end": self.term_end_date.isoformat(),
+                "travel_time": self.default_travel_time, "recurring": self.recurring}
+
+    def load_state(self):
+        """读取处理状态，文件不存在、格式不支持或参数不同时从空状态开始"""
+        try:
+            with open(self.state_file, encoding="utf8") as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("警告：无法读取处理状态，将重新处理全部课表 - %s", e)
+            return
+        if data.get("version") != STATE_VERSION or data.get("options") != self._options():
+            log.info("处理参数已变化，将重新处理全部课表")
+            return
+        self.files = {name: FileState(**entry) for name, entry in data.get("files", {}).items()}
+
+    def save_state(self):
+        """保存处理状态（原子写入）"""
+        if not self._dirty:
+            return
+        data = {"version": STATE_VERSION, "options": self._options(),
+                "files": {name: state._asdict() for name, state in sorted(self.files.items())}}
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        AtomicFile.write_atomic(self.state_file, json.dumps(data, ensure_ascii=False, indent=1).encode("utf8"))
+        self._dirty = False
+
+    # ---------- 进程池和节假日 ----------
+
+    def output_path(self, name):
+        return os.path.join(self.output_dir, os.path.splitext(name)[0] + ".ics")
+
+    def refresh_term(self, force=False):
+        """
+        到刷新时间时重新获取节假日信息，变化时等待进行中的课表处理完成后重建进程池
+        """
+        now = time.monotonic()
+        if not force and self._term is not None and now - self._term_fetched < HOLIDAY_REFRESH:
+            return
+        term = CurriculumGenerator.get_holidays_and_workdays(self.term_start_date, self.term_end_date, self.offline)
+        self._term_fetched = now
+        if term == self._term:
+            return
+        if self._executor is not None:
+            log.info("节假日信息已更新，重建进程池")
+            self.drain()
+            self._executor.shutdown(wait=True)
+        self._term = term
+        calendar = TermCalendar.term_calendar(self.term_start_date, self.term_end_date, *term)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_watch_worker,
+            initargs=(calendar, self.default_travel_time, self.recurring, self.worker_log_level, self.cache_bytes),
+        )
+
+    # ---------- 扫描和处理 ----------
+
+    def scan(self, now=None):
+        """
+        扫描收件箱
+        :return: 已保持不变足够久、且与上次处理时不同的文件 [(文件名, 修改时间, 大小)]
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        present = set()
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if not is_inbox_file(entry.name) or not entry.is_file():
+                    continue
+                present.add(entry.name)
+                stat = entry.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                known = self.files.get(entry.name)
+                if known is not None and (known.mtime_ns, known.size) == signature and \
+                        (known.error is not None or os.path.exists(self.output_path(entry.name))):
+                    self._pending.pop(entry.name, None)
+                    continue
+                pending = self._pending.get(entry.name)
+                if pending is None or pending[0] != signature:
+                    # 新出现或仍在变化，从现在开始计时
+                    self._pending[entry.name] = (signature, now)
+                    continue
+                if now - pending[1] >= self.settle:
+                    ready.append((entry.name,) + signature)
+        for name in set(self.files) - present:
+            log.info("[移除] %s", name)
+            del self.files[name]
+            self._dirty = True
+        for name in set(self._pending) - present:
+            del self._pending[name]
+        return sorted(ready)
+
+    def submit(self, ready):
+        """
+        将准备好的文件提交给进程池，同时处理的数量达到上限时停止
+        :return: 因队列已满没有提交的文件（run中留到下一次扫描）
+        """
+        running_names = {name for name, _, _ in self._running.values()}
+        for index, (name, mtime_ns, size) in enumerate(ready):
+            if len(self._running) >= self.queue_size:
+                return ready[index:]
+            if name in running_names:
+                continue
+            path = os.path.join(self.inbox, name)
+            try:
+                digest = file_digest(path)
+                stat = os.stat(path)
+            except OSError as e:
+                log.warning("[跳过] %s: %s", name, e)
+                self._pending.pop(name, None)
+                continue
+            if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+                # 计算摘要期间文件又被修改，重新等待
+                self._pending.pop(name, None)
+                continue
+            state = FileState(mtime_ns, size, digest)
+            self._pending.pop(name, None)
+            known = self.files.get(name)
+            output_file = self.output_path(name)
+            if known is not None and known.sha256 == digest and (known.error is not None or os.path.exists(output_file)):
+                log.debug("[未变化] %s", name)
+                self.files[name] = state._replace(error=known.error)
+                self._dirty = True
+                continue
+            future = self._executor.submit(BatchGenerator.generate_one, (path, os.path.abspath(output_file)))
+            self._running[future] = (name, state, time.perf_counter())
+        return []
+
+    def collect(self, timeout=None):
+        """
+        等待并记录已完成的课表
+        :param timeout: 最多等待的时间（秒），None表示等到至少一个完成
+        :return: 完成的数量
+        """
+        if not self._running:
+            return 0
+        done, _ = concurrent.futures.wait(self._running, timeout, concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            name, state, submitted_at = self._running.pop(future)
+            elapsed = time.perf_counter() - submitted_at
+            try:
+                result = future.result()
+                error = result.error
+            except Exception as e:
+                result = None
+                error = f"{type(e).__name__}: {e}"
+            if error is None:
+                self.processed += 1
+                self.total_events += result.event_count
+                log.info("[完成] %s (%d个事件，%.2f秒)", name, result.event_count, elapsed)
+            else:
+                self.failed += 1
+                log.warning("[失败] %s: %s", name, error)
+            self.files[name] = state._replace(error=error)
+            self._dirty = True
+        return len(done)
+
+    def drain(self):
+        """等待全部已提交的课表处理完成"""
+        while self._running:
+            self.collect()
+
+    def run_once(self):
+        """处理收件箱中全部新增或修改的课表（不等待文件保持不变）后返回"""
+        self.refresh_term()
+        self.scan()
+        # 扫描只记录了文件的当前状态，直接视为已保持不变
+        ready = [(name,) + signature for name, (signature, _) in sorted(self._pending.items())]
+        while ready or self._running:
+            ready = self.submit(ready)
+            self.collect()
+        self.save_state()
+
+    def run(self, stop, interval=DEFAULT_INTERVAL):
+        """
+        持续监视收件箱，直到stop被设置
+        :param stop: threading.Event
+        :param interval: 扫描间隔（秒）
+        """
+        while not stop.is_set():
+            self.refresh_term()
+            try:
+                ready = self.scan()
+            except OSError as e:
+                log.error("错误：无法读取收件箱 - %s", e)
+                ready = []
+            self.submit(ready)
+            deadline = time.monotonic() + interval
+            while not stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self._running:
+                    self.collect(remaining)
+                else:
+                    stop.wait(remaining)
+            self.save_state()
+
+    def close(self):
+        """等待进行中的课表处理完成，保存状态并关闭进程池"""
+        self.drain()
+        self.save_state()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+def main():
+    """监视模式入口"""
+    parser = argparse.ArgumentParser(description="监视收件箱目录，增量地将新增或修改的xlsx课表转换为ics日历")
+    parser.add_argument("inbox", help="收件箱目录（xlsx课表或.jsonl中间格式文件）")
+    parser.add_argument("term_start", help="学期开始日期 YYYYMMDD（第一周的周一）")
+    parser.add_argument("term_end", help="学期结束日期 YYYYMMDD（最后一周的周末）")
+    parser.add_argument("-o", "--output", default="output", help="输出目录，默认为 ./output")
+    parser.add_argument("-t", "--travel-time", type=int, default=30, help="路程时间提醒（分钟），默认30")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="工作进程数量，默认为CPU核数")
+    parser.add_argument("--queue-size", type=int, default=None, help="同时处理的课表数量上限，默认为工作进程数量的2倍")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help=f"扫描间隔（秒），默认{DEFAULT_INTERVAL:g}")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help=f"文件大小和修改时间保持不变多久（秒）后才处理，默认{DEFAULT_SETTLE:g}")
+    parser.add_argument("--once", action="store_true", help="处理完当前新增或修改的课表后退出（不等待文件保持不变，适合由cron调用）")
+    parser.add_argument("--offline", action="store_true", help="不访问网络，只使用本地缓存和内置的节假日信息")
+    parser.add_argument("--recurring", action="store_true", help="每门课程输出一个重复事件（RRULE），而不是每次上课一个事件")
+    parser.add_argument("--cache-size", type=float, default=SectionCache.DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help=f"每个工作进程的课程时间段缓存大小（MB），0表示不缓存，默认{SectionCache.DEFAULT_MAX_BYTES // 1024 // 1024}")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出警告和错误")
+    parser.add_argument("--log-level", default="info", choices=sorted(GeneratorLog.LEVELS), help="日志级别，默认为info")
+    parser.add_argument("--log-json", help="同时以JSON Lines格式写入日志文件（只包含主进程的日志）")
+    args = parser.parse_args()
+
+    try:
+        term_start_date = CurriculumGenerator.parse_term_date(args.term_start)
+        term_end_date = CurriculumGenerator.parse_term_date(args.term_end)
+    except ValueError:
+        parser.error("日期格式必须为YYYYMMDD")
+    if args.travel_time < 0:
+        parser.error("路程时间提醒必须是正整数")
+    if args.workers is not None and args.workers < 1:
+        parser.error("工作进程数量必须大于0")
+    if args.queue_size is not None and args.queue_size < 1:
+        parser.error("队列长度必须大于0")
+    if args.interval <= 0 or args.settle < 0:
+        parser.error("扫描间隔必须大于0，等待时间不能为负数")
+    if args.cache_size < 0:
+        parser.error("缓存大小不能为负数")
+    if not os.path.isdir(args.inbox):
+        parser.error(f"收件箱目录不存在: {args.inbox}")
+
+    log_level = logging.WARNING if args.quiet else GeneratorLog.parse_level(args.log_level)
+    GeneratorLog.configure(log_level, args.log_json)
+    worker_log_level = logging.DEBUG if log_level == logging.DEBUG else logging.WARNING
+
+    os.makedirs(args.output, exist_ok=True)
+    watcher = InboxWatcher(args.inbox, args.output, term_start_date, term_end_date, args.travel_time, args.workers,
+                           args.queue_size, args.offline, args.recurring, args.settle,
+                           int(args.cache_size * 1024 * 1024), worker_log_level)
+    watcher.load_state()
+    try:
+        if args.once:
+            watcher.run_once()
+        else:
+            # 收到SIGINT/SIGTERM时等待已提交的课表处理完成、保存状态后退出
+            stop = threading.Event()
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signal_number, lambda *_: stop.set())
+            log.info("开始监视收件箱: %s，输出目录: %s，工作进程%d个", os.path.abspath(args.inbox),
+                     os.path.abspath(args.output), watcher.workers)
+            watcher.run(stop, args.interval)
+    finally:
+        watcher.close()
+    print(f"处理完成: 成功{watcher.processed}个，失败{watcher.failed}个，共{watcher.total_events}个日历事件")
+    if args.once and watcher.failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成结果缓存
+以输入内容计算缓存键，输入不变时直接返回上次生成的ics，不再解析和展开：
+- 缓存键包含xlsx文件内容、学期起止日期、路程时间、输出选项、节假日数据版本和生成器版本
+- 每个条目为一个文件，文件名为"<学期>.<节假日版本>.<摘要>.ics"，不需要额外的索引
+- 命中时更新文件的修改时间，总大小超出上限时按修改时间淘汰最久未使用的条目（LRU）
+- 写入同一学期的新节假日版本时，自动删除该学期旧版本的全部条目；也可以按学期手动失效
+"""
+
+import hashlib
+import os
+import sys
+import time
+from typing import NamedTuple
+
+import AtomicFile
+from Curriculum import GENERATOR_VERSION
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = ".ics"
+
+def default_cache_dir():
+    """缓存目录：优先使用环境变量SUSTECH_OUTPUT_CACHE_DIR，否则为用户缓存目录"""
+    path = os.environ.get("SUSTECH_OUTPUT_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "sustech-curriculum", "output")
+
+def term_name(term_start_date, term_end_date):
+    """学期的名称，如 20250908-20251228"""
+    return f"{term_start_date:%Y%m%d}-{term_end_date:%Y%m%d}"
+
+class CacheKey(NamedTuple):
+    """缓存键"""
+    term: str              # 学期，如"20250908-20251228"
+    holiday_version: str   # 学期内节假日数据的版本
+    digest: str            # 全部输入的SHA-256摘要
+
+    @property
+    def filename(self):
+        return f"{self.term}.{self.holiday_version}.{self.digest}{ENTRY_SUFFIX}"
+
+def make_key(workbook_data, term_start_date, term_end_date, travel_time, holiday_version, recurring=False, calendar_name=None, generator_version=GENERATOR_VERSION):
+    """
+    计算缓存键
+    :param workbook_data: xlsx文件内容
+    :param holiday_version: 节假日数据版本，见HolidayProvider.term_version
+    :param recurring: 是否为重复事件输出
+    :param calendar_name: 日历名称，None为默认名称
+    """
+    digest = hashlib.sha256()
+    options = f"{generator_version}\n{term_start_date}\n{term_end_date}\n{travel_time}\n{holiday_version}\n{int(recurring)}\n{calendar_name or ''}\n"
+    digest.update(options.encode("utf8"))
+    digest.update(workbook_data)
+    return CacheKey(term_name(term_start_date, term_end_date), holiday_version, digest.hexdigest())
+
+def _parse_filename(name):
+    """从条目文件名得到(学期, 节假日版本)，不是条目文件时返回None"""
+    if not name.endswith(ENTRY_SUFFIX):
+        return None
+    parts = name[:-len(ENTRY_SUFFIX)].split(".")
+    if len(parts) != 3:
+        return None
+    return parts[0], parts[1]
+
+class OutputCache:
+    """磁盘上的生成结果缓存，多个进程可以共用同一个目录"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key.filename)
+
+    def get(self, key):
+        """
+        读取缓存的ics内容，并将条目标记为最近使用
+        :return: ics内容，未命中时为None
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        """
+        原子写入一个条目，然后删除同一学期旧节假日版本的条目，并按大小上限淘汰
+        :param data: ics内容
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        AtomicFile.write_atomic(self._path(key), data)
+        # 只扫描一次目录，旧版本条目删除后不再计入总大小
+        entries = []
+        for entry in self.entries():
+            if entry[1] == key.term and entry[2] != key.holiday_version:
+                self._remove(entry[0])
+            else:
+                entries.append(entry)
+        self._evict(entries)
+
+    def entries(self):
+        """
+        列出全部条目
+        :return: [(文件名, 学期, 节假日版本, 大小, 最近使用时间)]，按最近使用时间排序
+        """
+        result = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            parsed = _parse_filename(name)
+            if parsed is None:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            result.append((name, parsed[0], parsed[1], stat.st_size, stat.st_mtime))
+        result.sort(key=lambda entry: entry[4])
+        return result
+
+    def _remove(self, name):
+        try:
+            os.unlink(os.path.join(self.cache_dir, name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限，返回删除的条目数量"""
+        return self._evict(self.entries())
+
+    def _evict(self, entries):
+        """按最近使用时间排序的条目中，从最久未使用的开始删除，直到总大小不超过上限"""
+        total = sum(entry[3] for entry in entries)
+        removed = 0
+        for name, _, _, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(name):
+                removed += 1
+            total -= size
+        return removed
+
+    def invalidate_term(self, term, keep_version=None):
+        """
+        删除一个学期的条目（如节假日安排调整后）
+        :param term: 学期名称，见term_name
+        :param keep_version: 保留该节假日版本的条目，None时全部删除
+        :return: 删除的条目数量
+        """
+        removed = 0
+        for name, entry_term, holiday_version, _, _ in self.entries():
+            if entry_term == term and holiday_version != keep_version:
+                removed += self._remove(name)
+        return removed
+
+    def clear(self):
+        """删除全部条目"""
+        return sum(self._remove(entry[0]) for entry in self.entries())
+
+def usage():
+    """显示使用说明"""
+    print("用法: python3 OutputCache.py list                          列出缓存的条目")
+    print("      python3 OutputCache.py invalidate <开始日期> <结束日期>  删除一个学期的全部条目")
+    print("      python3 OutputCache.py clear                         删除全部条目")
+    print("缓存目录可通过环境变量SUSTECH_OUTPUT_CACHE_DIR指定")
+    sys.exit(1)
+
+def main():
+    """缓存管理入口"""
+    if len(sys.argv) < 2:
+        usage()
+    command, args = sys.argv[1], sys.argv[2:]
+    cache = OutputCache()
+    if command == "list" and not args:
+        entries = cache.entries()
+        print(f"缓存目录: {cache.cache_dir}")
+        for name, term, holiday_version, size, used in reversed(entries):
+            print(f"  {term} 节假日版本{holiday_version} {size}字节 {time.strftime('%Y-%m-%d %H:%M', time.localtime(used))} {name}")
+        print(f"共{len(entries)}个条目，{sum(entry[3] for entry in entries)}字节")
+    elif command == "invalidate" and len(args) == 2:
+        removed = cache.invalidate_term(f"{args[0]}-{args[1]}")
+        print(f"已删除{removed}个条目")
+    elif command == "clear" and not args:
+        print(f"已删除{cache.clear()}个条目")
+    else:
+        usage()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+教室占用索引
+汇总大量学生课表中的课程，按 教室 × 星期 × 节次 建立倒排索引，每个位置保存占用的周次位图：
+- 查询某教室某时间的课程、某时间的空教室、各教学楼的使用率热力图
+- 地点与日历中的LOCATION相同（如"南方科技大学-第三教学楼205"），在线课程不计入
+- 同一教学班在多个学生的课表中出现时只计一次；每门课程记录来自哪些课表
+- 索引保存为JSON文件，记录每个课表的内容摘要；新增或更新课表时只处理变化的文件，
+  删除或替换课表时只重新计算受影响的位置
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import AtomicFile
+import CourseParser
+import CurriculumGenerator
+import ScheduleQuery
+import WeekMask
+from ScheduleQuery import DAY_NAMES, SLOT_COUNT, Section
+
+INDEX_VERSION = 1
+DEFAULT_INDEX = "room_index.json"
+LOCATION_PREFIX = "南方科技大学-"
+# 教室名称末尾的房间号，如"第三教学楼205"、"荔园1栋A101"、"理学院大楼M1001"
+ROOM_NUMBER_PATTERN = re.compile(r"[-\s]*[A-Za-z]?\d+[A-Za-z]?$")
+
+def room_of(section):
+    """课程的上课地点（与日历中的LOCATION相同），在线课程为None"""
+    if CourseParser.SPECIAL_COURSE_NAME in section.name:
+        location = CurriculumGenerator.special_course_location(section)
+    else:
+        location = CurriculumGenerator.course_location(section.location)
+    return None if location == CurriculumGenerator.ONLINE_LOCATION else location
+
+def building_of(room):
+    """教室所在的教学楼：去掉地点前缀和末尾的房间号，如 南方科技大学-第三教学楼205 → 第三教学楼"""
+    name = room[len(LOCATION_PREFIX):] if room.startswith(LOCATION_PREFIX) else room
+    return ROOM_NUMBER_PATTERN.sub("", name) or name
+
+def file_digest(path):
+    """课表文件内容的SHA-256摘要"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class RoomIndex:
+    """
+    教室占用的倒排索引
+    occupied[教室][星期][节次]：该时间被占用的周次位图（节次从1开始）
+    occupants[教室][(星期, 节次)]：该时间的课程列表
+    """
+
+    def __init__(self):
+        self.sources = {}     # 课表路径 → {"digest": 摘要, "sections": [Section]}
+        self.refcounts = {}   # Section → 包含它的课表数量
+        self.occupied = {}
+        self.occupants = {}
+
+    # 维护索引
+
+    def _add_section(self, section):
+        count = self.refcounts.get(section, 0)
+        self.refcounts[section] = count + 1
+        if count:
+            return
+        room = room_of(section)
+        if room is None:
+            return
+        if room not in self.occupied:
+            self.occupied[room] = [[0] * (SLOT_COUNT + 1) for _ in range(7)]
+            self.occupants[room] = {}
+        row = self.occupied[room][section.day]
+        occupants = self.occupants[room]
+        for slot in range(section.slot_start, section.slot_end + 1):
+            row[slot] |= section.weeks
+            occupants.setdefault((section.day, slot), []).append(section)
+
+    def _remove_section(self, section):
+        count = self.refcounts[section] - 1
+        if count:
+            self.refcounts[section] = count
+            return
+        del self.refcounts[section]
+        room = room_of(section)
+        if room is None:
+            return
+        row = self.occupied[room][section.day]
+        occupants = self.occupants[room]
+        for slot in range(section.slot_start, section.slot_end + 1):
+            remaining = occupants[(section.day, slot)]
+            remaining.remove(section)
+            weeks = 0
+            for other in remaining:
+                weeks |= other.weeks
+            row[slot] = weeks
+            if not remaining:
+                del occupants[(section.day, slot)]
+        if not occupants:
+            del self.occupied[room]
+            del self.occupants[room]
+
+    def set_source(self, source, digest, sections):
+        """添加或替换一个课表的全部课程"""
+        self.remove_source(source)
+        self.sources[source] = {"digest": digest, "sections": sections}
+        for section in sections:
+            self._add_section(section)
+
+    def remove_source(self, source):
+        """删除一个课表的全部课程，返回是否存在"""
+        entry = self.sources.pop(source, None)
+        if entry is None:
+            return False
+        for section in entry["sections"]:
+            self._remove_section(section)
+        return True
+
+    def ingest(self, path):
+        """
+        读取一个xlsx课表，内容没有变化时跳过
+        :return: "added"、"updated"或"unchanged"
+        """
+        source = os.path.abspath(path)
+        digest = file_digest(source)
+        entry = self.sources.get(source)
+        if entry is not None and entry["digest"] == digest:
+            return "unchanged"
+        schedule = ScheduleQuery.WeeklySchedule.from_workbook(source)
+        self.set_source(source, digest, schedule.sections)
+        return "added" if entry is None else "updated"
+
+    # 查询
+
+    def rooms(self, building=None):
+        """全部教室，可按教学楼筛选"""
+        return sorted(room for room in self.occupied if building is None or building_of(room) == building)
+
+    def buildings(self):
+        """教学楼 → 教室数量"""
+        result = {}
+        for room in self.occupied:
+            building = building_of(room)
+            result[building] = result.get(building, 0) + 1
+        return dict(sorted(result.items()))
+
+    def what_is_in(self, room, day, slot, week):
+        """某教室在第week周星期day第slot节的课程"""
+        bit = 1 << (week - 1)
+        return [section for section in self.occupants.get(room, {}).get((day, slot), ()) if section.weeks & bit]
+
+    def empty_rooms(self, day, slot_start, slot_end, weeks, building=None):
+        """
+        在weeks的每一周星期day第slot_start-slot_end节都空闲的教室（只包括索引中出现过的教室）
+        :param weeks: 周次位图
+        """
+        result = []
+        for room in self.rooms(building):
+            row = self.occupied[room][day]
+            if not any(row[slot] & weeks for slot in range(slot_start, slot_end + 1)):
+                result.append(room)
+        return result
+
+    def utilization(self, weeks, building=None):
+        """
+        教室使用率
+        :return: ratio[星期][节次]，为被占用的(教室, 周)数量占全部(教室, 周)的比例
+        """
+        rooms = self.rooms(building)
+        week_count = bin(weeks).count("1")
+        ratio = [[0.0] * (SLOT_COUNT + 1) for _ in range(7)]
+        if not rooms or not week_count:
+            return ratio
+        for day in range(7):
+            for slot in range(1, SLOT_COUNT + 1):
+                used = sum(bin(self.occupied[room][day][slot] & weeks).count("1") for room in rooms)
+                ratio[day][slot] = used / (len(rooms) * week_count)
+        return ratio
+
+    # 保存和读取
+
+    def to_json(self):
+        sections = {}
+        sources = {}
+        for source, entry in sorted(self.sources.items()):
+            indexes = [sections.setdefault(section, len(sections)) for section in entry["sections"]]
+            sources[source] = {"digest": entry["digest"], "sections": indexes}
+        return {"version": INDEX_VERSION, "sections": [list(section) for section in sections], "sources": sources}
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"不支持的索引版本: {data.get('version')}")
+        sections = [Section(*fields) for fields in data["sections"]]
+        index = cls()
+        for source, entry in data["sources"].items():
+            index.set_source(source, entry["digest"], [sections[item] for item in entry["sections"]])
+        return index
+
+    def save(self, path):
+        """原子写入索引文件"""
+        AtomicFile.write_atomic(path, json.dumps(self.to_json(), ensure_ascii=False, separators=(",", ":")).encode("utf8"))
+
+    @classmethod
+    def load(cls, path):
+        """读取索引文件，不存在时返回空索引"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf8") as fp:
+            return cls.from_json(json.load(fp))
+
+def _parse_day(text):
+    """星期：1-7，或一到日"""
+    if text in DAY_NAMES:
+        return DAY_NAMES.index(text)
+    day = int(text)
+    if not 1 <= day <= 7:
+        raise ValueError(text)
+    return day - 1
+
+def _parse_slots(text):
+    """节次：如3或3-4"""
+    start, _, end = text.partition("-")
+    slot_start = int(start)
+    slot_end = int(end) if end else slot_start
+    if not 1 <= slot_start <= slot_end <= SLOT_COUNT:
+        raise ValueError(text)
+    return slot_start, slot_end
+
+def _find_room(index, name):
+    """按完整地点或去掉"南方科技大学-"前缀的名称查找教室"""
+    for room in (name, LOCATION_PREFIX + name, CurriculumGenerator.course_location(name)):
+        if room in index.occupied:
+            return room
+    return None
+
+def _print_heatmap(ratio, title):
+    """以文本表格输出使用率"""
+    print(title)
+    print("节次  " + "".join(f"  星期{name}" for name in DAY_NAMES))
+    for slot in range(1, SLOT_COUNT + 1):
+        print(f"{slot:>4}  " + "".join(f"{ratio[day][slot]:>8.0%}" for day in range(7)))
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="由大量课表建立教室占用索引，查询教室课程、空教室和使用率")
+    parser.add_argument("-i", "--index", default=DEFAULT_INDEX, help=f"索引文件，默认{DEFAULT_INDEX}")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add_parser = subparsers.add_parser("add", help="添加或更新课表（内容没有变化的课表会跳过）")
+    add_parser.add_argument("inputs", nargs="+", metavar="xlsx", help="xlsx课表文件或目录")
+    remove_parser = subparsers.add_parser("remove", help="从索引中删除课表")
+    remove_parser.add_argument("inputs", nargs="+", metavar="xlsx", help="之前添加的xlsx课表文件")
+    subparsers.add_parser("rooms", help="列出教学楼和教室")
+    at_parser = subparsers.add_parser("at", help="查询教室在某一时间的课程")
+    at_parser.add_argument("room", help="教室，如三教205")
+    at_parser.add_argument("day", help="星期，1-7或一到日")
+    at_parser.add_argument("slots", help="节次，如3或3-4")
+    at_parser.add_argument("week", type=int, help="周次")
+    empty_parser = subparsers.add_parser("empty", help="查询空教室")
+    empty_parser.add_argument("day", help="星期，1-7或一到日")
+    empty_parser.add_argument("slots", help="节次，如3或3-4")
+    empty_parser.add_argument("weeks", help="需要每周都空闲的周次，如5或1-16")
+    empty_parser.add_argument("-b", "--building", help="只查询该教学楼，如第三教学楼")
+    heatmap_parser = subparsers.add_parser("heatmap", help="输出教室使用率")
+    heatmap_parser.add_argument("-b", "--building", help="只统计该教学楼，默认全部教室")
+    heatmap_parser.add_argument("-w", "--weeks", default="1-16", help="统计的周次，默认1-16")
+    args = parser.parse_args()
+
+    try:
+        index = RoomIndex.load(args.index)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"错误：无法读取索引 {args.index} - {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == "add":
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        started = time.perf_counter()
+        for path in ScheduleQuery.workbook_paths(args.inputs):
+            try:
+                counts[index.ingest(path)] += 1
+            except Exception as e:
+                print(f"错误：无法读取 {path} - {e}", file=sys.stderr)
+                sys.exit(1)
+        if counts["added"] or counts["updated"]:
+            index.save(args.index)
+        print(f"新增{counts['added']}个，更新{counts['updated']}个，未变化{counts['unchanged']}个课表，"
+              f"耗时{time.perf_counter() - started:.2f}s；索引共{len(index.sources)}个课表、{len(index.occupied)}个教室")
+        return
+    if args.command == "remove":
+        removed = sum(index.remove_source(os.path.abspath(path)) for path in args.inputs)
+        if removed:
+            index.save(args.index)
+        print(f"已删除{removed}个课表")
+        return
+    if args.command == "rooms":
+        for building, count in index.buildings().items():
+            rooms = [room[len(LOCATION_PREFIX):] if room.startswith(LOCATION_PREFIX) else room for room in index.rooms(building)]
+            print(f"{building}（{count}间）: {', '.join(rooms)}")
+        return
+
+    try:
+        if args.command == "heatmap":
+            weeks = WeekMask.parse_weeks(args.weeks)
+        else:
+            day = _parse_day(args.day)
+            slot_start, slot_end = _parse_slots(args.slots)
+            weeks = WeekMask.parse_weeks(str(args.week) if args.command == "at" else args.weeks)
+    except ValueError:
+        parser.error("星期、节次或周次格式错误")
+
+    started = time.perf_counter()
+    if args.command == "at":
+        room = _find_room(index, args.room)
+        if room is None:
+            print(f"索引中没有教室 {args.room}")
+            sys.exit(1)
+        found = {}
+        for slot in range(slot_start, slot_end + 1):
+            for section in index.what_is_in(room, day, slot, args.week):
+                found.setdefault(section, None)
+        elapsed = time.perf_counter() - started
+        print(f"{room} 第{args.week}周 星期{DAY_NAMES[day]} {ScheduleQuery.slot_text(slot_start, slot_end)}：")
+        for section in found:
+            print(f"  {ScheduleQuery.slot_text(section.slot_start, section.slot_end)} {section.name} [{section.class_info}]")
+        if not found:
+            print("  空闲")
+    elif args.command == "empty":
+        rooms = index.empty_rooms(day, slot_start, slot_end, weeks, args.building)
+        elapsed = time.perf_counter() - started
+        print(f"{WeekMask.format_weeks(weeks)} 星期{DAY_NAMES[day]} {ScheduleQuery.slot_text(slot_start, slot_end)} 空闲的教室（{len(rooms)}间）：")
+        for room in rooms:
+            print(f"  {room}")
+    else:
+        if args.building and args.building not in index.buildings():
+            print(f"索引中没有教学楼 {args.building}")
+            sys.exit(1)
+        ratio = index.utilization(weeks, args.building)
+        elapsed = time.perf_counter() - started
+        _print_heatmap(ratio, f"{args.building or '全部教室'} {WeekMask.format_weeks(weeks)} 使用率：")
+    print(f"查询耗时 {elapsed * 1000:.3f}ms")
+
+if __name__ == "__main__":
+    main()
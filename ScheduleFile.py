@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课表中间格式
+将解析后的课表单元格（parse_grid的结果）保存为紧凑的JSON Lines文件，之后修改路程时间、学期等
+输出参数时直接由该文件生成日历，不需要再用openpyxl读取xlsx，解析和生成也可以在不同的机器上进行：
+    第1行   文件头：{"format": "sustech-curriculum-schedule", "version": 1, "fields": [...], "source": ..., "digest": ..., "cells": N}
+    其余行  每个有课程的单元格一行：[星期, 行号, 行标题, [[课程字段...], ...]]，课程字段的顺序见文件头的fields
+版本号只在不兼容的修改时增加；读取时按fields中的字段名对应，字段顺序变化或增加字段不影响读取
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+
+import AtomicFile
+import CellDedup
+import CourseParser
+import GeneratorProfile
+import ScheduleLoader
+
+SCHEDULE_FORMAT = "sustech-curriculum-schedule"
+SCHEDULE_VERSION = 1
+SCHEDULE_SUFFIX = ".jsonl"
+# 保存的CourseRecord字段（is_special由课程名得到，不保存）
+RECORD_FIELDS = ("name", "teacher", "class_info", "week_start", "week_end", "week_type",
+                 "slot_start", "slot_end", "location", "raw_text")
+
+def is_schedule_file(path):
+    """是否为中间格式文件（按扩展名判断）"""
+    return str(path).endswith(SCHEDULE_SUFFIX)
+
+def dumps(parsed_cells, source=None, digest=None):
+    """
+    将解析后的单元格转换为中间格式
+    :param parsed_cells: [(ScheduleLoader.ScheduleCell, CourseRecord列表)]
+    :param source: 来源的xlsx文件名
+    :param digest: 来源xlsx文件内容的SHA-256摘要
+    :return: UTF-8编码的文件内容
+    """
+    cells = [(cell, records) for cell, records in parsed_cells if records]
+    header = {"format": SCHEDULE_FORMAT, "version": SCHEDULE_VERSION, "fields": list(RECORD_FIELDS),
+              "source": source, "digest": digest, "cells": len(cells)}
+    lines = [json.dumps(header, ensure_ascii=False, separators=(",", ":"))]
+    for cell, records in cells:
+        values = [[getattr(record, field) for field in RECORD_FIELDS] for record in records]
+        lines.append(json.dumps([cell.day, cell.row, cell.row_header, values], ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n").encode("utf8")
+
+def loads(data):
+    """
+    读取中间格式
+    :param data: 文件内容（bytes或str）
+    :return: [(ScheduleLoader.ScheduleCell, CourseRecord列表)]，可直接用于build_curriculum_from_records
+    :raises ValueError: 格式或版本不支持、内容损坏
+    """
+    with GeneratorProfile.phase("load"):
+        return _loads(data)
+
+def _loads(data):
+    if isinstance(data, bytes):
+        data = data.decode("utf8")
+    lines = data.splitlines()
+    try:
+        header = json.loads(lines[0]) if lines else None
+    except json.JSONDecodeError as e:
+        raise ValueError(f"课表中间格式文件头损坏: {e}") from None
+    if not isinstance(header, dict) or header.get("format") != SCHEDULE_FORMAT:
+        raise ValueError("不是课表中间格式文件")
+    if header.get("version") != SCHEDULE_VERSION:
+        raise ValueError(f"不支持的课表中间格式版本: {header.get('version')}")
+    fields = header.get("fields") or []
+    missing = [field for field in RECORD_FIELDS if field not in fields]
+    if missing:
+        raise ValueError(f"课表中间格式缺少字段: {', '.join(missing)}")
+    positions = [fields.index(field) for field in RECORD_FIELDS]
+
+    parsed_cells = []
+    try:
+        for line in lines[1:]:
+            if not line:
+                continue
+            day, row, row_header, values = json.loads(line)
+            records = []
+            for value in values:
+                record = dict(zip(RECORD_FIELDS, (value[position] for position in positions)))
+                records.append(CourseParser.CourseRecord(is_special=CourseParser.SPECIAL_COURSE_NAME in record["name"], **record))
+            # 单元格文本由课程的4行还原，用于日志输出
+            text = "\n".join(f"{record.name}\n[{record.teacher}]\n[{record.class_info}]\n{record.raw_text}" for record in records)
+            parsed_cells.append((ScheduleLoader.ScheduleCell(row, day, text, row_header), records))
+    except (ValueError, TypeError, IndexError) as e:
+        raise ValueError(f"课表中间格式内容损坏: {e}") from None
+    if header.get("cells") is not None and header["cells"] != len(parsed_cells):
+        raise ValueError(f"课表中间格式不完整：应有{header['cells']}个单元格，实际{len(parsed_cells)}个")
+    return parsed_cells
+
+def parse_workbook(data):
+    """读取并解析xlsx文件内容，返回[(单元格, CourseRecord列表)]"""
+    with GeneratorProfile.phase("load"):
+        grid = ScheduleLoader.load_schedule_grid(io.BytesIO(data))
+    with GeneratorProfile.phase("parse"):
+        return CellDedup.parse_cells(grid)
+
+def load_parsed_cells(data, path):
+    """
+    读取课表：按扩展名区分中间格式文件和xlsx工作簿
+    :param data: 文件内容
+    :param path: 文件路径
+    """
+    if is_schedule_file(path):
+        return loads(data)
+    return parse_workbook(data)
+
+def convert(excel_file, output_file):
+    """
+    将一个xlsx课表转换为中间格式文件
+    :return: 有课程的单元格数量
+    """
+    with open(excel_file, "rb") as fp:
+        data = fp.read()
+    parsed_cells = parse_workbook(data)
+    AtomicFile.write_atomic(output_file, dumps(parsed_cells, os.path.basename(excel_file), hashlib.sha256(data).hexdigest()))
+    return sum(1 for _, records in parsed_cells if records)
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="将xlsx课表转换为可直接生成日历的中间格式（JSON Lines）")
+    parser.add_argument("inputs", nargs="+", metavar="xlsx", help="xlsx课表文件或目录")
+    parser.add_argument("-o", "--output", help="输出目录，默认与xlsx文件相同")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.inputs:
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(".xlsx") and not name.startswith("~$"))
+        else:
+            paths.append(path)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    failures = 0
+    for excel_file in paths:
+        stem = os.path.splitext(os.path.basename(excel_file))[0]
+        output_file = os.path.join(args.output or os.path.dirname(excel_file), stem + SCHEDULE_SUFFIX)
+        try:
+            cell_count = convert(excel_file, output_file)
+        except Exception as e:
+            failures += 1
+            print(f"错误：无法转换 {excel_file} - {e}", file=sys.stderr)
+            continue
+        print(f"{excel_file} → {output_file}（{cell_count}个课程单元格）")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课表工作簿读取
+以只读、仅取值的方式读取一遍课表工作表，得到紧凑的单元格列表，后续处理不再访问工作簿
+"""
+
+from typing import NamedTuple, Optional
+
+FIRST_COURSE_ROW = 4  # 第1-3行为标题和星期
+DAY_COUNT = 7         # 第2-8列为星期一到星期日
+
+class ScheduleCell(NamedTuple):
+    """课表中一个有内容的课程单元格"""
+    row: int                   # 行号（从1开始，与Excel一致）
+    day: int                   # 0=星期一, 1=星期二, ..., 6=星期日
+    text: str                  # 单元格文本
+    row_header: Optional[str]  # 所在行的行标题，如"第1-2节"
+
+def load_schedule_grid(source):
+    """
+    读取课表工作表
+    行标题列（A列）在导出文件中是按节次合并的单元格，只读模式下合并区域只有左上角有值，
+    这里将行标题向下填充，使合并区域内每一行都能取到所属的节次；
+    课程单元格的合并区域只保留左上角的一份，其余为空，不会重复处理
+    :param source: xlsx文件路径或二进制文件对象
+    :return: ScheduleCell列表，按星期、行号排序
+    """
+    # openpyxl导入较慢，只在读取工作簿时导入（中间格式文件和参数错误不需要）
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        cells = []
+        row_header = None
+        for row_index, values in enumerate(
+                sheet.iter_rows(min_row=FIRST_COURSE_ROW, max_col=DAY_COUNT + 1, values_only=True),
+                FIRST_COURSE_ROW):
+            if values and values[0] is not None:
+                row_header = str(values[0])
+            for day, value in enumerate(values[1:DAY_COUNT + 1]):
+                if value and isinstance(value, str):
+                    cells.append(ScheduleCell(row_index, day, value, row_header))
+    finally:
+        workbook.close()
+    cells.sort(key=lambda cell: (cell.day, cell.row))
+    return cells
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课表查询
+将课表中的每门课程归一化为(星期, 节次范围, 周次位图)，用于小组排课（学习小组、助教答疑等）：
+- 检查一个学生课表内部的时间冲突（同一天、节次重叠、周次位图相交）
+- 计算多个学生的共同空闲时间：每个(星期, 节次)的忙碌周次为各学生位图的按位或，空闲周次为其补集
+每个课表只占7×11个整数，几百名学生的查询只需要几万次整数运算
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import NamedTuple
+
+import CourseParser
+import ScheduleLoader
+import WeekMask
+
+SLOT_COUNT = 11  # 每天最多11节
+DAY_NAMES = "一二三四五六日"
+
+class Section(NamedTuple):
+    """归一化的一门课程：在哪些周的星期几第几节上课"""
+    name: str
+    class_info: str
+    day: int          # 0=星期一, ..., 6=星期日
+    slot_start: int
+    slot_end: int
+    weeks: int        # 周次位图，见WeekMask.week_mask
+    location: str
+
+    def overlaps(self, other):
+        """与另一门课程冲突的周次位图，没有冲突时为0"""
+        if self.day != other.day or self.slot_end < other.slot_start or other.slot_end < self.slot_start:
+            return 0
+        return self.weeks & other.weeks
+
+    def describe(self):
+        return f"星期{DAY_NAMES[self.day]}{slot_text(self.slot_start, self.slot_end)} {self.name}"
+
+def slot_text(slot_start, slot_end):
+    """如 第3-4节、第11节"""
+    return f"第{slot_start}节" if slot_start == slot_end else f"第{slot_start}-{slot_end}节"
+
+def sections_from_cells(parsed_cells):
+    """
+    由课表单元格得到归一化的课程列表
+    实验室安全学等特殊课程：单次课程使用单元格中的节次（如1-8节），范围周次的课程使用所在行的节次；
+    同一课程出现在多个单元格中时只保留一个
+    :param parsed_cells: [(ScheduleLoader.ScheduleCell, CourseRecord列表)]
+    """
+    sections = {}
+    for cell, records in parsed_cells:
+        for record in records:
+            if record.week_start is None:
+                continue
+            if record.is_special and (record.slot_start is None or record.week_start != record.week_end):
+                slot_start, slot_end = CourseParser.parse_row_header(cell.row_header)
+            elif record.slot_start is not None:
+                slot_start, slot_end = record.slot_start, record.slot_end
+            else:
+                continue
+            weeks = WeekMask.week_mask(*record.week_info)
+            slot_end = min(slot_end, SLOT_COUNT)
+            if not weeks or slot_start < 1 or slot_start > slot_end:
+                continue
+            section = Section(record.name, record.class_info, cell.day, slot_start, slot_end, weeks, record.location)
+            sections.setdefault(section, None)
+    return list(sections)
+
+class WeeklySchedule:
+    """
+    一个学生的课表
+    busy[星期][节次]为该时间有课的周次位图（节次从1开始，第0项不使用）
+    """
+
+    def __init__(self, sections, owner=None):
+        self.owner = owner
+        self.sections = sections
+        self.busy = [[0] * (SLOT_COUNT + 1) for _ in range(7)]
+        for section in sections:
+            row = self.busy[section.day]
+            for slot in range(section.slot_start, section.slot_end + 1):
+                row[slot] |= section.weeks
+
+    @classmethod
+    def from_workbook(cls, source, owner=None):
+        """读取xlsx课表"""
+        grid = ScheduleLoader.load_schedule_grid(source)
+        parsed_cells = [(cell, CourseParser.parse_cell(cell.text)) for cell in grid]
+        return cls(sections_from_cells(parsed_cells), owner)
+
+    def conflicts(self):
+        """
+        课表内部的时间冲突（不同课程在同一周的同一时间上课）
+        :return: [(课程, 课程, 冲突的周次位图)]
+        """
+        result = []
+        by_day = [[] for _ in range(7)]
+        for section in self.sections:
+            by_day[section.day].append(section)
+        for day_sections in by_day:
+            day_sections.sort(key=lambda section: (section.slot_start, section.slot_end))
+            for index, section in enumerate(day_sections):
+                for other in day_sections[index + 1:]:
+                    if other.slot_start > section.slot_end:
+                        break
+                    if (section.name, section.class_info) == (other.name, other.class_info):
+                        continue
+                    weeks = section.overlaps(other)
+                    if weeks:
+                        result.append((section, other, weeks))
+        return result
+
+def common_busy(schedules):
+    """
+    多个课表合并后的忙碌周次
+    :return: busy[星期][节次]，为各课表位图的按位或
+    """
+    busy = [[0] * (SLOT_COUNT + 1) for _ in range(7)]
+    for schedule in schedules:
+        for day in range(7):
+            merged, row = busy[day], schedule.busy[day]
+            for slot in range(1, SLOT_COUNT + 1):
+                merged[slot] |= row[slot]
+    return busy
+
+def common_free(schedules, weeks):
+    """
+    多个学生的共同空闲周次
+    :param weeks: 关心的周次位图
+    :return: free[星期][节次]，为weeks中所有人都没有课的周次位图
+    """
+    return [[weeks & ~busy for busy in row] for row in common_busy(schedules)]
+
+def free_periods(free, weeks, min_slots=1, days=range(7)):
+    """
+    在weeks的每一周都空闲的连续节次
+    :param free: common_free的返回值
+    :param min_slots: 最少连续节次数
+    :return: [(星期, 起始节次, 结束节次)]
+    """
+    result = []
+    for day in days:
+        row = free[day]
+        start = None
+        for slot in range(1, SLOT_COUNT + 2):
+            available = slot <= SLOT_COUNT and row[slot] & weeks == weeks
+            if available and start is None:
+                start = slot
+            elif not available and start is not None:
+                if slot - start >= min_slots:
+                    result.append((day, start, slot - 1))
+                start = None
+    return result
+
+def workbook_paths(inputs):
+    """展开输入中的目录为其中的xlsx文件"""
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".xlsx"))
+        else:
+            paths.append(path)
+    return paths
+
+def _load_schedules(paths):
+    schedules = []
+    for path in paths:
+        try:
+            schedules.append(WeeklySchedule.from_workbook(path, owner=os.path.basename(path)))
+        except Exception as e:
+            print(f"错误：无法读取 {path} - {e}", file=sys.stderr)
+            sys.exit(1)
+    return schedules
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="课表冲突检查和共同空闲时间查询")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    conflicts_parser = subparsers.add_parser("conflicts", help="检查每个课表内部的时间冲突")
+    conflicts_parser.add_argument("inputs", nargs="+", metavar="xlsx", help="xlsx课表文件或目录")
+    free_parser = subparsers.add_parser("free", help="查询多个学生的共同空闲时间")
+    free_parser.add_argument("inputs", nargs="+", metavar="xlsx", help="xlsx课表文件或目录")
+    free_parser.add_argument("-w", "--weeks", default="1-16", help="需要每周都空闲的周次，如1-16、3-8,10，默认1-16")
+    free_parser.add_argument("-m", "--min-slots", type=int, default=2, help="最少连续空闲节次，默认2")
+    free_parser.add_argument("--weekend", action="store_true", help="包括周六和周日")
+    args = parser.parse_args()
+
+    paths = workbook_paths(args.inputs)
+    if not paths:
+        parser.error("没有找到xlsx课表")
+    load_started = time.perf_counter()
+    schedules = _load_schedules(paths)
+    load_elapsed = time.perf_counter() - load_started
+
+    if args.command == "conflicts":
+        conflict_count = 0
+        for schedule in schedules:
+            for section, other, weeks in schedule.conflicts():
+                conflict_count += 1
+                print(f"{schedule.owner}: {section.describe()} 与 {other.describe()} 冲突（{WeekMask.format_weeks(weeks)}）")
+        print(f"检查了{len(schedules)}个课表，发现{conflict_count}处冲突")
+        if conflict_count:
+            sys.exit(1)
+        return
+
+    try:
+        weeks = WeekMask.parse_weeks(args.weeks)
+    except ValueError:
+        parser.error(f"周次格式错误: {args.weeks}")
+    query_started = time.perf_counter()
+    free = common_free(schedules, weeks)
+    periods = free_periods(free, weeks, args.min_slots, range(7) if args.weekend else range(5))
+    query_elapsed = time.perf_counter() - query_started
+    print(f"{len(schedules)}名学生在{WeekMask.format_weeks(weeks)}每周都空闲的时间：")
+    for day, slot_start, slot_end in periods:
+        print(f"  星期{DAY_NAMES[day]} {slot_text(slot_start, slot_end)}")
+    if not periods:
+        print("  无")
+    print(f"读取课表 {load_elapsed:.2f}s，查询 {query_elapsed * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程时间段的跨课表缓存
+同一年级的大量课表中有许多完全相同的课程（课程名、班级、周次、星期、节次、地点都相同），
+展开上课时间并渲染事件文本的结果只与这些字段和学期参数有关。按这些字段缓存展开得到的事件
+和渲染好的事件文本，之后的课表只需要复制事件、拼接文本：
+- 事件文本中的时间戳（CREATED/DTSTAMP/LAST-MODIFIED）以占位符渲染，输出时替换为各日历自己的时间戳
+- 按缓存文本的大小限制内存，超出时淘汰最久未使用的条目
+- 记录命中、未命中和淘汰次数，批量生成时汇总输出
+"""
+
+import collections
+import threading
+from typing import NamedTuple
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# 每个缓存事件除文本以外的大致内存占用（Course对象、时间对象等）
+EVENT_OVERHEAD = 512
+
+class SectionEntry(NamedTuple):
+    """一个课程时间段的缓存结果"""
+    courses: tuple   # 已预渲染的Curriculum.Course原型，命中时复制
+    counts: dict     # 展开时上课次数计数的增量（添加、跳过节假日、跳过周末）
+    size: int        # 估算的内存占用（字节）
+
+def section_key(record, day, term_mask, default_travel_time, recurring):
+    """
+    课程时间段的缓存键：只包含影响输出的字段，教师、原始文本等不影响输出的字段不计入
+    :param term_mask: 学期的WeekMask.TermMask（按学期参数缓存，同一学期为同一个对象）
+    """
+    return (record.name, record.class_info, record.week_start, record.week_end, record.week_type,
+            record.slot_start, record.slot_end, record.location, day, term_mask, default_travel_time, recurring)
+
+class SectionCache:
+    """按课程时间段缓存展开和渲染的结果，LRU淘汰，可在多个线程中使用"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param max_bytes: 缓存文本的总大小上限（字节）
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """查找缓存，返回SectionEntry，没有时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, courses, counts):
+        """
+        保存一个课程时间段的结果
+        :param courses: 已调用prerender的Course列表
+        :param counts: 上课次数计数的增量
+        """
+        size = sum(len(course.fragment[0]) + sum(map(len, course.fragment[1])) + EVENT_OVERHEAD for course in courses)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = SectionEntry(tuple(courses), dict(counts), size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存（统计数据保留）"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """命中、未命中、淘汰次数以及当前的条目数量和大小"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self.size}
+
+def hit_rate(stats):
+    """命中率，没有查找时为0"""
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    return stats.get("hits", 0) / lookups if lookups else 0.0
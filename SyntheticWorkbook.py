@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成课表生成器
+按教务系统（TIS）导出的格式生成xlsx课表，用于基准测试和大规模测试：
+- 第1行为合并的标题，第3行为星期，第4行起每个节次占2-3行，各列按节次合并
+- 同一时间段可以有多门课程（如单双周交替的课程）
+- 包含实验室安全学等特殊课程，以及重复出现的特殊课程单元格
+- 包含无地点、空地点、含逗号/分号/反斜杠的地点等非常规内容
+相同的参数和随机种子总是生成内容相同的课表
+"""
+
+import argparse
+import os
+import random
+
+import openpyxl
+from openpyxl.styles import Alignment
+
+from CourseParser import SPECIAL_COURSE_NAME
+
+DAY_NAMES = ("星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日")
+
+# (行标题, 起始行, 行数)，与教务系统导出的课表一致
+ROW_GROUPS = (
+    ("第1-2节", 4, 3),
+    ("第3-4节", 7, 3),
+    ("第5-6节", 10, 3),
+    ("第7-8节", 13, 3),
+    ("第9-10节", 16, 2),
+    ("第11-11节", 18, 3),
+)
+# 放置课程的节次：第11节没有对应的上课时间，不放置课程
+COURSE_ROW_GROUPS = ROW_GROUPS[:5]
+
+COURSE_NAMES = (
+    "数学分析", "高等代数", "大学物理", "程序设计基础", "数据结构与算法", "概率论与数理统计",
+    "信号与系统", "数字电路", "操作系统", "计算机网络", "先进电子设计自动化EDA",
+    "等离子体刻蚀前沿基础与技术", "量子力学", "有机化学", "生物信息学导论", "英语写作与交流",
+)
+TEACHERS = ("陈全", "陈志华", "卢周广", "王明", "李华", "张伟", "Smith John", "刘洋")
+LOCATIONS = (
+    "三教205", "一教125", "二教101", "荔园1栋A101", "理学院大楼M1001", "图书馆报告厅",
+    "体育馆-游泳池", "无地点", "", "线上(腾讯会议)", "一科,报告厅;B区", "南科大\\科研楼 301",
+)
+# (周次, 权重)：每周、单周、双周、部分周、单周次
+WEEK_PATTERNS = (
+    ("1-16周", 6), ("1-15单周", 2), ("2-16双周", 2), ("3-10周", 1), ("9-16周", 1), ("12周", 1),
+)
+
+def _course_block(name, teacher, class_info, weeks, location, slots):
+    """单元格中一门课程的4行文本"""
+    return f"{name}\n[{teacher}]\n[{class_info}]\n[{weeks}][{location}][{slots}]"
+
+def _slot_text(group):
+    """与行标题一致的节次，如 3-4节"""
+    return group[0][1:]
+
+def generate_cells(courses_per_week=12, special_cells=4, seed=0):
+    """
+    生成课表单元格内容
+    :param courses_per_week: 每周的课程时间段数量（同一时间段的多门课程分别计数）
+    :param special_cells: 实验室安全学单元格数量，前4个为同一门跨4个时间段的课程（在课表中重复出现）
+    :param seed: 随机种子
+    :return: {(行号, 列号): 单元格文本}，列号从2开始（B列为星期一）
+    """
+    rng = random.Random(seed)
+    blocks = {}
+    week_choices = [pattern for pattern, _ in WEEK_PATTERNS]
+    week_weights = [weight for _, weight in WEEK_PATTERNS]
+
+    for index in range(courses_per_week):
+        # 周末的课程较少
+        day = rng.choices(range(7), weights=(5, 5, 5, 5, 5, 1, 1))[0]
+        group = rng.choice(COURSE_ROW_GROUPS)
+        name = rng.choice(COURSE_NAMES)
+        weeks = rng.choices(week_choices, weights=week_weights)[0]
+        class_info = f"{name}-{index % 9 + 1:02d}班-{rng.choice(('中文', '英文', '双语'))}"
+        block = _course_block(name, rng.choice(TEACHERS), class_info, weeks, rng.choice(LOCATIONS), _slot_text(group))
+        blocks.setdefault((group[1], day + 2), []).append(block)
+
+    special_day = 6
+    for index in range(special_cells):
+        if index < 4:
+            # 同一门课程出现在连续4个时间段的单元格中
+            row = ROW_GROUPS[index][1]
+            block = _course_block(SPECIAL_COURSE_NAME, "卢周广", f"{SPECIAL_COURSE_NAME}-01班-英文", "12周", "无地点", "1-8节")
+            blocks.setdefault((row, special_day + 2), []).append(block)
+        else:
+            group = COURSE_ROW_GROUPS[index % len(COURSE_ROW_GROUPS)]
+            weeks = rng.choice(("2-12双周", "1-11单周", "4-8周"))
+            block = _course_block(SPECIAL_COURSE_NAME, "卢周广", f"{SPECIAL_COURSE_NAME}-{index:02d}班-英文", weeks, "一科报告厅", _slot_text(group))
+            blocks.setdefault((group[1], index % 5 + 2), []).append(block)
+
+    return {position: "\n".join(cell_blocks) for position, cell_blocks in blocks.items()}
+
+def generate_workbook(target, courses_per_week=12, special_cells=4, seed=0, title="合成学生课表"):
+    """
+    生成一个课表工作簿
+    :param target: 输出的xlsx路径或二进制文件对象
+    :return: 非空课程单元格数量
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "sheet1"
+
+    sheet.cell(1, 1, title)
+    sheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=8)
+    for day, day_name in enumerate(DAY_NAMES):
+        sheet.cell(3, day + 2, day_name)
+
+    cells = generate_cells(courses_per_week, special_cells, seed)
+    wrap = Alignment(wrap_text=True, vertical="top")
+    for header, first_row, row_count in ROW_GROUPS:
+        last_row = first_row + row_count - 1
+        sheet.cell(first_row, 1, header)
+        for column in range(1, 9):
+            text = cells.get((first_row, column))
+            if text:
+                sheet.cell(first_row, column, text).alignment = wrap
+            sheet.merge_cells(start_row=first_row, start_column=column, end_row=last_row, end_column=column)
+
+    sheet.column_dimensions["A"].width = 10
+    for column in "BCDEFGH":
+        sheet.column_dimensions[column].width = 24
+    workbook.save(target)
+    return len(cells)
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="生成教务系统格式的合成xlsx课表")
+    parser.add_argument("output", help="输出的xlsx文件；与--count一起使用时为输出目录")
+    parser.add_argument("-c", "--courses", type=int, default=12, help="每周的课程时间段数量，默认12")
+    parser.add_argument("--special", type=int, default=4, help="实验室安全学单元格数量，默认4")
+    parser.add_argument("-n", "--count", type=int, default=None, help="生成多个课表（每个使用不同的随机种子）到输出目录")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="随机种子，默认0")
+    args = parser.parse_args()
+
+    if args.courses < 0 or args.special < 0:
+        parser.error("课程数量不能为负数")
+    if args.count is None:
+        cell_count = generate_workbook(args.output, args.courses, args.special, args.seed)
+        print(f"已生成 {args.output}（{cell_count}个课程单元格）")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    for index in range(args.count):
+        path = os.path.join(args.output, f"student_{index:05d}.xlsx")
+        generate_workbook(path, args.courses, args.special, args.seed + index, title=f"合成学生{index}课表")
+    print(f"已在 {args.output} 生成{args.count}个课表")
+
+if __name__ == "__main__":
+    main()
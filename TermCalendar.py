@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+学期日历
+每个学期只计算一次：按(周次, 星期)顺序排成一维表，记录每一天的日期和类型
+    上课日   周一至周五，且不是节假日
+    节假日   在节假日列表中（无论星期几）
+    周末     周六、周日，且不是节假日、不是调休工作日
+    调休     周六、周日，但在调休工作日列表中，照常上课
+第w周、星期day（相对学期开始日期的天数，0=星期一）在表中的位置为 (w-1)*7+day，查询是一次下标访问；
+表外的日期按同样的规则判断。所有展开上课日期的代码都使用这里的规则（WeekMask.TermMask由它生成）
+对象创建后不再修改，可以pickle后传给工作进程，工作进程用install登记后直接使用
+"""
+
+import datetime
+import threading
+
+TEACHING = 0
+HOLIDAY = 1
+WEEKEND = 2
+MAKEUP = 3
+STATUS_NAMES = ("上课日", "节假日", "周末", "调休")
+# 照常上课的类型
+TEACHING_STATUSES = frozenset((TEACHING, MAKEUP))
+
+def classify_date(date, holidays, workdays=None):
+    """
+    一天的类型
+    :param holidays: 节假日集合
+    :param workdays: 调休工作日集合，None表示周末都不上课
+    """
+    if date in holidays:
+        return HOLIDAY
+    if date.weekday() >= 5:
+        return MAKEUP if workdays is not None and date in workdays else WEEKEND
+    return TEACHING
+
+class TermCalendar:
+    """一个学期每一天的日期和类型"""
+
+    __slots__ = ("term_start_date", "term_end_date", "holidays", "workdays", "week_count", "day_count", "dates", "statuses")
+
+    def __init__(self, term_start_date, term_end_date, holidays, workdays=None):
+        """
+        :param holidays: 节假日日期
+        :param workdays: 调休工作日日期，None表示周末都不上课
+        """
+        self.term_start_date = term_start_date
+        self.term_end_date = term_end_date
+        self.holidays = frozenset(holidays)
+        self.workdays = frozenset(workdays) if workdays is not None else None
+        self.week_count = max((term_end_date - term_start_date).days // 7 + 1, 0)
+        # 学期内的天数，最后一周中晚于学期结束日期的几天在表中但不在学期内
+        self.day_count = max((term_end_date - term_start_date).days + 1, 0)
+        start = term_start_date.toordinal()
+        self.dates = tuple(datetime.date.fromordinal(start + index) for index in range(self.week_count * 7))
+        self.statuses = bytes(classify_date(date, self.holidays, self.workdays) for date in self.dates)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("TermCalendar创建后不能修改")
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    @property
+    def key(self):
+        """学期参数，相同的学期参数得到相同的日历"""
+        return calendar_key(self.term_start_date, self.term_end_date, self.holidays, self.workdays)
+
+    def index(self, week, day):
+        """(周次, 星期)在表中的位置，不在表中时为-1"""
+        if 1 <= week <= self.week_count and 0 <= day < 7:
+            return (week - 1) * 7 + day
+        return -1
+
+    def date_of(self, week, day):
+        """第week周、星期day的日期"""
+        index = self.index(week, day)
+        if index >= 0:
+            return self.dates[index]
+        return self.term_start_date + datetime.timedelta(days=(week - 1) * 7 + day)
+
+    def status_of(self, week, day):
+        """第week周、星期day的类型（TEACHING、HOLIDAY、WEEKEND、MAKEUP）"""
+        index = self.index(week, day)
+        if index >= 0:
+            return self.statuses[index]
+        return classify_date(self.date_of(week, day), self.holidays, self.workdays)
+
+    def in_term(self, week, day):
+        """第week周、星期day是否不晚于学期结束日期"""
+        index = self.index(week, day)
+        if index >= 0:
+            return index < self.day_count
+        return self.date_of(week, day) <= self.term_end_date
+
+    def classify(self, date):
+        """任意一天的类型"""
+        index = date.toordinal() - self.term_start_date.toordinal()
+        if 0 <= index < len(self.statuses):
+            return self.statuses[index]
+        return classify_date(date, self.holidays, self.workdays)
+
+def calendar_key(term_start_date, term_end_date, holidays, workdays=None):
+    return (term_start_date, term_end_date, tuple(sorted(set(holidays))),
+            tuple(sorted(set(workdays))) if workdays is not None else None)
+
+# 学期参数 → TermCalendar，只保留最近使用的几个学期
+CACHE_SIZE = 8
+_calendars = {}
+_lock = threading.Lock()
+
+def install(calendar):
+    """登记已创建的日历（如主进程传来的），之后相同学期参数的term_calendar直接返回它"""
+    with _lock:
+        _calendars.pop(calendar.key, None)
+        _calendars[calendar.key] = calendar
+        while len(_calendars) > CACHE_SIZE:
+            del _calendars[next(iter(_calendars))]
+    return calendar
+
+def term_calendar(term_start_date, term_end_date, holidays, workdays=None):
+    """同一学期和节假日数据的TermCalendar只计算一次"""
+    key = calendar_key(term_start_date, term_end_date, holidays, workdays)
+    with _lock:
+        calendar = _calendars.get(key)
+    if calendar is not None:
+        return calendar
+    return install(TermCalendar(term_start_date, term_end_date, holidays, workdays))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按周次位图展开上课日期
+周次集合用一个整数表示，第w周对应第w-1位，如单周[1-15单周]为0b0101...01：
+- week_mask将课程的周次描述转换为位图
+- TermMask为每个学期预先计算7个星期各自的位图：学期内的周次、节假日、不调休的周末
+- 一门课程的上课周次 = 课程位图 & 学期位图 & ~节假日 & ~周末，一次位运算得到，不需要逐周判断
+- 拆分结果和每一次上课的时间都按学期缓存，同一学期的大量课表中相同周次和节次的课程只计算一次
+"""
+
+import datetime
+import functools
+
+import TermCalendar
+
+def week_mask(start_week, end_week, week_type=""):
+    """
+    课程周次的位图
+    :param week_type: ""=每周，"单"=单周，"双"=双周
+    """
+    if start_week < 1 or end_week < start_week:
+        return 0
+    mask = ((1 << (end_week - start_week + 1)) - 1) << (start_week - 1)
+    if week_type == "单":
+        mask &= odd_weeks(end_week)
+    elif week_type == "双":
+        mask &= odd_weeks(end_week) << 1
+    return mask
+
+def odd_weeks(week_count):
+    """前week_count周中单周的位图（第0、2、4…位）"""
+    pairs = (week_count + 1) // 2
+    return ((1 << (pairs * 2)) - 1) // 3
+
+@functools.lru_cache(maxsize=4096)
+def mask_weeks(mask):
+    """位图中的全部周次（从1开始），按顺序排列"""
+    weeks = []
+    while mask:
+        low = mask & -mask
+        weeks.append(low.bit_length())
+        mask ^= low
+    return tuple(weeks)
+
+def format_weeks(mask):
+    """位图的周次文本，如 1-8,10,12-16周，空位图为"无"（没有周次）"""
+    weeks = mask_weeks(mask)
+    if not weeks:
+        return "无"
+    ranges = []
+    first = last = weeks[0]
+    for week in weeks[1:]:
+        if week != last + 1:
+            ranges.append((first, last))
+            first = week
+        last = week
+    ranges.append((first, last))
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges) + "周"
+
+def parse_weeks(text):
+    """
+    解析周次文本为位图，如"1-16"、"1-8,10,12-16"、"3"
+    :raises ValueError: 格式错误
+    """
+    mask = 0
+    for part in text.replace("周", "").split(","):
+        start, _, end = part.strip().partition("-")
+        start_week = int(start)
+        end_week = int(end) if end else start_week
+        if start_week < 1 or end_week < start_week:
+            raise ValueError(f"周次范围错误: {part}")
+        mask |= week_mask(start_week, end_week)
+    return mask
+
+class TermMask:
+    """
+    一个学期的周次位图，由TermCalendar生成（节假日、周末的判断规则与TermCalendar相同）
+    学期开始日期为第1周的第1天，星期序号day为相对开始日期的天数（0=星期一）
+    """
+
+    def __init__(self, calendar):
+        """
+        :param calendar: 学期的TermCalendar.TermCalendar
+        """
+        self.calendar = calendar
+        self.term_start_date = calendar.term_start_date
+        self.term_end_date = calendar.term_end_date
+        self.week_count = calendar.week_count
+        # 每个星期：[第1周的日期, 第2周的日期, …]
+        self.dates = []
+        self.term = []      # 日期不晚于学期结束的周次
+        self.holiday = []   # 其中的节假日
+        self.weekend = []   # 其中不是节假日、也不调休的周末
+        for day in range(7):
+            term = holiday = weekend = 0
+            for week in range(self.week_count):
+                index = week * 7 + day
+                if index >= calendar.day_count:
+                    continue
+                bit = 1 << week
+                term |= bit
+                status = calendar.statuses[index]
+                if status == TermCalendar.HOLIDAY:
+                    holiday |= bit
+                elif status == TermCalendar.WEEKEND:
+                    weekend |= bit
+            self.dates.append(list(calendar.dates[day::7]))
+            self.term.append(term)
+            self.holiday.append(holiday)
+            self.weekend.append(weekend)
+        # (周次信息, 星期) → split的结果
+        self._splits = {}
+        # (位图, 星期, 开始时间, 结束时间) → times_of的结果
+        self._times = {}
+
+    def covers(self, start_week, day):
+        """能否用位图展开：周次从1开始，星期在0-6之间"""
+        return start_week >= 1 and 0 <= day < 7
+
+    def split(self, week_info, day):
+        """
+        将课程的周次按学期拆分
+        :param week_info: (起始周, 结束周, 单双周)
+        :return: (学期内的周次, 实际上课的周次, 跳过的节假日, 跳过的周末)，均为位图
+        """
+        key = (week_info, day)
+        result = self._splits.get(key)
+        if result is None:
+            pattern = week_mask(*week_info) & self.term[day]
+            holiday = pattern & self.holiday[day]
+            weekend = pattern & self.weekend[day]
+            result = pattern, pattern & ~(holiday | weekend), holiday, weekend
+            self._splits[key] = result
+        return result
+
+    def dates_of(self, mask, day):
+        """位图中各周的上课日期"""
+        dates = self.dates[day]
+        return [dates[week - 1] for week in mask_weeks(mask)]
+
+    def times_of(self, mask, day, start_time, end_time):
+        """
+        位图中各周的上课时间
+        :return: ((开始时间, 结束时间, 当天结束时间), …)
+        """
+        key = (mask, day, start_time, end_time)
+        result = self._times.get(key)
+        if result is None:
+            combine = datetime.datetime.combine
+            result = tuple((combine(date, start_time), combine(date, end_time), combine(date, datetime.time.max))
+                           for date in self.dates_of(mask, day))
+            self._times[key] = result
+        return result
+
+@functools.lru_cache(maxsize=TermCalendar.CACHE_SIZE)
+def _cached_term_mask(calendar):
+    return TermMask(calendar)
+
+def term_mask(term_start_date, term_end_date, holidays, workdays=None):
+    """同一学期和节假日数据的TermMask只计算一次（批量生成时各课表共用）"""
+    return _cached_term_mask(TermCalendar.term_calendar(term_start_date, term_end_date, holidays, workdays))
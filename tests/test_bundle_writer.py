@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BundleWriter的回归测试：三种打包方式的索引内容，以及按索引读取单个学生的日历
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import BundleWriter
+
+CALENDARS = {
+    "s001.ics": b"BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n",
+    "二年级/张三.ics": "BEGIN:VCALENDAR\r\nX-WR-CALNAME:课程表\r\nEND:VCALENDAR\r\n".encode("utf8") * 50,
+    "二年级/李四.ics": b"",
+}
+
+class BundleTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.output_dir = temp_dir.name
+
+    def write(self, kind):
+        with BundleWriter.open_bundle(kind, self.output_dir) as bundle:
+            for events, (name, data) in enumerate(CALENDARS.items()):
+                bundle.add(name, data, events)
+        return bundle.index_path
+
+    def test_read_entry(self):
+        for kind in BundleWriter.BUNDLE_KINDS:
+            with self.subTest(kind=kind):
+                index_path = self.write(kind)
+                for name, data in CALENDARS.items():
+                    self.assertEqual(BundleWriter.read_entry(index_path, BundleWriter.entry_key(name)), data)
+                with self.assertRaises(KeyError):
+                    BundleWriter.read_entry(index_path, "s002")
+
+    def test_index(self):
+        for kind in BundleWriter.BUNDLE_KINDS:
+            with self.subTest(kind=kind):
+                index = BundleWriter.load_index(self.write(kind))
+                self.assertEqual(index["kind"], kind)
+                self.assertEqual(sorted(index["entries"]), sorted(BundleWriter.entry_key(name) for name in CALENDARS))
+                for events, (name, data) in enumerate(CALENDARS.items()):
+                    entry = index["entries"][BundleWriter.entry_key(name)]
+                    self.assertEqual((entry["size"], entry["events"]), (len(data), events))
+
+    def test_offsets(self):
+        zip_index = BundleWriter.load_index(self.write("zip"))
+        with open(os.path.join(self.output_dir, zip_index["archive"]), "rb") as fp:
+            archive = fp.read()
+        for entry in zip_index["entries"].values():
+            # 偏移处为条目的本地文件头
+            self.assertEqual(archive[entry["offset"]:entry["offset"] + 4], b"PK\x03\x04")
+
+        tar_index = BundleWriter.load_index(self.write("tar.gz"))
+        with gzip.open(os.path.join(self.output_dir, tar_index["archive"]), "rb") as fp:
+            stream = fp.read()
+        for name, data in CALENDARS.items():
+            entry = tar_index["entries"][BundleWriter.entry_key(name)]
+            self.assertEqual(stream[entry["offset"]:entry["offset"] + entry["size"]], data)
+
+        gzip_index = BundleWriter.load_index(self.write("gzip"))
+        entry = gzip_index["entries"]["二年级/张三"]
+        self.assertEqual((entry["name"], entry["offset"]), ("二年级/张三.ics.gz", 0))
+        self.assertLess(entry["stored_size"], entry["size"])
+        self.assertEqual(os.path.getsize(os.path.join(self.output_dir, entry["name"])), entry["stored_size"])
+
+    def test_duplicate_entry(self):
+        for kind in BundleWriter.BUNDLE_KINDS:
+            # 重复的条目写入压缩包之后才在索引中发现，zipfile会先给出警告；整个压缩包随后被放弃
+            with self.subTest(kind=kind), self.assertRaises(ValueError), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                with BundleWriter.open_bundle(kind, self.output_dir) as bundle:
+                    bundle.add("s001.ics", b"", 0)
+                    bundle.add("s001.ics", b"", 0)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "calendars.zip")))
+
+    def test_abort_leaves_nothing(self):
+        for kind in ("zip", "tar.gz"):
+            with self.subTest(kind=kind), self.assertRaises(RuntimeError):
+                with BundleWriter.open_bundle(kind, self.output_dir) as bundle:
+                    bundle.add("s001.ics", CALENDARS["s001.ics"], 1)
+                    raise RuntimeError("中断")
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            BundleWriter.open_bundle("rar", self.output_dir)
+
+    def test_gzip_bytes_deterministic(self):
+        data = CALENDARS["二年级/张三.ics"]
+        self.assertEqual(BundleWriter.gzip_bytes(data), BundleWriter.gzip_bytes(data))
+        self.assertEqual(gzip.decompress(BundleWriter.gzip_bytes(data)), data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+确定性UID和CalendarDelta的回归测试：事件摘要、SEQUENCE和CREATED的保留与递增、取消通知
+"""
+
+import datetime
+import os
+import re
+import sys
+import unittest
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CalendarDelta
+import Curriculum
+import CurriculumGenerator
+import GeneratorLog
+import ScheduleLoader
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 28)
+HOLIDAYS = [datetime.date(2025, 10, day) for day in range(1, 9)]
+WORKDAYS = [datetime.date(2025, 9, 28), datetime.date(2025, 10, 11)]
+PREVIOUS_CREATED = "20250101T000000Z"
+
+def build(grid, travel_time=30, created=None):
+    """
+    生成课程表
+    :param created: 生成时间，默认为当前时间
+    """
+    with GeneratorLog.suppressed():
+        curriculum, _ = CurriculumGenerator.build_curriculum_from_records(
+            CurriculumGenerator.parse_grid(grid), TERM_START, TERM_END, HOLIDAYS, WORKDAYS, travel_time)
+    if created is not None:
+        curriculum.created = created
+    return curriculum
+
+def previous_text(curriculum, sequence):
+    """上一次输出的ics文本：生成时间和CREATED与本次不同，SEQUENCE为指定的值"""
+    text = curriculum.get_ics_text()
+    text = re.sub(r"^CREATED:[^\r\n]*", "CREATED:" + PREVIOUS_CREATED, text, flags=re.MULTILINE)
+    return re.sub(r"^SEQUENCE:\d+", f"SEQUENCE:{sequence}", text, flags=re.MULTILINE)
+
+class EventUidTest(unittest.TestCase):
+
+    def test_same_as_uuid5(self):
+        date = datetime.date(2025, 9, 8)
+        expected = uuid.uuid5(Curriculum.UID_NAMESPACE, f"课程|{date}")
+        self.assertEqual(Curriculum.event_uid("课程", date), f"{expected}@{Curriculum.UID_DOMAIN}")
+
+    def test_stable_across_runs(self):
+        grid = ScheduleLoader.load_schedule_grid(os.path.join(ROOT, "export.xlsx"))
+        first = re.findall(r"^UID:(\S+)", build(grid).get_ics_text(), re.MULTILINE)
+        second = re.findall(r"^UID:(\S+)", build(grid, travel_time=45).get_ics_text(), re.MULTILINE)
+        self.assertEqual(first, second)
+        self.assertEqual(len(set(first)), len(first))
+
+class FingerprintTest(unittest.TestCase):
+    LINES = ["BEGIN:VEVENT", "SUMMARY:课程", "DTSTAMP:20250101T000000Z", "SEQUENCE:0", "UID:a",
+             "BEGIN:VALARM", "TRIGGER:-PT30M", "END:VALARM", "END:VEVENT"]
+
+    def test_volatile_properties_ignored(self):
+        changed = [line.replace("20250101", "20260101").replace("SEQUENCE:0", "SEQUENCE:5") for line in self.LINES]
+        changed.insert(3, "LAST-MODIFIED:20260101T000000Z")
+        self.assertEqual(CalendarDelta.fingerprint(changed), CalendarDelta.fingerprint(self.LINES))
+
+    def test_content_changes(self):
+        for old, new in (("SUMMARY:课程", "SUMMARY:新课程"), ("TRIGGER:-PT30M", "TRIGGER:-PT45M")):
+            with self.subTest(line=new):
+                changed = [new if line == old else line for line in self.LINES]
+                self.assertNotEqual(CalendarDelta.fingerprint(changed), CalendarDelta.fingerprint(self.LINES))
+
+    def test_folded_lines(self):
+        event = CalendarDelta.parse_events("\r\n".join(self.LINES[:2] + ["DESCRIPTION:很长的", " 描述"] + self.LINES[2:]))["a"]
+        self.assertEqual(event.properties["DESCRIPTION"], "DESCRIPTION:很长的描述")
+
+class ApplyPreviousTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.grid = ScheduleLoader.load_schedule_grid(os.path.join(ROOT, "export.xlsx"))
+
+    def setUp(self):
+        self.created = datetime.datetime(2025, 9, 1, tzinfo=datetime.timezone.utc)
+        self.previous = CalendarDelta.parse_events(previous_text(build(self.grid, created=self.created), 3))
+
+    def later(self, grid=None, travel_time=30):
+        return build(self.grid if grid is None else grid, travel_time, self.created + datetime.timedelta(days=7))
+
+    def test_parse_events(self):
+        self.assertTrue(self.previous)
+        for event in self.previous.values():
+            self.assertEqual(event.sequence, 3)
+            self.assertEqual(event.created, PREVIOUS_CREATED)
+
+    def test_unchanged(self):
+        curriculum = self.later()
+        result = CalendarDelta.apply_previous(curriculum, self.previous)
+        self.assertEqual((result.added, result.modified, result.removed), ([], [], []))
+        self.assertEqual(result.unchanged, len(self.previous))
+        self.assertFalse(result.changed)
+        text = curriculum.get_ics_text()
+        self.assertEqual(set(re.findall(r"^SEQUENCE:(\d+)", text, re.MULTILINE)), {"3"})
+        self.assertEqual(set(re.findall(r"^CREATED:(\S+)", text, re.MULTILINE)), {PREVIOUS_CREATED})
+
+    def test_modified(self):
+        curriculum = self.later(travel_time=45)
+        result = CalendarDelta.apply_previous(curriculum, self.previous)
+        self.assertEqual(sorted(result.modified), sorted(self.previous))
+        self.assertEqual(result.unchanged, 0)
+        text = curriculum.get_ics_text()
+        self.assertEqual(set(re.findall(r"^SEQUENCE:(\d+)", text, re.MULTILINE)), {"4"})
+        self.assertEqual(set(re.findall(r"^CREATED:(\S+)", text, re.MULTILINE)), {PREVIOUS_CREATED})
+
+    def test_added_and_removed(self):
+        # 去掉星期一的实验室安全学（第2-12双周）
+        grid = [cell for cell in self.grid if (cell.day, cell.row) != (0, 16)]
+        curriculum = self.later(grid)
+        result = CalendarDelta.apply_previous(curriculum, self.previous)
+        self.assertEqual(result.added, [])
+        self.assertEqual(result.modified, [])
+        self.assertEqual(len(result.removed), 6)
+        self.assertEqual(result.unchanged + len(result.removed), len(self.previous))
+
+        self.assertEqual("".join(CalendarDelta.iter_publish_chunks(curriculum, result)), "")
+        delta = "".join(CalendarDelta.iter_cancel_chunks(curriculum, result))
+        self.assertEqual(delta.count("BEGIN:VCALENDAR"), 1)
+        self.assertIn("METHOD:CANCEL", delta)
+        self.assertEqual(delta.count("STATUS:CANCELLED"), 6)
+        self.assertEqual(set(re.findall(r"^SEQUENCE:(\d+)", delta, re.MULTILINE)), {"4"})
+        self.assertEqual(sorted(re.findall(r"^UID:(\S+)", delta, re.MULTILINE)), sorted(event.uid for event in result.removed))
+
+        # 反过来，以缺少这门课的课程表为上一次的输出
+        previous = CalendarDelta.parse_events(previous_text(curriculum, 0))
+        full = self.later()
+        result = CalendarDelta.apply_previous(full, previous)
+        self.assertEqual(len(result.added), 6)
+        self.assertEqual(result.removed, [])
+        self.assertEqual("".join(CalendarDelta.iter_cancel_chunks(full, result)), "")
+        delta = "".join(CalendarDelta.iter_publish_chunks(full, result))
+        self.assertEqual(delta.count("BEGIN:VCALENDAR"), 1)
+        self.assertIn("METHOD:PUBLISH", delta)
+        self.assertEqual(delta.count("BEGIN:VEVENT"), 6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CellDedup的回归测试：内容相同的单元格只解析一次，同一门课程相邻、重叠和被包含的节次归并为一个课程时间段
+"""
+
+import collections
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CellDedup
+import CourseParser
+import ScheduleLoader
+
+# 行号 → 行标题，与导出文件相同
+ROW_HEADERS = {4: "第1-2节", 7: "第3-4节", 10: "第5-6节", 13: "第7-8节", 16: "第9-10节"}
+
+def cell(row, text, day=0):
+    return ScheduleLoader.ScheduleCell(row, day, text, ROW_HEADERS[row])
+
+def course(tokens, name="课程", class_info="课程-01班"):
+    """一门课程的单元格文本，tokens如"[1-16周][三教101][3-4节]" """
+    return f"{name}\n[教师]\n[{class_info}]\n{tokens}"
+
+def merge(*cells):
+    counters = collections.Counter()
+    sections = CellDedup.merge_sections(CellDedup.parse_cells(cells), counters)
+    return sections, counters
+
+class MergeSectionsTest(unittest.TestCase):
+
+    def assertSlots(self, sections, expected):
+        """每个时间段的(星期, 节次)，课程自身没有节次时为所在行的节次"""
+        self.assertEqual([(section.day, section.record.time_slots or section.row_slots) for section in sections], expected)
+
+    def test_adjacent(self):
+        sections, counters = merge(cell(4, course("[1-16周][三教101][1-2节]")), cell(7, course("[1-16周][三教101][3-4节]")))
+        self.assertSlots(sections, [(0, (1, 4))])
+        self.assertEqual(sections[0].row_slots, (1, 4))
+        self.assertEqual(sections[0].row, 4)
+        self.assertEqual(counters, {"merged": 1})
+
+    def test_overlapping(self):
+        sections, counters = merge(cell(4, course("[1-16周][三教101][1-3节]")), cell(7, course("[1-16周][三教101][3-4节]")))
+        self.assertSlots(sections, [(0, (1, 4))])
+        self.assertEqual(counters, {"merged": 1})
+
+    def test_contained(self):
+        # 合并单元格中的[1-8节]课程在每一行各出现一次
+        text = course("[12周][无地点][1-8节]", "实验室安全学", "实验室安全学-01班-英文")
+        sections, counters = merge(*(cell(row, text, 5) for row in (4, 7, 10, 13)))
+        self.assertSlots(sections, [(5, (1, 8))])
+        self.assertEqual(counters, {"duplicate": 3})
+
+        sections, counters = merge(cell(4, course("[1-16周][三教101][1-4节]")), cell(7, course("[1-16周][三教101][2-3节]")))
+        self.assertSlots(sections, [(0, (1, 4))])
+        self.assertEqual(counters, {"duplicate": 1})
+
+    def test_row_slots_without_course_slots(self):
+        # 没有节次信息的课程以所在行的节次为准，相邻的行同样合并
+        text = course("[2-12双周][一科报告厅]", "实验室安全学", "实验室安全学-01班-英文")
+        sections, counters = merge(cell(4, text), cell(7, text), cell(13, text))
+        self.assertSlots(sections, [(0, (1, 4)), (0, (7, 8))])
+        self.assertIsNone(sections[0].record.time_slots)
+        self.assertEqual(counters, {"merged": 1})
+
+    def test_not_merged(self):
+        cases = {
+            "不相邻": (cell(4, course("[1-16周][三教101][1-2节]")), cell(10, course("[1-16周][三教101][5-6节]"))),
+            "周次不同": (cell(4, course("[1-16周][三教101][1-2节]")), cell(7, course("[1-8周][三教101][3-4节]"))),
+            "地点不同": (cell(4, course("[1-16周][三教101][1-2节]")), cell(7, course("[1-16周][三教102][3-4节]"))),
+            "教学班不同": (cell(4, course("[1-16周][三教101][1-2节]")), cell(7, course("[1-16周][三教101][3-4节]", class_info="课程-02班"))),
+        }
+        for case, cells in cases.items():
+            with self.subTest(case=case):
+                sections, counters = merge(*cells)
+                self.assertEqual(len(sections), 2)
+                self.assertEqual(counters, {})
+        sections, _ = merge(cell(4, course("[1-16周][三教101][1-2节]"), 0), cell(4, course("[1-16周][三教101][1-2节]"), 1))
+        self.assertSlots(sections, [(0, (1, 2)), (1, (1, 2))])
+
+    def test_sorted_by_day(self):
+        sections, _ = merge(cell(4, course("[1-16周][三教101][1-2节]", "乙"), 3), cell(7, course("[1-16周][三教101][3-4节]", "甲"), 1))
+        self.assertEqual([section.record.name for section in sections], ["甲", "乙"])
+
+    def test_whitespace_variants(self):
+        # 只有空白不同的单元格分别解析，得到的课程相同，归并时去重
+        text = course("[1-16周][三教101][1-2节]")
+        sections, counters = merge(cell(4, text), cell(4, text + "\n"))
+        self.assertEqual(len(sections), 1)
+        self.assertEqual(counters, {"duplicate": 1})
+
+class ParseCellsTest(unittest.TestCase):
+
+    def test_same_text_parsed_once(self):
+        text = course("[12周][无地点][1-8节]", "实验室安全学")
+        cells = [cell(row, text, 5) for row in (4, 7, 10, 13)]
+        before = CourseParser.scan_count
+        parsed = CellDedup.parse_cells(cells)
+        self.assertEqual(CourseParser.scan_count - before, 1)
+        self.assertEqual([item[0] for item in parsed], cells)
+        self.assertTrue(all(records is parsed[0][1] for _, records in parsed))
+
+    def test_export_workbook(self):
+        grid = ScheduleLoader.load_schedule_grid(os.path.join(ROOT, "export.xlsx"))
+        counters = collections.Counter()
+        sections = CellDedup.merge_sections(CellDedup.parse_cells(grid), counters)
+        self.assertEqual([(section.day, section.row, section.record.name) for section in sections], [
+            (0, 7, "先进电子设计自动化EDA"), (0, 16, "实验室安全学"),
+            (4, 7, "等离子体刻蚀前沿基础与技术"), (4, 7, "先进电子设计自动化EDA"), (5, 4, "实验室安全学")])
+        self.assertEqual(counters, {"duplicate": 3})
+
+if __name__ == "__main__":
+    unittest.main()
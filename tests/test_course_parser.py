@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CourseParser.parse_cell的回归测试：以export.xlsx中的单元格为输入
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CourseParser
+import ScheduleLoader
+
+EXPORT_FILE = os.path.join(ROOT, "export.xlsx")
+SAFETY_CLASS = "实验室安全学-01班-英文"
+
+def record(name, teacher, class_info, weeks, slots, location, raw_text):
+    return CourseParser.CourseRecord(name, teacher, class_info, weeks[0], weeks[1], weeks[2], slots[0], slots[1], location,
+                                     CourseParser.SPECIAL_COURSE_NAME in name, raw_text)
+
+# (星期, 行号) → 单元格中的课程
+EXPECTED = {
+    (0, 7): [record("先进电子设计自动化EDA", "陈全", "先进电子设计自动化EDA-01班-英文", (1, 16, ""), (3, 4), "三教205",
+                    "[1-16周][三教205][3-4节]")],
+    (0, 16): [record("实验室安全学", "卢周广", SAFETY_CLASS, (2, 12, "双"), (9, 10), "一科报告厅",
+                     "[2-12双周][一科报告厅][9-10节]")],
+    (4, 7): [record("等离子体刻蚀前沿基础与技术", "陈志华", "等离子体刻蚀前沿基础与技术-01班-中文", (2, 16, "双"), (3, 4), "一教125",
+                    "[2-16双周][一教125][3-4节]"),
+             record("先进电子设计自动化EDA", "陈全", "先进电子设计自动化EDA-01班-英文", (1, 15, "单"), (3, 4), "三教205",
+                    "[1-15单周][三教205][3-4节]")],
+}
+SAFETY_WEEK_12 = [record("实验室安全学", "卢周广", SAFETY_CLASS, (12, 12, ""), (1, 8), "无地点", "[12周][无地点][1-8节]")]
+for row in (4, 7, 10, 13):
+    EXPECTED[(5, row)] = SAFETY_WEEK_12
+
+class ExportWorkbookTest(unittest.TestCase):
+    """export.xlsx中每个单元格的解析结果"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.grid = ScheduleLoader.load_schedule_grid(EXPORT_FILE)
+
+    def test_cells(self):
+        self.assertEqual(sorted((cell.day, cell.row) for cell in self.grid), sorted(EXPECTED))
+        for cell in self.grid:
+            with self.subTest(day=cell.day, row=cell.row):
+                self.assertEqual(CourseParser.parse_cell(cell.text), EXPECTED[(cell.day, cell.row)])
+
+    def test_row_headers(self):
+        slots = {(cell.day, cell.row): CourseParser.parse_row_header(cell.row_header) for cell in self.grid}
+        self.assertEqual(slots[(0, 7)], (3, 4))
+        self.assertEqual(slots[(0, 16)], (9, 10))
+        self.assertEqual([slots[(5, row)] for row in (4, 7, 10, 13)], [(1, 2), (3, 4), (5, 6), (7, 8)])
+
+    def test_one_scan_per_cell(self):
+        before = CourseParser.scan_count
+        for cell in self.grid:
+            CourseParser.parse_cell(cell.text)
+        self.assertEqual(CourseParser.scan_count - before, len(self.grid))
+
+class ParseCellTest(unittest.TestCase):
+    """导出文件中没有出现、但解析规则需要处理的情况"""
+
+    def test_short_cell(self):
+        self.assertEqual(CourseParser.parse_cell(""), [])
+        self.assertEqual(CourseParser.parse_cell("课程名\n[教师]\n[教学班]"), [])
+
+    def test_block_without_brackets_is_skipped(self):
+        text = "课程甲\n[教师]\n[班级]\n没有周次\n课程乙\n[教师]\n[班级]\n[3周][三教101][1-2节]"
+        records = CourseParser.parse_cell(text)
+        self.assertEqual([record.name for record in records], ["课程乙"])
+        self.assertEqual(records[0].week_info, (3, 3, ""))
+
+    def test_missing_fields(self):
+        records = CourseParser.parse_cell("课程\n[教师]\n[班级]\n[1-8周]")
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].week_info, (1, 8, ""))
+        self.assertIsNone(records[0].time_slots)
+        self.assertEqual(records[0].location, CourseParser.UNKNOWN_LOCATION)
+
+    def test_first_token_wins(self):
+        records = CourseParser.parse_cell("课程\n[教师]\n[班级]\n[2-4周][一教101][3-4节][5-6周][二教202][7-8节]")
+        self.assertEqual(records[0].week_info, (2, 4, ""))
+        self.assertEqual(records[0].time_slots, (3, 4))
+        self.assertEqual(records[0].location, "一教101")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HolidayProvider.fetch_years的回归测试：年度API和范围API之间的对冲、端点失败时立即切换和总时限
+接口地址指向本机的测试服务器，不会访问外网
+"""
+
+import datetime
+import http.server
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import GeneratorLog
+import HolidayProvider
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2026, 1, 18)
+
+def api_response(year):
+    return {"code": 0, "holiday": {
+        "10-01": {"holiday": True, "name": "国庆节", "date": f"{year}-10-01"},
+        "10-11": {"holiday": False, "name": "国庆节后补班", "date": f"{year}-10-11"},
+    }}
+
+class FakeApiHandler(http.server.BaseHTTPRequestHandler):
+    """
+    路径为 /year/<年份> 或 /range/<开始>/<结束>
+    behaviors[端点]为(行为, 延迟秒数)，行为为"ok"、"error"或"drip"（持续缓慢地发送，永远不结束）
+    """
+    behaviors = {}
+    requests = []
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        endpoint = parts[0]
+        self.requests.append((endpoint, time.monotonic()))
+        behavior, delay = self.behaviors.get(endpoint, ("ok", 0))
+        time.sleep(delay)
+        if behavior == "error":
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        if behavior == "drip":
+            try:
+                for _ in range(100):
+                    self.wfile.write(b" " * 1024)
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+            return
+        year = int(parts[1][:4])
+        self.wfile.write(json.dumps(api_response(year)).encode("utf8"))
+
+    def log_message(self, *args):
+        pass
+
+@unittest.skipUnless(importlib.util.find_spec("requests"), "需要requests")
+class FetchYearsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeApiHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.patches = [mock.patch.object(HolidayProvider, "YEAR_API_URL", base + "/year/{year}"),
+                       mock.patch.object(HolidayProvider, "RANGE_API_URL", base + "/range/{start}/{end}")]
+        for patch in cls.patches:
+            patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        for patch in cls.patches:
+            patch.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FakeApiHandler.behaviors = {}
+        FakeApiHandler.requests = []
+
+    def fetch(self, deadline=3, hedge_delay=0.3):
+        started = time.monotonic()
+        with GeneratorLog.suppressed():
+            results = HolidayProvider.fetch_years([2025, 2026], TERM_START, TERM_END, deadline, hedge_delay)
+        return results, time.monotonic() - started
+
+    def origins(self, results):
+        return {year: origin for year, (_, origin) in results.items()}
+
+    def test_year_api_first(self):
+        results, _ = self.fetch()
+        self.assertEqual(self.origins(results), {2025: "年度API", 2026: "年度API"})
+        self.assertEqual(results[2026][0]["holidays"], {"2026-10-01": "国庆节"})
+        self.assertEqual(results[2026][0]["workdays"], {"2026-10-11": "国庆节后补班"})
+        self.assertEqual([endpoint for endpoint, _ in FakeApiHandler.requests], ["year", "year"])
+
+    def test_hedge_to_range_api(self):
+        FakeApiHandler.behaviors = {"year": ("ok", 1.5)}
+        results, elapsed = self.fetch()
+        self.assertEqual(self.origins(results), {2025: "范围API", 2026: "范围API"})
+        # 范围API的结果不是完整的年份数据，不能写入缓存
+        self.assertNotIn("format", results[2025][0])
+        self.assertLess(elapsed, 1.2)
+        self.assertEqual(sorted(endpoint for endpoint, _ in FakeApiHandler.requests), ["range", "range", "year", "year"])
+
+    def test_failure_skips_hedge_delay(self):
+        FakeApiHandler.behaviors = {"year": ("error", 0)}
+        results, elapsed = self.fetch(hedge_delay=2)
+        self.assertEqual(self.origins(results), {2025: "范围API", 2026: "范围API"})
+        self.assertLess(elapsed, 1.5)
+
+    def test_deadline(self):
+        FakeApiHandler.behaviors = {"year": ("drip", 0), "range": ("drip", 0)}
+        started = time.monotonic()
+        with self.assertLogs(GeneratorLog.logger, "WARNING") as logs:
+            results = HolidayProvider.fetch_years([2025, 2026], TERM_START, TERM_END, 1, 0.2)
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(results, {})
+        self.assertEqual(len(logs.records), 2)
+        self.assertTrue(all("秒内没有获取成功" in record.getMessage() for record in logs.records))
+
+    def test_get_json_total_timeout(self):
+        FakeApiHandler.behaviors = {"year": ("drip", 0)}
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            HolidayProvider.fetch_year(2025, timeout=0.5)
+        # 每读取一块检查一次时限，服务器要10秒才发送完
+        self.assertLess(time.monotonic() - started, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HolidayProvider的回归测试：缓存有效期，以及有效缓存 → 网络 → 过期缓存 → 内置数据的顺序
+网络请求用fetch_years的替身代替，不会真的联网
+"""
+
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import GeneratorLog
+import HolidayProvider
+
+def year_data(year, holidays, fetched_at=None):
+    """
+    构造年份数据
+    :param holidays: 节假日日期字符串列表
+    """
+    data = {"format": HolidayProvider.FORMAT_VERSION, "year": year, "version": f"{year}.test", "source": "测试",
+            "holidays": dict.fromkeys(holidays, "假日"), "workdays": {}}
+    if fetched_at is not None:
+        data["fetched_at"] = fetched_at
+    return data
+
+class HolidayCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_dir = temp_dir.name
+        self.fresh = year_data(2030, ["2030-10-01"], time.time())
+        self.stale = year_data(2030, ["2030-10-02"], time.time() - HolidayProvider.DEFAULT_TTL - 1)
+        self.network = year_data(2030, ["2030-10-03"], time.time())
+
+    def get(self, year=2030, offline=False, network=None):
+        """
+        获取一年的数据
+        :param network: fetch_years的返回值，None表示网络不可用
+        """
+        results = {} if network is None else {year: (network, "年度API")}
+        with mock.patch.object(HolidayProvider, "fetch_years", return_value=results) as fetch:
+            data, origin = HolidayProvider.get_year_data(year, offline, self.cache_dir)
+        return data, origin, fetch
+
+    def test_is_fresh(self):
+        self.assertTrue(HolidayProvider.is_fresh(self.fresh))
+        self.assertFalse(HolidayProvider.is_fresh(self.stale))
+        self.assertTrue(HolidayProvider.is_fresh(self.stale, ttl=HolidayProvider.DEFAULT_TTL * 2))
+        self.assertTrue(HolidayProvider.is_fresh(year_data(2030, [])))
+
+    def test_fresh_cache_skips_network(self):
+        HolidayProvider.write_cached_year(self.fresh, self.cache_dir)
+        data, origin, fetch = self.get(network=self.network)
+        self.assertEqual((data["holidays"], origin), (self.fresh["holidays"], "缓存"))
+        fetch.assert_not_called()
+
+    def test_stale_cache_refreshed_from_network(self):
+        HolidayProvider.write_cached_year(self.stale, self.cache_dir)
+        data, origin, fetch = self.get(network=self.network)
+        self.assertEqual((data["holidays"], origin), (self.network["holidays"], "年度API"))
+        fetch.assert_called_once()
+        self.assertEqual(HolidayProvider.read_cached_year(2030, self.cache_dir)["holidays"], self.network["holidays"])
+
+    def test_stale_cache_when_network_fails(self):
+        HolidayProvider.write_cached_year(self.stale, self.cache_dir)
+        data, origin, _ = self.get()
+        self.assertEqual((data["holidays"], origin), (self.stale["holidays"], "过期缓存"))
+
+    def test_offline_uses_stale_cache(self):
+        HolidayProvider.write_cached_year(self.stale, self.cache_dir)
+        data, origin, fetch = self.get(offline=True, network=self.network)
+        self.assertEqual((data["holidays"], origin), (self.stale["holidays"], "缓存"))
+        fetch.assert_not_called()
+
+    def test_bundled_data_last(self):
+        bundled = HolidayProvider.load_bundled_year(2025)
+        self.assertIsNotNone(bundled)
+        data, origin, _ = self.get(2025)
+        self.assertEqual((data, origin), (bundled, "内置数据"))
+
+    def test_corrupt_cache_ignored(self):
+        with open(os.path.join(self.cache_dir, "2025.json"), "w", encoding="utf8") as fp:
+            json.dump({"format": HolidayProvider.FORMAT_VERSION, "year": 2025}, fp)
+        self.assertIsNone(HolidayProvider.read_cached_year(2025, self.cache_dir))
+        self.assertEqual(self.get(2025)[1], "内置数据")
+
+    def test_missing_year_warns(self):
+        self.assertEqual(self.get()[:2], (None, None))
+        HolidayProvider.write_cached_year(self.fresh, self.cache_dir)
+        # 2029年没有任何数据，不用其他年份代替；2030年的数据照常使用
+        with mock.patch.object(HolidayProvider, "fetch_years", return_value={}), \
+                self.assertLogs(GeneratorLog.logger, "WARNING") as logs:
+            holidays, workdays = HolidayProvider.get_holidays_and_workdays(
+                datetime.date(2029, 9, 1), datetime.date(2030, 12, 31), cache_dir=self.cache_dir)
+        self.assertEqual((holidays, workdays), ([datetime.date(2030, 10, 1)], []))
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("2029年", logs.records[0].getMessage())
+
+if __name__ == "__main__":
+    unittest.main()
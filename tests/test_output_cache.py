@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OutputCache的回归测试：缓存键、按最近使用时间淘汰（LRU）和按学期失效
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OutputCache
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 28)
+TERM = OutputCache.term_name(TERM_START, TERM_END)
+
+def key(data, holiday_version="v1", term_end_date=TERM_END):
+    return OutputCache.make_key(data, TERM_START, term_end_date, 30, holiday_version)
+
+class MakeKeyTest(unittest.TestCase):
+
+    def test_inputs_change_digest(self):
+        base = key(b"xlsx")
+        self.assertEqual(base, key(b"xlsx"))
+        self.assertEqual(base.term, TERM)
+        changed = [
+            key(b"xlsx2"),
+            OutputCache.make_key(b"xlsx", TERM_START, TERM_END, 45, "v1"),
+            OutputCache.make_key(b"xlsx", TERM_START, TERM_END, 30, "v1", recurring=True),
+            OutputCache.make_key(b"xlsx", TERM_START, TERM_END, 30, "v1", calendar_name="日历"),
+            OutputCache.make_key(b"xlsx", TERM_START, TERM_END, 30, "v1", generator_version="0"),
+        ]
+        self.assertEqual(len({item.digest for item in changed} | {base.digest}), len(changed) + 1)
+
+class OutputCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache = OutputCache.OutputCache(temp_dir.name, max_bytes=300)
+
+    def put(self, name, used_at, holiday_version="v1", size=100):
+        """写入一个条目，并将最近使用时间设为used_at"""
+        entry_key = key(name.encode("utf8"), holiday_version)
+        self.cache.put(entry_key, b"x" * size)
+        os.utime(os.path.join(self.cache.cache_dir, entry_key.filename), (used_at, used_at))
+        return entry_key
+
+    def test_get_and_put(self):
+        entry_key = key(b"xlsx")
+        self.assertIsNone(self.cache.get(entry_key))
+        self.cache.put(entry_key, b"BEGIN:VCALENDAR")
+        self.assertEqual(self.cache.get(entry_key), b"BEGIN:VCALENDAR")
+        self.assertEqual(os.listdir(self.cache.cache_dir), [entry_key.filename])
+
+    def test_lru_eviction(self):
+        keys = [self.put(name, used_at) for name, used_at in (("a", 1000), ("b", 2000), ("c", 3000))]
+        # 读取a使它成为最近使用的条目，再写入d时淘汰最久未使用的b
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.put("d", 4000)
+        self.assertEqual(len(self.cache.entries()), 3)
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+    def test_evict_after_limit_lowered(self):
+        for name, used_at in (("a", 1000), ("b", 2000), ("c", 3000)):
+            self.put(name, used_at)
+        self.cache.max_bytes = 150
+        self.assertEqual(self.cache.evict(), 2)
+        self.assertEqual([entry[4] for entry in self.cache.entries()], [3000])
+
+    def test_new_holiday_version_replaces_term(self):
+        old = self.put("a", 1000, "v1")
+        other_term = key(b"b", "v1", TERM_END + datetime.timedelta(days=7))
+        self.cache.put(other_term, b"x")
+        self.put("c", 2000, "v2")
+        self.assertIsNone(self.cache.get(old))
+        self.assertIsNotNone(self.cache.get(other_term))
+        self.assertEqual(sorted(entry[2] for entry in self.cache.entries()), ["v1", "v2"])
+
+    def test_invalidate_term(self):
+        self.put("a", 1000)
+        self.put("b", 2000)
+        other_term = key(b"c", "v1", TERM_END + datetime.timedelta(days=7))
+        self.cache.put(other_term, b"x")
+        self.assertEqual(self.cache.invalidate_term(TERM, keep_version="v1"), 0)
+        self.assertEqual(self.cache.invalidate_term(TERM, keep_version="v2"), 2)
+        self.assertEqual(self.cache.invalidate_term(TERM), 0)
+        self.assertEqual([entry[0] for entry in self.cache.entries()], [other_term.filename])
+
+    def test_ignores_other_files(self):
+        with open(os.path.join(self.cache.cache_dir, "README.txt"), "w", encoding="utf8") as fp:
+            fp.write("x" * 1000)
+        self.put("a", 1000)
+        self.assertEqual(len(self.cache.entries()), 1)
+        self.assertEqual(self.cache.clear(), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.cache.cache_dir, "README.txt")))
+
+if __name__ == "__main__":
+    unittest.main()
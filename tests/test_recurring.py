@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重复事件（RRULE/EXDATE/RDATE）输出的回归测试：展开后与逐次事件的每一次上课相同，以及命令行的--recurring --verify
+"""
+
+import datetime
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CurriculumGenerator
+import GeneratorLog
+import ScheduleLoader
+import SyntheticWorkbook
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 28)
+HOLIDAYS = [datetime.date(2025, 10, day) for day in range(1, 9)]
+WORKDAYS = [datetime.date(2025, 9, 28), datetime.date(2025, 10, 11)]
+
+class VerifyRecurringTest(unittest.TestCase):
+
+    def check(self, grid):
+        parsed_cells = CurriculumGenerator.parse_grid(grid)
+        for workdays in (WORKDAYS, None):
+            with self.subTest(workdays=workdays is not None):
+                missing, extra = CurriculumGenerator.verify_recurring(parsed_cells, TERM_START, TERM_END, HOLIDAYS, workdays, 30)
+                self.assertEqual((missing, extra), ([], []))
+        with GeneratorLog.suppressed():
+            expanded, _ = CurriculumGenerator.build_curriculum_from_records(parsed_cells, TERM_START, TERM_END, HOLIDAYS, WORKDAYS, 30)
+            recurring, _ = CurriculumGenerator.build_curriculum_from_records(parsed_cells, TERM_START, TERM_END, HOLIDAYS, WORKDAYS, 30, recurring=True)
+        self.assertLess(recurring.get_ics_text().count("BEGIN:VEVENT"), expanded.get_ics_text().count("BEGIN:VEVENT"))
+
+    def test_export_workbook(self):
+        self.check(ScheduleLoader.load_schedule_grid(os.path.join(ROOT, "export.xlsx")))
+
+    def test_synthetic_workbooks(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                workbook = io.BytesIO()
+                SyntheticWorkbook.generate_workbook(workbook, courses_per_week=40, special_cells=6, seed=seed)
+                workbook.seek(0)
+                self.check(ScheduleLoader.load_schedule_grid(workbook))
+
+class CommandLineTest(unittest.TestCase):
+
+    def test_recurring_verify(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            # 空的节假日缓存目录：离线时使用内置数据，不读取本机的缓存
+            env = dict(os.environ, SUSTECH_HOLIDAY_CACHE_DIR=os.path.join(work_dir, "holidays"))
+            completed = subprocess.run(
+                [sys.executable, os.path.join(ROOT, "CurriculumGenerator.py"), os.path.join(ROOT, "export.xlsx"),
+                 "20250908", "20251228", "--offline", "--no-cache", "--recurring", "--verify"],
+                cwd=work_dir, env=env, capture_output=True, text=True, encoding="utf8")
+            self.assertEqual(completed.returncode, 0, completed.stdout + completed.stderr)
+            self.assertIn("校验通过", completed.stdout)
+            with open(os.path.join(work_dir, CurriculumGenerator.OUTPUT_FILE), encoding="utf8") as fp:
+                self.assertIn("RRULE:FREQ=WEEKLY", fp.read())
+
+if __name__ == "__main__":
+    unittest.main()
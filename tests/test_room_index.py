@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RoomIndex的回归测试：增量添加和删除课表时的引用计数，结果必须与重新建立的索引相同
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import RoomIndex
+import SyntheticWorkbook
+import WeekMask
+from ScheduleQuery import Section
+
+ROOM = "南方科技大学-第三教学楼205"
+
+def section(name, day, slots, weeks, location="三教205"):
+    return Section(name, f"{name}-01班", day, slots[0], slots[1], WeekMask.week_mask(*weeks), location)
+
+def rebuild(index):
+    """按index中现有的课表重新建立索引"""
+    result = RoomIndex.RoomIndex()
+    for source, entry in index.sources.items():
+        result.set_source(source, entry["digest"], entry["sections"])
+    return result
+
+class RefcountTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = RoomIndex.RoomIndex()
+        self.shared = section("甲", 0, (3, 4), (1, 16, ""))
+        self.odd = section("乙", 1, (1, 2), (1, 15, "单"))
+        self.even = section("丙", 1, (1, 2), (2, 16, "双"))
+
+    def assertConsistent(self):
+        expected = rebuild(self.index)
+        self.assertEqual(self.index.refcounts, expected.refcounts)
+        self.assertEqual(self.index.occupied, expected.occupied)
+        self.assertEqual({room: {key: sorted(value) for key, value in occupants.items()} for room, occupants in self.index.occupants.items()},
+                         {room: {key: sorted(value) for key, value in occupants.items()} for room, occupants in expected.occupants.items()})
+
+    def test_shared_section(self):
+        self.index.set_source("a", "1", [self.shared])
+        self.index.set_source("b", "2", [self.shared])
+        self.assertEqual(self.index.refcounts[self.shared], 2)
+        self.assertEqual(self.index.occupants[ROOM][(0, 3)], [self.shared])
+        # 另一个课表中还有这门课，教室仍被占用
+        self.assertTrue(self.index.remove_source("a"))
+        self.assertEqual(self.index.what_is_in(ROOM, 0, 4, 16), [self.shared])
+        self.assertConsistent()
+        self.assertTrue(self.index.remove_source("b"))
+        self.assertFalse(self.index.remove_source("b"))
+        self.assertEqual((self.index.refcounts, self.index.occupied, self.index.occupants), ({}, {}, {}))
+
+    def test_remove_recomputes_slot(self):
+        self.index.set_source("a", "1", [self.odd])
+        self.index.set_source("b", "2", [self.even])
+        self.assertEqual(self.index.occupied[ROOM][1][1], WeekMask.week_mask(1, 16))
+        self.index.remove_source("a")
+        self.assertEqual(self.index.occupied[ROOM][1][1], self.even.weeks)
+        self.assertEqual(self.index.what_is_in(ROOM, 1, 2, 3), [])
+        self.assertConsistent()
+
+    def test_replace_source(self):
+        self.index.set_source("a", "1", [self.shared, self.odd])
+        self.index.set_source("a", "2", [self.even])
+        self.assertEqual(list(self.index.refcounts), [self.even])
+        self.assertEqual(self.index.occupied[ROOM][0][3], 0)
+        self.assertConsistent()
+
+    def test_online_section_not_indexed(self):
+        online = section("丁", 2, (1, 2), (1, 16, ""), "无地点")
+        self.index.set_source("a", "1", [online])
+        self.assertEqual(self.index.refcounts, {online: 1})
+        self.assertEqual(self.index.rooms(), [])
+        self.index.remove_source("a")
+        self.assertEqual(self.index.refcounts, {})
+
+    def test_random_updates(self):
+        generator = random.Random(15)
+        pool = [section(name, generator.randint(0, 4), (slot, slot + 1), (1, 16, generator.choice(("", "单", "双"))),
+                        generator.choice(("三教205", "一教101", "一教102", "无地点")))
+                for name, slot in zip("甲乙丙丁戊己庚辛壬癸", (1, 3, 1, 5, 3, 7, 1, 9, 3, 5))]
+        for step in range(300):
+            source = f"课表{generator.randint(0, 7)}"
+            if generator.random() < 0.3:
+                self.index.remove_source(source)
+            else:
+                self.index.set_source(source, str(step), generator.sample(pool, generator.randint(0, 4)))
+            if step % 25 == 0:
+                with self.subTest(step=step):
+                    self.assertConsistent()
+        self.assertConsistent()
+
+    def test_json_round_trip(self):
+        self.index.set_source("a", "1", [self.shared, self.odd])
+        self.index.set_source("b", "2", [self.shared, self.even])
+        loaded = RoomIndex.RoomIndex.from_json(self.index.to_json())
+        self.assertEqual(loaded.sources, self.index.sources)
+        self.assertEqual(loaded.refcounts, self.index.refcounts)
+        self.assertEqual(loaded.occupied, self.index.occupied)
+
+class QueryTest(unittest.TestCase):
+
+    def test_building_of(self):
+        self.assertEqual(RoomIndex.building_of(ROOM), "第三教学楼")
+        self.assertEqual(RoomIndex.building_of("南方科技大学-荔园1栋A101"), "荔园1栋")
+        self.assertEqual(RoomIndex.building_of("南方科技大学-第一科研楼报告厅"), "第一科研楼报告厅")
+
+    def test_empty_rooms(self):
+        index = RoomIndex.RoomIndex()
+        index.set_source("a", "1", [section("甲", 0, (3, 4), (1, 8, "")), section("乙", 0, (1, 2), (1, 16, ""), "一教101")])
+        self.assertEqual(index.empty_rooms(0, 3, 4, WeekMask.week_mask(9, 16)), ["南方科技大学-一教101", ROOM])
+        self.assertEqual(index.empty_rooms(0, 3, 4, WeekMask.week_mask(1, 16)), ["南方科技大学-一教101"])
+        self.assertEqual(index.empty_rooms(0, 1, 4, WeekMask.week_mask(9, 16)), [ROOM])
+        self.assertEqual(index.empty_rooms(0, 1, 4, WeekMask.week_mask(9, 16), building="一教"), [])
+
+class IngestTest(unittest.TestCase):
+
+    def test_ingest(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            path = os.path.join(work_dir, "课表.xlsx")
+            shutil.copy(os.path.join(ROOT, "export.xlsx"), path)
+            index = RoomIndex.RoomIndex()
+            self.assertEqual(index.ingest(path), "added")
+            self.assertIn(ROOM, index.rooms())
+            self.assertEqual(index.ingest(path), "unchanged")
+            SyntheticWorkbook.generate_workbook(path, courses_per_week=20, seed=1)
+            self.assertEqual(index.ingest(path), "updated")
+            self.assertEqual(len(index.sources), 1)
+            self.assertEqual(index.occupied, rebuild(index).occupied)
+
+if __name__ == "__main__":
+    unittest.main()
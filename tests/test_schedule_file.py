@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ScheduleFile的回归测试：中间格式保存后读回的结果与解析xlsx相同，由它生成的日历也相同
+"""
+
+import datetime
+import io
+import json
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CurriculumGenerator
+import GeneratorLog
+import ScheduleFile
+import SyntheticWorkbook
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 28)
+HOLIDAYS = [datetime.date(2025, 10, day) for day in range(1, 9)]
+WORKDAYS = [datetime.date(2025, 9, 28), datetime.date(2025, 10, 11)]
+CREATED = datetime.datetime(2025, 9, 1, tzinfo=datetime.timezone.utc)
+
+def ics_text(parsed_cells, recurring=False):
+    with GeneratorLog.suppressed():
+        curriculum, _ = CurriculumGenerator.build_curriculum_from_records(
+            parsed_cells, TERM_START, TERM_END, HOLIDAYS, WORKDAYS, 30, recurring)
+    curriculum.created = CREATED
+    return curriculum.get_ics_text()
+
+def workbook_cells(seed=None):
+    """export.xlsx（seed为None时）或合成课表的解析结果"""
+    if seed is None:
+        with open(os.path.join(ROOT, "export.xlsx"), "rb") as fp:
+            return ScheduleFile.parse_workbook(fp.read())
+    workbook = io.BytesIO()
+    SyntheticWorkbook.generate_workbook(workbook, courses_per_week=40, special_cells=6, seed=seed)
+    return ScheduleFile.parse_workbook(workbook.getvalue())
+
+class RoundTripTest(unittest.TestCase):
+
+    def check(self, parsed_cells):
+        data = ScheduleFile.dumps(parsed_cells, "课表.xlsx", "0" * 64)
+        loaded = ScheduleFile.loads(data)
+        expected = [(cell, records) for cell, records in parsed_cells if records]
+        self.assertEqual([(cell.day, cell.row, cell.row_header) for cell, _ in loaded],
+                         [(cell.day, cell.row, cell.row_header) for cell, _ in expected])
+        self.assertEqual([records for _, records in loaded], [records for _, records in expected])
+        self.assertEqual(ScheduleFile.dumps(loaded, "课表.xlsx", "0" * 64), data)
+        for recurring in (False, True):
+            with self.subTest(recurring=recurring):
+                self.assertEqual(ics_text(loaded, recurring), ics_text(parsed_cells, recurring))
+
+    def test_export_workbook(self):
+        self.check(workbook_cells())
+
+    def test_synthetic_workbooks(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.check(workbook_cells(seed))
+
+    def test_header(self):
+        data = ScheduleFile.dumps(workbook_cells(), "课表.xlsx", "0" * 64)
+        header = json.loads(data.decode("utf8").splitlines()[0])
+        self.assertEqual((header["format"], header["version"]), (ScheduleFile.SCHEDULE_FORMAT, ScheduleFile.SCHEDULE_VERSION))
+        self.assertEqual((header["source"], header["cells"]), ("课表.xlsx", len(data.splitlines()) - 1))
+        self.assertTrue(ScheduleFile.is_schedule_file("课表" + ScheduleFile.SCHEDULE_SUFFIX))
+        self.assertFalse(ScheduleFile.is_schedule_file("课表.xlsx"))
+
+class CompatibilityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parsed_cells = workbook_cells()
+        lines = ScheduleFile.dumps(self.parsed_cells).decode("utf8").splitlines()
+        self.header = json.loads(lines[0])
+        self.rows = [json.loads(line) for line in lines[1:]]
+
+    def encode(self, header=None, rows=None):
+        rows = self.rows if rows is None else rows
+        lines = [json.dumps(header or self.header, ensure_ascii=False)] + [json.dumps(row, ensure_ascii=False) for row in rows]
+        return "\n".join(lines) + "\n"
+
+    def test_field_order_and_extra_fields(self):
+        # 字段按文件头中的名称对应：顺序变化或增加字段都能读取
+        header = dict(self.header, fields=list(reversed(self.header["fields"])) + ["extra"])
+        rows = [[day, row, row_header, [list(reversed(values)) + [None] for values in records]]
+                for day, row, row_header, records in self.rows]
+        loaded = ScheduleFile.loads(self.encode(header, rows))
+        self.assertEqual([records for _, records in loaded], [records for _, records in ScheduleFile.loads(self.encode())])
+
+    def test_invalid(self):
+        cases = {
+            "不是中间格式": self.encode(dict(self.header, format="other")),
+            "版本": self.encode(dict(self.header, version=ScheduleFile.SCHEDULE_VERSION + 1)),
+            "缺少字段": self.encode(dict(self.header, fields=self.header["fields"][1:])),
+            "不完整": self.encode(rows=self.rows[:-1]),
+            "内容损坏": self.encode() + "[0, 1]\n",
+            "文件头损坏": "{" + self.encode(),
+            "空文件": "",
+        }
+        for case, data in cases.items():
+            with self.subTest(case=case), self.assertRaises(ValueError):
+                ScheduleFile.loads(data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ScheduleQuery的回归测试：周次位图的文本格式、课表内部的时间冲突和多个学生的共同空闲时间
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ScheduleQuery
+import WeekMask
+
+def section(name, day, slots, weeks):
+    """
+    构造一门课程
+    :param slots: (起始节次, 结束节次)
+    :param weeks: (起始周, 结束周, 单双周)
+    """
+    return ScheduleQuery.Section(name, f"{name}-01班", day, slots[0], slots[1], WeekMask.week_mask(*weeks), "一教101")
+
+class WeekTextTest(unittest.TestCase):
+
+    def test_format_and_parse(self):
+        self.assertEqual(WeekMask.format_weeks(WeekMask.parse_weeks("1-8,10,12-16")), "1-8,10,12-16周")
+        self.assertEqual(WeekMask.parse_weeks(WeekMask.format_weeks(WeekMask.week_mask(3, 16))), WeekMask.week_mask(3, 16))
+        self.assertEqual(WeekMask.format_weeks(WeekMask.week_mask(1, 9, "单")), "1,3,5,7,9周")
+        self.assertEqual(WeekMask.format_weeks(0), "无")
+        for text in ("0", "8-3", "一"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                WeekMask.parse_weeks(text)
+
+class ConflictTest(unittest.TestCase):
+
+    def conflicts(self, *sections):
+        return ScheduleQuery.WeeklySchedule(list(sections)).conflicts()
+
+    def test_overlapping_slots(self):
+        first = section("甲", 0, (3, 4), (1, 16, ""))
+        second = section("乙", 0, (4, 5), (10, 12, ""))
+        self.assertEqual(self.conflicts(first, second), [(first, second, WeekMask.week_mask(10, 12))])
+
+    def test_no_conflict(self):
+        cases = {
+            "单双周": (section("甲", 0, (3, 4), (1, 15, "单")), section("乙", 0, (3, 4), (2, 16, "双"))),
+            "相邻节次": (section("甲", 0, (1, 2), (1, 16, "")), section("乙", 0, (3, 4), (1, 16, ""))),
+            "不同星期": (section("甲", 0, (1, 2), (1, 16, "")), section("乙", 1, (1, 2), (1, 16, ""))),
+            "不相交的周次": (section("甲", 2, (1, 4), (1, 8, "")), section("乙", 2, (3, 4), (9, 16, ""))),
+            "同一门课": (section("甲", 0, (1, 2), (1, 8, "")), section("甲", 0, (1, 2), (5, 16, ""))),
+        }
+        for case, sections in cases.items():
+            with self.subTest(case=case):
+                self.assertEqual(self.conflicts(*sections), [])
+
+    def test_export_workbook(self):
+        # 星期五第3-4节的两门课分别为单周和双周，不冲突
+        schedule = ScheduleQuery.WeeklySchedule.from_workbook(os.path.join(ROOT, "export.xlsx"))
+        self.assertEqual(schedule.conflicts(), [])
+        friday = [item for item in schedule.sections if item.day == 4]
+        self.assertEqual(len(friday), 2)
+        self.assertEqual(friday[0].weeks | friday[1].weeks, WeekMask.week_mask(1, 16))
+
+class FreePeriodTest(unittest.TestCase):
+
+    def setUp(self):
+        self.schedules = [
+            ScheduleQuery.WeeklySchedule([section("甲", 0, (1, 2), (1, 16, "")), section("乙", 1, (3, 4), (1, 8, ""))]),
+            ScheduleQuery.WeeklySchedule([section("丙", 0, (5, 6), (1, 15, "单")), section("丁", 1, (7, 8), (9, 16, ""))]),
+        ]
+
+    def periods(self, weeks, min_slots=1):
+        mask = WeekMask.parse_weeks(weeks)
+        free = ScheduleQuery.common_free(self.schedules, mask)
+        return ScheduleQuery.free_periods(free, mask, min_slots, range(2))
+
+    def test_common_busy(self):
+        busy = ScheduleQuery.common_busy(self.schedules)
+        self.assertEqual(busy[0][1], WeekMask.week_mask(1, 16))
+        self.assertEqual(busy[0][5], WeekMask.week_mask(1, 15, "单"))
+        self.assertEqual(busy[0][3], 0)
+
+    def test_whole_term(self):
+        self.assertEqual(self.periods("1-16"), [(0, 3, 4), (0, 7, 11), (1, 1, 2), (1, 5, 6), (1, 9, 11)])
+        self.assertEqual(self.periods("1-16", min_slots=3), [(0, 7, 11), (1, 9, 11)])
+
+    def test_part_of_term(self):
+        # 双周时星期一第5-6节的单周课程不上课；第9周以后星期二第3-4节的课程已经结束
+        self.assertEqual(self.periods("2,4,6,8"), [(0, 3, 11), (1, 1, 2), (1, 5, 11)])
+        self.assertEqual(self.periods("9-16"), [(0, 3, 4), (0, 7, 11), (1, 1, 6), (1, 9, 11)])
+
+if __name__ == "__main__":
+    unittest.main()
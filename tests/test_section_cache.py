@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SectionCache的回归测试：命中缓存时生成的日历和上课次数计数与不使用缓存时完全相同
+"""
+
+import datetime
+import io
+import os
+import re
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import CalendarDelta
+import CurriculumGenerator
+import GeneratorLog
+import ScheduleFile
+import SectionCache
+import SyntheticWorkbook
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 28)
+HOLIDAYS = [datetime.date(2025, 10, day) for day in range(1, 9)]
+WORKDAYS = [datetime.date(2025, 9, 28), datetime.date(2025, 10, 11)]
+CREATED = datetime.datetime(2025, 9, 1, tzinfo=datetime.timezone.utc)
+
+def workbook_cells(seed=None):
+    """export.xlsx（seed为None时）或合成课表的解析结果"""
+    if seed is None:
+        with open(os.path.join(ROOT, "export.xlsx"), "rb") as fp:
+            return ScheduleFile.parse_workbook(fp.read())
+    workbook = io.BytesIO()
+    SyntheticWorkbook.generate_workbook(workbook, courses_per_week=40, special_cells=6, seed=seed)
+    return ScheduleFile.parse_workbook(workbook.getvalue())
+
+class SectionCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workbooks = [workbook_cells()] + [workbook_cells(seed) for seed in range(3)]
+
+    def setUp(self):
+        saved = CurriculumGenerator.section_cache
+        self.addCleanup(setattr, CurriculumGenerator, "section_cache", saved)
+
+    def build(self, parsed_cells, cache, recurring=False, travel_time=30):
+        """
+        使用指定的缓存生成课程表
+        :return: (课程表, ics文本, 上课次数计数)
+        """
+        CurriculumGenerator.section_cache = cache
+        with GeneratorLog.suppressed():
+            GeneratorLog.reset_counters()
+            curriculum, _ = CurriculumGenerator.build_curriculum_from_records(
+                parsed_cells, TERM_START, TERM_END, HOLIDAYS, WORKDAYS, travel_time, recurring)
+            counts = dict(GeneratorLog.counters)
+        curriculum.created = CREATED
+        return curriculum, curriculum.get_ics_text(), counts
+
+    def test_hit_equals_miss(self):
+        for recurring in (False, True):
+            cache = SectionCache.SectionCache()
+            expected = [self.build(cells, None, recurring)[1:] for cells in self.workbooks]
+            # 第一遍以未命中为主（不同课表之间也有相同的课程），第二遍全部命中
+            for round_name in ("first", "second"):
+                with self.subTest(recurring=recurring, round=round_name):
+                    hits = cache.hits
+                    self.assertEqual([self.build(cells, cache, recurring)[1:] for cells in self.workbooks], expected)
+                    if round_name == "second":
+                        self.assertEqual(cache.stats()["misses"], len(cache))
+                        self.assertGreater(cache.hits, hits)
+
+    def test_options_not_shared(self):
+        cache = SectionCache.SectionCache()
+        cells = self.workbooks[0]
+        self.build(cells, cache)
+        for recurring, travel_time in ((True, 30), (False, 45)):
+            with self.subTest(recurring=recurring, travel_time=travel_time):
+                self.assertEqual(self.build(cells, cache, recurring, travel_time)[1:],
+                                 self.build(cells, None, recurring, travel_time)[1:])
+
+    def test_small_cache(self):
+        cache = SectionCache.SectionCache(max_bytes=4096)
+        expected = [self.build(cells, None)[1:] for cells in self.workbooks]
+        for _ in range(2):
+            self.assertEqual([self.build(cells, cache)[1:] for cells in self.workbooks], expected)
+        self.assertGreater(cache.evictions, 0)
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+    def test_output_changes_do_not_leak(self):
+        cache = SectionCache.SectionCache()
+        cells = self.workbooks[0]
+        curriculum, text, _ = self.build(cells, cache)
+        # 增量更新会修改事件的SEQUENCE和CREATED，不能影响缓存中的事件
+        previous = CalendarDelta.parse_events(re.sub(r"^SEQUENCE:\d+", "SEQUENCE:5", text, flags=re.MULTILINE))
+        CalendarDelta.apply_previous(curriculum, previous)
+        self.assertIn("SEQUENCE:5", curriculum.get_ics_text())
+        self.assertEqual(self.build(cells, cache)[1], text)
+
+if __name__ == "__main__":
+    unittest.main()
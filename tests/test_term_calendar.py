@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TermCalendar的回归测试：查表得到的日期类型与逐日判断相同，表外的周次和日期按同样的规则判断
+"""
+
+import datetime
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TermCalendar
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 24)   # 第16周星期三
+HOLIDAYS = [datetime.date(2025, 10, day) for day in range(1, 9)] + [datetime.date(2025, 9, 13)]
+WORKDAYS = [datetime.date(2025, 9, 28), datetime.date(2025, 10, 11)]
+
+class TermCalendarTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calendar = TermCalendar.TermCalendar(TERM_START, TERM_END, HOLIDAYS, WORKDAYS)
+
+    def test_classify_date(self):
+        cases = {
+            datetime.date(2025, 10, 1): TermCalendar.HOLIDAY,    # 国庆节（星期三）
+            datetime.date(2025, 9, 13): TermCalendar.HOLIDAY,    # 星期六，同时在节假日列表中
+            datetime.date(2025, 9, 28): TermCalendar.MAKEUP,     # 星期日调休上课
+            datetime.date(2025, 9, 14): TermCalendar.WEEKEND,
+            datetime.date(2025, 9, 8): TermCalendar.TEACHING,
+        }
+        for date, status in cases.items():
+            with self.subTest(date=date):
+                self.assertEqual(TermCalendar.classify_date(date, set(HOLIDAYS), set(WORKDAYS)), status)
+        self.assertEqual(TermCalendar.classify_date(datetime.date(2025, 9, 28), set(HOLIDAYS)), TermCalendar.WEEKEND)
+
+    def test_table_matches_classify_date(self):
+        self.assertEqual((self.calendar.week_count, self.calendar.day_count), (16, 108))
+        for week in range(-1, 19):
+            for day in range(7):
+                date = TERM_START + datetime.timedelta(days=(week - 1) * 7 + day)
+                with self.subTest(week=week, day=day):
+                    self.assertEqual(self.calendar.date_of(week, day), date)
+                    expected = TermCalendar.classify_date(date, set(HOLIDAYS), set(WORKDAYS))
+                    self.assertEqual(self.calendar.status_of(week, day), expected)
+                    self.assertEqual(self.calendar.classify(date), expected)
+                    self.assertEqual(self.calendar.in_term(week, day), date <= TERM_END)
+
+    def test_without_workdays(self):
+        calendar = TermCalendar.TermCalendar(TERM_START, TERM_END, HOLIDAYS)
+        self.assertEqual(calendar.status_of(3, 6), TermCalendar.WEEKEND)
+        self.assertEqual(self.calendar.status_of(3, 6), TermCalendar.MAKEUP)
+
+    def test_immutable_and_picklable(self):
+        with self.assertRaises(AttributeError):
+            self.calendar.term_end_date = TERM_START
+        copy = pickle.loads(pickle.dumps(self.calendar))
+        self.assertEqual(copy.key, self.calendar.key)
+        self.assertEqual(copy.statuses, self.calendar.statuses)
+        with self.assertRaises(AttributeError):
+            copy.statuses = b""
+
+    def test_shared_calendar(self):
+        first = TermCalendar.term_calendar(TERM_START, TERM_END, HOLIDAYS, WORKDAYS)
+        # 节假日的顺序和重复不影响学期参数
+        self.assertIs(TermCalendar.term_calendar(TERM_START, TERM_END, list(reversed(HOLIDAYS)) + HOLIDAYS, WORKDAYS), first)
+        self.assertIsNot(TermCalendar.term_calendar(TERM_START, TERM_END, HOLIDAYS), first)
+        installed = TermCalendar.install(pickle.loads(pickle.dumps(first)))
+        self.assertIs(TermCalendar.term_calendar(TERM_START, TERM_END, HOLIDAYS, WORKDAYS), installed)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按位图展开上课周次（WeekMask.TermMask）与逐日判断的结果必须相同
+"""
+
+import datetime
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CurriculumGenerator
+import GeneratorLog
+import WeekMask
+
+TERM_START = datetime.date(2025, 9, 8)
+TERM_END = datetime.date(2025, 12, 28)
+HOLIDAYS = [datetime.date(2025, 10, day) for day in range(1, 9)] + [datetime.date(2025, 9, 13)]
+WORKDAYS = [datetime.date(2025, 9, 28), datetime.date(2025, 10, 11)]
+
+def expand_by_date(start_week, end_week, week_type, day, term_start_date, term_end_date, holidays, workdays):
+    """
+    逐周计算日期并逐日判断节假日和周末，作为位图展开的参照
+    :return: (按周次规律的日期, 实际上课的日期, 跳过的节假日数量, 跳过的周末数量)
+    """
+    pattern_dates = []
+    course_dates = []
+    skipped_holidays = skipped_weekends = 0
+    for week in range(start_week, end_week + 1):
+        if week_type == "单" and week % 2 == 0 or week_type == "双" and week % 2 == 1:
+            continue
+        date = term_start_date + datetime.timedelta(days=(week - 1) * 7 + day)
+        if date > term_end_date:
+            continue
+        pattern_dates.append(date)
+        if date in holidays:
+            skipped_holidays += 1
+        elif date.weekday() >= 5 and (workdays is None or date not in workdays):
+            skipped_weekends += 1
+        else:
+            course_dates.append(date)
+    return pattern_dates, course_dates, skipped_holidays, skipped_weekends
+
+class WeekExpansionTest(unittest.TestCase):
+
+    def check(self, start_week, end_week, week_type, day, term_end_date=TERM_END, workdays=WORKDAYS):
+        expected_pattern, expected_dates, holidays, weekends = expand_by_date(
+            start_week, end_week, week_type, day, TERM_START, term_end_date, HOLIDAYS, workdays)
+        with GeneratorLog.suppressed():
+            GeneratorLog.reset_counters()
+            pattern_dates, course_dates = CurriculumGenerator.expand_course_weeks(
+                "课程", start_week, end_week, week_type, day, TERM_START, term_end_date, HOLIDAYS, workdays)
+            counters = dict(GeneratorLog.counters)
+        self.assertEqual(pattern_dates, expected_pattern)
+        self.assertEqual(course_dates, expected_dates)
+        self.assertEqual(counters.get("holiday", 0), holidays)
+        self.assertEqual(counters.get("weekend", 0), weekends)
+
+        start_time, end_time = datetime.time(8), datetime.time(9, 50)
+        with GeneratorLog.suppressed():
+            times = CurriculumGenerator.expand_course_times(
+                "课程", (start_week, end_week, week_type), day, start_time, end_time, TERM_START, term_end_date, HOLIDAYS, workdays)
+        self.assertEqual(list(times), [(datetime.datetime.combine(date, start_time), datetime.datetime.combine(date, end_time),
+                                        datetime.datetime.combine(date, datetime.time.max)) for date in expected_dates])
+
+    def test_export_weeks(self):
+        """export.xlsx中出现的周次"""
+        for week_info in ((1, 16, ""), (1, 15, "单"), (2, 16, "双"), (2, 12, "双"), (12, 12, "")):
+            for day in range(7):
+                with self.subTest(week_info=week_info, day=day):
+                    self.check(*week_info, day)
+
+    def test_holiday_week(self):
+        # 国庆假期为第4周周三至第5周周三（10月1日至8日），9月28日（第3周周日）调休上课
+        self.check(3, 5, "", 2)
+        self.check(3, 3, "", 6)
+        self.check(3, 3, "", 6, workdays=None)
+
+    def test_term_ends_mid_week(self):
+        for day in range(7):
+            with self.subTest(day=day):
+                self.check(14, 20, "", day, term_end_date=datetime.date(2025, 12, 17))
+
+    def test_random_weeks(self):
+        """周次超出位图范围（第0周、负数周次）时改为逐周查询，结果也必须相同"""
+        generator = random.Random(20250908)
+        for _ in range(500):
+            start_week = generator.randint(-2, 18)
+            end_week = start_week + generator.randint(0, 18)
+            week_type = generator.choice(("", "单", "双"))
+            day = generator.randint(0, 6)
+            workdays = generator.choice((WORKDAYS, None))
+            with self.subTest(weeks=(start_week, end_week, week_type), day=day, workdays=workdays is not None):
+                self.check(start_week, end_week, week_type, day, workdays=workdays)
+
+    def test_mask_weeks(self):
+        self.assertEqual(WeekMask.mask_weeks(WeekMask.week_mask(1, 9, "单")), (1, 3, 5, 7, 9))
+        self.assertEqual(WeekMask.mask_weeks(WeekMask.week_mask(2, 8, "双")), (2, 4, 6, 8))
+
+if __name__ == "__main__":
+    unittest.main()